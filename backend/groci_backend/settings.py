@@ -82,6 +82,29 @@ DATABASES = {
     }
 }
 
+# Cache shared by the web and receipt worker processes (receipt stats are
+# invalidated by whichever process saves the receipt): Redis when REDIS_URL
+# is set, otherwise a database table. Deployments without Redis create it
+# once, after migrating, with `python manage.py createcachetable`.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+CACHES['local'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -159,12 +182,24 @@ CORS_ALLOW_METHODS = [
 AZURE_COMPUTER_VISION_KEY = os.getenv('AZURE_COMPUTER_VISION_KEY')
 AZURE_COMPUTER_VISION_ENDPOINT = os.getenv('AZURE_COMPUTER_VISION_ENDPOINT')
 
+# Point Azure OCR and OpenAI at the local stand-in (manage.py run_ocr_llm_standin)
+# for load testing, e.g. http://127.0.0.1:8765
+RECEIPT_SERVICES_STANDIN_URL = os.getenv('RECEIPT_SERVICES_STANDIN_URL')
+
 # ImageKit Configuration
 IMAGEKIT_DEFAULT_CACHEFILE_BACKEND = 'imagekit.cachefiles.backends.Simple'
 IMAGEKIT_CACHEFILE_DIR = 'cache'
 IMAGEKIT_SPEC_CACHEFILE_NAMER = 'imagekit.cachefiles.namers.hash'
 IMAGEKIT_DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Cache file state stays in process, off the shared cache
+IMAGEKIT_CACHE_BACKEND = 'local'
 
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
\ No newline at end of file
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+
+# Hash uploads while they stream in (used to key the OCR result cache)
+FILE_UPLOAD_HANDLERS = [
+    'receipts.upload_handlers.HashingMemoryFileUploadHandler',
+    'receipts.upload_handlers.HashingTemporaryFileUploadHandler',
+]
\ No newline at end of file
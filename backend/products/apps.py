@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        # Keep the product trigram index in sync with Product writes
+        from products.services import product_index  # noqa: F401
+        # Refresh current prices when a price is deleted
+        from products.services import current_prices  # noqa: F401
+        # Keep the autocomplete index in sync with Product writes
+        from products.services import autocomplete  # noqa: F401
@@ -0,0 +1,107 @@
+"""
+Management command to recompute normalized product names
+products/management/commands/backfill_normalized_names.py
+
+python manage.py backfill_normalized_names
+python manage.py backfill_normalized_names --dry-run
+python manage.py backfill_normalized_names --only products --chunk-size 5000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from products.models import Product
+from products.services.normalization import normalize_product_name, parse_product_name
+from receipts.models import ReceiptItem
+
+
+class Command(BaseCommand):
+    help = 'Recompute normalized_name for existing products and receipt items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=['products', 'receipt-items'],
+            help='Backfill only one table (default: both)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows read and updated per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Count changes, but write nothing')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        self.chunk_size = options['chunk_size']
+        self.dry_run = options['dry_run']
+
+        if options['only'] in (None, 'products'):
+            changed, total = self._backfill_products()
+            self.stdout.write(self.style.SUCCESS(
+                f"Products: {changed} of {total} normalized name(s) "
+                f"{'would change' if self.dry_run else 'updated'}"
+            ))
+            if not self.dry_run:
+                self._report_shared_keys()
+
+        if options['only'] in (None, 'receipt-items'):
+            changed, total = self._backfill_receipt_items()
+            self.stdout.write(self.style.SUCCESS(
+                f"Receipt items: {changed} of {total} normalized name(s) "
+                f"{'would change' if self.dry_run else 'updated'}"
+            ))
+
+    def _chunks(self, queryset, fields):
+        """Yield lists of rows, keyset-paginated by id"""
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id).order_by('id').only('id', *fields)[:self.chunk_size])
+            if not chunk:
+                return
+            last_id = chunk[-1].id
+            yield chunk
+
+    def _backfill_products(self):
+        changed = 0
+        total = 0
+        for chunk in self._chunks(Product.objects.all(), ['name', 'normalized_name', 'unit']):
+            total += len(chunk)
+            to_update = []
+            for product in chunk:
+                normalized = parse_product_name(product.name)
+                unit = product.unit or normalized.unit
+                if product.normalized_name != normalized.name or product.unit != unit:
+                    product.normalized_name = normalized.name
+                    product.unit = unit
+                    to_update.append(product)
+            changed += len(to_update)
+            if to_update and not self.dry_run:
+                with transaction.atomic():
+                    Product.objects.bulk_update(to_update, ['normalized_name', 'unit'])
+        return changed, total
+
+    def _backfill_receipt_items(self):
+        changed = 0
+        total = 0
+        for chunk in self._chunks(ReceiptItem.objects.all(), ['product_name', 'normalized_name']):
+            total += len(chunk)
+            to_update = []
+            for item in chunk:
+                normalized_name = normalize_product_name(item.product_name)
+                if item.normalized_name != normalized_name:
+                    item.normalized_name = normalized_name
+                    to_update.append(item)
+            changed += len(to_update)
+            if to_update and not self.dry_run:
+                with transaction.atomic():
+                    ReceiptItem.objects.bulk_update(to_update, ['normalized_name'])
+        return changed, total
+
+    def _report_shared_keys(self):
+        """Approved products that now share a key are candidates for merging"""
+        shared = Product.objects.filter(is_approved=True).values('normalized_name', 'brand').annotate(
+            count=Count('id')
+        ).filter(count__gt=1).count()
+        if shared:
+            self.stdout.write(self.style.WARNING(
+                f"{shared} normalized name/brand pair(s) are shared by several approved products; "
+                f"see products/admin/possible-duplicates/"
+            ))
@@ -11,6 +11,7 @@ import json
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from products.models import Store, Category, Product, PriceHistory
+from products.services.normalization import normalize_product_name
 from decimal import Decimal
 
 
@@ -125,8 +126,9 @@ class Command(BaseCommand):
         products = {}
         for prod_data in products_data:
             category = categories.get(prod_data.get('category'))
+            # Match on the key Product.save derives from the name, not the fixture's
             product, created = Product.objects.get_or_create(
-                normalized_name=prod_data['normalized_name'],
+                normalized_name=normalize_product_name(prod_data['name']),
                 defaults={
                     'name': prod_data['name'],
                     'category': category,
@@ -0,0 +1,25 @@
+"""
+Management command to rebuild the full-text product search index
+products/management/commands/rebuild_product_search.py
+
+python manage.py rebuild_product_search
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from products.services.product_search import ProductSearchService
+
+
+class Command(BaseCommand):
+    help = 'Re-index all products in the product_search full-text table'
+
+    def handle(self, *args, **options):
+        if not ProductSearchService.available():
+            raise CommandError(
+                'The product_search table does not exist (not SQLite, SQLite without FTS5, '
+                'or migrations not applied)'
+            )
+
+        with transaction.atomic():
+            indexed = ProductSearchService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} product(s) for search'))
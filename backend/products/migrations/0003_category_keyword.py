@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_category_created_by_category_is_approved_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100, unique=True)),
+                ('priority', models.PositiveIntegerField(default=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keywords', to='products.category')),
+            ],
+            options={
+                'db_table': 'category_keywords',
+                'ordering': ['priority', 'keyword'],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_current_prices(apps, schema_editor):
+    """One row per product-store pair from its latest approved, active price"""
+    PriceHistory = apps.get_model('products', 'PriceHistory')
+    CurrentPrice = apps.get_model('products', 'CurrentPrice')
+
+    latest = {}
+    rows = PriceHistory.objects.filter(is_active=True, is_approved=True).order_by(
+        'date_recorded', 'id'
+    ).values_list('id', 'product_id', 'store_id', 'price', 'date_recorded')
+    for history_id, product_id, store_id, price, date_recorded in rows.iterator():
+        latest[(product_id, store_id)] = (history_id, price, date_recorded)
+
+    CurrentPrice.objects.bulk_create([
+        CurrentPrice(
+            product_id=product_id, store_id=store_id, price=price,
+            date_recorded=date_recorded, price_history_id=history_id
+        )
+        for (product_id, store_id), (history_id, price, date_recorded) in latest.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_category_keyword'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date_recorded', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('price_history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.pricehistory')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='products.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='products.store')),
+            ],
+            options={
+                'db_table': 'current_prices',
+                'ordering': ['price'],
+                'indexes': [models.Index(fields=['product', 'price'], name='current_pri_product_a55126_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'store'), name='unique_current_price')],
+            },
+        ),
+        migrations.RunPython(build_current_prices, migrations.RunPython.noop),
+    ]
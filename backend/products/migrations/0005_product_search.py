@@ -0,0 +1,95 @@
+# Generated by Django 5.2.3 on 2026-10-17 01:05
+
+from django.db import migrations
+
+
+# Full-text index over products, ranked with BM25 (name weighs most). Only
+# SQLite builds with FTS5 get it; elsewhere search falls back to icontains.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE product_search USING fts5(
+        name, aliases, brand, category, barcode,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    "INSERT INTO product_search(product_search, rank) VALUES ('rank', 'bm25(10.0, 6.0, 4.0, 2.0, 1.0)')",
+    """
+    CREATE TRIGGER product_search_insert AFTER INSERT ON products BEGIN
+        INSERT INTO product_search(rowid, name, aliases, brand, category, barcode)
+        VALUES (
+            new.id, new.name, new.normalized_name, new.brand,
+            coalesce((SELECT name FROM categories WHERE id = new.category_id), ''),
+            coalesce(new.barcode, '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_update AFTER UPDATE OF name, normalized_name, brand, category_id, barcode ON products BEGIN
+        DELETE FROM product_search WHERE rowid = old.id;
+        INSERT INTO product_search(rowid, name, aliases, brand, category, barcode)
+        VALUES (
+            new.id, new.name, new.normalized_name, new.brand,
+            coalesce((SELECT name FROM categories WHERE id = new.category_id), ''),
+            coalesce(new.barcode, '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_delete AFTER DELETE ON products BEGIN
+        DELETE FROM product_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_category_update AFTER UPDATE OF name ON categories BEGIN
+        UPDATE product_search SET category = new.name
+        WHERE rowid IN (SELECT id FROM products WHERE category_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO product_search(rowid, name, aliases, brand, category, barcode)
+    SELECT p.id, p.name, p.normalized_name, p.brand, coalesce(c.name, ''), coalesce(p.barcode, '')
+    FROM products p LEFT JOIN categories c ON c.id = p.category_id
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS product_search_category_update',
+    'DROP TRIGGER IF EXISTS product_search_delete',
+    'DROP TRIGGER IF EXISTS product_search_update',
+    'DROP TRIGGER IF EXISTS product_search_insert',
+    'DROP TABLE IF EXISTS product_search',
+]
+
+
+def create_product_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+            print('SQLite was built without FTS5; product search will use icontains')
+            return
+        for statement in CREATE_SQL:
+            cursor.execute(statement)
+
+
+def drop_product_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in DROP_SQL:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_currentprice'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_product_search, drop_product_search),
+    ]
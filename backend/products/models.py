@@ -3,9 +3,10 @@ Product, Store, and Price History models
 backend/products/models.py
 """
 
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
+from products.services.normalization import parse_product_name
 
 
 class Store(models.Model):
@@ -63,6 +64,44 @@ class Category(models.Model):
         return self.name
 
 
+class CategoryKeyword(models.Model):
+    """Keyword that assigns receipt items to a category when found in their name"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='keywords')
+    keyword = models.CharField(max_length=100, unique=True)  # Stored lower-case
+    # Lower wins when several keywords match; the built-in keywords rank at 100+
+    priority = models.PositiveIntegerField(default=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'category_keywords'
+        ordering = ['priority', 'keyword']
+
+    def __str__(self):
+        return f"{self.keyword} -> {self.category}"
+
+    def save(self, *args, **kwargs):
+        self.keyword = self.keyword.strip().lower()
+        super().save(*args, **kwargs)
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_lowest_price(self):
+        """
+        Annotate the lowest current price and its store
+
+        Adds lowest_price_amount, lowest_price_store_id and
+        lowest_price_store_name (None without a current price), each a
+        subquery on the current_prices (product, price) index, so a page of
+        products costs one query whatever its size.
+        """
+        lowest = CurrentPrice.objects.filter(product=models.OuterRef('pk')).order_by('price', 'store_id')
+        return self.annotate(
+            lowest_price_amount=models.Subquery(lowest.values('price')[:1]),
+            lowest_price_store_id=models.Subquery(lowest.values('store_id')[:1]),
+            lowest_price_store_name=models.Subquery(lowest.values('store__name')[:1])
+        )
+
+
 class Product(models.Model):
     """Product master data"""
     name = models.CharField(max_length=255)
@@ -89,6 +128,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         db_table = 'products'
         ordering = ['name']
@@ -101,22 +142,21 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.name} ({self.brand})" if self.brand else self.name
 
+    def save(self, *args, **kwargs):
+        # Every write path gets the same matching key
+        normalized = parse_product_name(self.name)
+        self.normalized_name = normalized.name
+        if not self.unit:
+            self.unit = normalized.unit
+        super().save(*args, **kwargs)
+
     def get_current_price(self, store):
         """Get the most recent approved price for this product at a specific store"""
-        latest_price = self.price_history.filter(
-            store=store,
-            is_active=True,
-            is_approved=True
-        ).order_by('-date_recorded').first()
-        return latest_price.price if latest_price else None
+        return self.current_prices.filter(store=store).values_list('price', flat=True).first()
 
     def get_lowest_price(self):
-        """Get the lowest current approved price across all stores"""
-        latest_prices = self.price_history.filter(
-            is_active=True,
-            is_approved=True
-        ).order_by('price').first()
-        return latest_prices if latest_prices else None
+        """Get the lowest current approved price across all stores (a CurrentPrice, or None)"""
+        return self.current_prices.select_related('store').order_by('price', 'store_id').first()
 
 
 class PriceHistory(models.Model):
@@ -151,12 +191,36 @@ class PriceHistory(models.Model):
         return f"{self.product.name} @ {self.store.name} - ${self.price} ({self.date_recorded})"
 
     def save(self, *args, **kwargs):
-        """When saving a new approved price, deactivate older approved prices for the same product-store combination"""
-        if self.is_active and self.is_approved:
-            PriceHistory.objects.filter(
-                product=self.product,
-                store=self.store,
-                is_active=True,
-                is_approved=True
-            ).exclude(id=self.id).update(is_active=False)
-        super().save(*args, **kwargs)
\ No newline at end of file
+        """A saved approved, active price becomes the current price of its product-store pair"""
+        from products.services.current_prices import CurrentPriceService
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            CurrentPriceService.price_saved(self)
+
+
+class CurrentPrice(models.Model):
+    """The current approved price of a product at a store, one row per pair.
+
+    Maintained by CurrentPriceService from PriceHistory writes; points at the
+    history row it was taken from.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='current_prices')
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='current_prices')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    date_recorded = models.DateField()
+    price_history = models.ForeignKey(PriceHistory, on_delete=models.CASCADE, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'current_prices'
+        ordering = ['price']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'store'], name='unique_current_price'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'price']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} @ {self.store.name} - ${self.price}"
\ No newline at end of file
@@ -61,6 +61,21 @@ class CategoryListSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'is_approved']
 
 
+def lowest_price_of(product):
+    """
+    (price, store_id, store_name) of a product's lowest current price, or None
+
+    Reads the Product.objects.with_lowest_price() annotations when present,
+    otherwise queries.
+    """
+    if hasattr(product, 'lowest_price_amount'):
+        if product.lowest_price_amount is None:
+            return None
+        return product.lowest_price_amount, product.lowest_price_store_id, product.lowest_price_store_name
+    lowest = product.get_lowest_price()
+    return (lowest.price, lowest.store.id, lowest.store.name) if lowest else None
+
+
 class PriceHistorySerializer(serializers.ModelSerializer):
     """Serializer for Price History"""
     store_name = serializers.CharField(source='store.name', read_only=True)
@@ -96,27 +111,34 @@ class ProductSerializer(serializers.ModelSerializer):
             'created_by', 'created_by_username',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'normalized_name', 'created_by', 'created_at', 'updated_at']
     
     def get_current_prices(self, obj):
         """Get current approved prices for all stores"""
-        prices = obj.price_history.filter(is_active=True, is_approved=True).select_related('store')
+        prices = PriceHistory.objects.filter(
+            id__in=obj.current_prices.values('price_history_id')
+        ).select_related('store', 'product', 'created_by')
         return PriceHistorySerializer(prices, many=True).data
     
     def get_lowest_price(self, obj):
         """Get the lowest current approved price"""
-        lowest = obj.get_lowest_price()
+        lowest = lowest_price_of(obj)
         if lowest:
+            price, store_id, store_name = lowest
             return {
-                'price': float(lowest.price),
-                'store': lowest.store.name,
-                'store_id': lowest.store.id
+                'price': float(price),
+                'store': store_name,
+                'store_id': store_id
             }
         return None
 
 
 class ProductListSerializer(serializers.ModelSerializer):
-    """Minimal serializer for product lists"""
+    """Minimal serializer for product lists
+
+    Expects products from Product.objects.with_lowest_price() with their
+    category selected; otherwise each row costs extra queries.
+    """
     category_name = serializers.CharField(source='category.name', read_only=True)
     lowest_price = serializers.SerializerMethodField()
     
@@ -129,8 +151,8 @@ class ProductListSerializer(serializers.ModelSerializer):
     
     def get_lowest_price(self, obj):
         """Get the lowest current approved price"""
-        lowest = obj.get_lowest_price()
-        return float(lowest.price) if lowest else None
+        lowest = lowest_price_of(obj)
+        return float(lowest[0]) if lowest else None
 
 
 class ProductCreateSerializer(serializers.ModelSerializer):
@@ -142,6 +164,8 @@ class ProductCreateSerializer(serializers.ModelSerializer):
             'name', 'normalized_name', 'category',
             'brand', 'unit', 'barcode', 'description'
         ]
+        # Derived from name in Product.save
+        read_only_fields = ['normalized_name']
     
     def validate_barcode(self, value):
         """Ensure barcode is unique if provided"""
@@ -0,0 +1,291 @@
+"""
+In-memory prefix index for product autocomplete
+backend/products/services/autocomplete.py
+"""
+
+import os
+import time
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import Product
+from products.services.normalization import fold, normalize_product_name
+
+
+# Entries pack (product rank, character offset) into one int
+OFFSET_BITS = 8
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+# Past the last character of any key, to find the end of a prefix range
+KEY_END = '\U0010ffff'
+
+
+class ProductAutocompleteIndex:
+    """Prefix index over the normalized names of approved, active products.
+
+    Products are ranked once per build by popularity (receipt and shopping
+    list lines that reference them), so rank 0 is the most popular. Every
+    word start of every name is one entry, packed as an int into a sorted
+    array; a prefix is the contiguous run of entries found by bisect, and
+    "beef" matches "grace corned beef". Runs longer than SCAN_LIMIT have
+    their top results precomputed when the index is built, so a lookup never
+    scans more than SCAN_LIMIT entries and never touches the database.
+
+    Products saved or deleted after the build go into a small overlay that
+    lookups merge in; the index is rebuilt when the overlay outgrows
+    AUTOCOMPLETE_MAX_PENDING or after AUTOCOMPLETE_TTL_SECONDS, in the
+    background while the old one keeps answering.
+    """
+
+    SCAN_LIMIT = 512
+    TOP_K = 20
+
+    def __init__(self, ttl_seconds=None, max_pending=None):
+        self.ttl_seconds = ttl_seconds or float(os.getenv('AUTOCOMPLETE_TTL_SECONDS', '900'))
+        self.max_pending = max_pending or int(os.getenv('AUTOCOMPLETE_MAX_PENDING', '500'))
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built = None    # see _build()
+        self._built_at = None
+        self._rebuilding = False
+        self._pending = {}    # product id -> (text, name, brand), saved since the build
+        self._removed = set()  # product ids deleted/hidden since the build
+        self.lookups = 0
+
+    # ---------------------------------------------------------------- building
+
+    @staticmethod
+    def _popularity():
+        """Product id -> number of receipt and shopping list lines referencing it"""
+        from receipts.models import ReceiptItem
+        from shopping_lists.models import ShoppingListItem
+
+        counts = {}
+        for model in (ReceiptItem, ShoppingListItem):
+            rows = model.objects.filter(product__isnull=False).values('product').annotate(
+                lines=Count('id')
+            ).order_by().values_list('product', 'lines')
+            for product_id, lines in rows.iterator():
+                counts[product_id] = counts.get(product_id, 0) + lines
+        return counts
+
+    def _build(self):
+        popularity = self._popularity()
+        rows = list(Product.objects.filter(is_approved=True, is_active=True).values_list(
+            'id', 'normalized_name', 'name', 'brand'
+        ).iterator())
+        # Rank 0 = most popular, then shortest name
+        rows.sort(key=lambda row: (-popularity.get(row[0], 0), len(row[1]), row[1], row[0]))
+
+        ids = array('q')
+        texts = []
+        labels = []
+        keyed = []
+        for rank, (product_id, text, name, brand) in enumerate(rows):
+            ids.append(product_id)
+            texts.append(text)
+            labels.append((name, brand))
+            offset = 0
+            for word in text.split(' '):
+                if offset > OFFSET_MASK:
+                    break
+                if word:
+                    keyed.append((text[offset:], rank << OFFSET_BITS | offset))
+                offset += len(word) + 1
+        keyed.sort()
+        entries = array('q', (entry for _, entry in keyed))
+
+        # Top ranks of every prefix too common to scan at lookup time,
+        # found by walking the implicit trie depth by depth
+        top = {}
+        stack = [('', 0, len(keyed))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if hi - lo <= self.SCAN_LIMIT:
+                continue
+            if prefix:
+                top[prefix] = tuple(heapq.nsmallest(
+                    self.TOP_K, {entries[i] >> OFFSET_BITS for i in range(lo, hi)}
+                ))
+            depth = len(prefix)
+            start = lo
+            while start < hi and len(keyed[start][0]) <= depth:
+                start += 1  # keys equal to the prefix itself
+            while start < hi:
+                child = keyed[start][0][:depth + 1]
+                end = bisect_left(keyed, (child + KEY_END,), start, hi)
+                stack.append((child, start, end))
+                start = end
+
+        return {'ids': ids, 'texts': texts, 'labels': labels, 'entries': entries, 'top': top}
+
+    def rebuild(self):
+        """Rebuild from the database and drop the overlay"""
+        with self._build_lock:
+            with self._lock:
+                # Writes from here on land in the new overlay; a product
+                # saved during the build may be in both, which is harmless
+                pending, removed = self._pending, self._removed
+                self._pending, self._removed = {}, set()
+            try:
+                built = self._build()
+            except Exception:
+                with self._lock:
+                    pending.update(self._pending)
+                    removed |= self._removed
+                    self._pending, self._removed = pending, removed
+                raise
+            with self._lock:
+                self._built = built
+                self._built_at = time.monotonic()
+        return self
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"Autocomplete index rebuild failed: {str(e)}")
+        finally:
+            # This thread's own database connection
+            connection.close()
+            with self._lock:
+                self._rebuilding = False
+
+    def _ensure_built(self):
+        if self._built is None:
+            with self._build_lock:
+                if self._built is not None:
+                    return
+            self.rebuild()
+            return
+
+        with self._lock:
+            stale = (
+                time.monotonic() - self._built_at >= self.ttl_seconds
+                or len(self._pending) + len(self._removed) > self.max_pending
+            )
+            if not stale or self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    # ----------------------------------------------------------------- updates
+
+    def sync(self, product):
+        """Reflect a saved product (approved and active ones are suggested)"""
+        with self._lock:
+            if self._built is None:
+                return  # picked up by the first build
+            if product.is_approved and product.is_active:
+                self._pending[product.id] = (product.normalized_name, product.name, product.brand)
+            else:
+                self._pending.pop(product.id, None)
+            self._removed.add(product.id)  # hides the built entry, if any
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._built is None:
+                return
+            self._pending.pop(product_id, None)
+            self._removed.add(product_id)
+
+    # ----------------------------------------------------------------- lookups
+
+    @staticmethod
+    def _keys(query):
+        """Forms of the query to look up: as typed (folded) and normalized
+
+        "corned bf" only matches in normalized form ("corned beef"), while a
+        word still being typed ("w" for "white") only matches as typed.
+        """
+        keys = [' '.join(fold(query).split()), normalize_product_name(query)]
+        return [key for n, key in enumerate(keys) if key and key not in keys[:n]]
+
+    def _ranks(self, built, key, wanted):
+        """Best ranks with a word starting with key"""
+        ranks = built['top'].get(key)
+        if ranks is not None:
+            return ranks
+        # Not precomputed, so the range is at most SCAN_LIMIT entries
+        texts = built['texts']
+        entries = built['entries']
+        suffix = lambda entry: texts[entry >> OFFSET_BITS][entry & OFFSET_MASK:]
+        lo = bisect_left(entries, key, key=suffix)
+        hi = bisect_left(entries, key + KEY_END, lo, key=suffix)
+        return heapq.nsmallest(wanted, {entries[i] >> OFFSET_BITS for i in range(lo, hi)})
+
+    def lookup(self, query, limit=10):
+        """
+        Most popular products with a word starting with `query`
+
+        Args:
+            query: Text typed so far
+            limit: Maximum number of suggestions (at most TOP_K)
+
+        Returns:
+            list of (product_id, name, brand), most popular first
+        """
+        keys = self._keys(query)
+        if not keys:
+            return []
+        limit = min(limit, self.TOP_K)
+        self._ensure_built()
+
+        with self._lock:
+            self.lookups += 1
+            built = self._built
+            ids = built['ids']
+            labels = built['labels']
+            removed = self._removed
+
+            ranks = set()
+            for key in keys:
+                ranks.update(self._ranks(built, key, limit + len(removed)))
+            results = [
+                (ids[rank], *labels[rank])
+                for rank in sorted(ranks)
+                if ids[rank] not in removed
+            ][:limit]
+
+            # Products saved since the build have no popularity yet: they
+            # come after the ranked ones, if there is room
+            if len(results) < limit and self._pending:
+                spaced_keys = [' ' + key for key in keys]
+                for product_id, (text, name, brand) in self._pending.items():
+                    spaced_text = ' ' + text
+                    if any(spaced_key in spaced_text for spaced_key in spaced_keys):
+                        results.append((product_id, name, brand))
+                        if len(results) >= limit:
+                            break
+        return results
+
+    def stats(self):
+        with self._lock:
+            built = self._built or {'ids': (), 'entries': (), 'top': {}}
+            return {
+                'products': len(built['ids']),
+                'entries': len(built['entries']),
+                'cached_prefixes': len(built['top']),
+                'pending': len(self._pending),
+                'removed': len(self._removed),
+                'lookups': self.lookups,
+            }
+
+
+# Shared by the autocomplete view in this process
+autocomplete_index = ProductAutocompleteIndex()
+
+
+@receiver(post_save, sender=Product)
+def autocomplete_saved_product(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete_index.sync(instance))
+
+
+@receiver(post_delete, sender=Product)
+def autocomplete_deleted_product(sender, instance, **kwargs):
+    product_id = instance.id
+    transaction.on_commit(lambda: autocomplete_index.remove(product_id))
@@ -0,0 +1,121 @@
+"""
+Maintenance of the current price table
+backend/products/services/current_prices.py
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from products.models import PriceHistory, CurrentPrice
+
+
+class CurrentPriceService:
+    """Keep CurrentPrice in step with approved, active PriceHistory rows.
+
+    The most recently saved approved, active price of a product at a store is
+    its current price, as before. Instead of deactivating every older row on
+    each save, the price it replaces is looked up in CurrentPrice and only
+    that one history row is marked inactive. Everything runs in the caller's
+    transaction.
+    """
+
+    @staticmethod
+    def price_saved(price):
+        """Make a just-saved price current, or drop it from CurrentPrice if it no longer qualifies"""
+        with transaction.atomic():
+            # The price may have been moved to another product or store
+            for moved in CurrentPrice.objects.filter(price_history=price).exclude(
+                product_id=price.product_id, store_id=price.store_id
+            ).values_list('product_id', 'store_id'):
+                CurrentPriceService.refresh(*moved)
+
+            if not (price.is_active and price.is_approved):
+                if CurrentPrice.objects.filter(price_history=price).exists():
+                    CurrentPriceService.refresh(price.product_id, price.store_id)
+                return
+
+            current = CurrentPrice.objects.select_for_update().filter(
+                product_id=price.product_id, store_id=price.store_id
+            ).first()
+            if current is None:
+                CurrentPrice.objects.create(
+                    product_id=price.product_id, store_id=price.store_id, price=price.price,
+                    date_recorded=price.date_recorded, price_history=price
+                )
+                return
+
+            if current.price_history_id != price.id:
+                PriceHistory.objects.filter(id=current.price_history_id).update(is_active=False)
+            current.price = price.price
+            current.date_recorded = price.date_recorded
+            current.price_history = price
+            current.save()
+
+    @staticmethod
+    def refresh(product_id, store_id):
+        """Recompute one pair's current price from its history"""
+        latest = PriceHistory.objects.filter(
+            product_id=product_id, store_id=store_id, is_active=True, is_approved=True
+        ).order_by('-date_recorded', '-id').first()
+        if latest is None:
+            CurrentPrice.objects.filter(product_id=product_id, store_id=store_id).delete()
+            return
+        CurrentPrice.objects.update_or_create(
+            product_id=product_id, store_id=store_id,
+            defaults={'price': latest.price, 'date_recorded': latest.date_recorded, 'price_history': latest}
+        )
+
+    @staticmethod
+    def prices_upserted(store, date_recorded, product_ids, approved=True):
+        """
+        Bring CurrentPrice up to date after a bulk price upsert
+
+        Used after bulk_create(update_conflicts=True), which bypasses
+        PriceHistory.save. Approved prices retire the ones they replace and
+        the current rows are repointed with one upsert; unapproved ones may
+        have overwritten a current row, whose pair is then recomputed.
+
+        Args:
+            store: Store the prices were recorded at
+            date_recorded: Their date
+            product_ids: Products whose price was written
+            approved: Whether the prices were written approved and active
+        """
+        if not approved:
+            overwritten = CurrentPrice.objects.filter(
+                product_id__in=product_ids, store=store, date_recorded=date_recorded
+            ).values_list('product_id', flat=True)
+            for product_id in list(overwritten):
+                CurrentPriceService.refresh(product_id, store.id)
+            return
+
+        history_ids = dict(PriceHistory.objects.filter(
+            product_id__in=product_ids, store=store, date_recorded=date_recorded
+        ).values_list('product_id', 'id'))
+        replaced = CurrentPrice.objects.select_for_update().filter(
+            product_id__in=product_ids, store=store
+        ).exclude(price_history_id__in=history_ids.values()).values_list('price_history_id', flat=True)
+        PriceHistory.objects.filter(id__in=list(replaced)).update(is_active=False)
+
+        CurrentPrice.objects.bulk_create(
+            [
+                CurrentPrice(
+                    product_id=price.product_id, store=store, price=price.price,
+                    date_recorded=date_recorded, price_history_id=price.id
+                )
+                for price in PriceHistory.objects.filter(id__in=history_ids.values()).only(
+                    'id', 'product_id', 'price'
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=['product', 'store'],
+            update_fields=['price', 'date_recorded', 'price_history', 'updated_at']
+        )
+
+
+@receiver(post_delete, sender=PriceHistory)
+def refresh_current_price_on_delete(sender, instance, **kwargs):
+    # Only an approved, active price can be current; its CurrentPrice row is
+    # already gone (cascade), so pick the next one if there is any
+    if instance.is_active and instance.is_approved:
+        CurrentPriceService.refresh(instance.product_id, instance.store_id)
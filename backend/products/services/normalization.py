@@ -0,0 +1,106 @@
+"""
+Canonical product name normalization
+backend/products/services/normalization.py
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+
+NormalizedName = namedtuple('NormalizedName', ['name', 'size', 'unit'])
+
+# Spellings of a unit -> canonical unit
+UNITS = {
+    'g': 'g', 'gm': 'g', 'gms': 'g', 'gr': 'g', 'grm': 'g', 'gram': 'g', 'grams': 'g',
+    'kg': 'kg', 'kgs': 'kg', 'kilo': 'kg', 'kilos': 'kg', 'kilogram': 'kg', 'kilograms': 'kg',
+    'mg': 'mg',
+    'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'oz': 'oz', 'ozs': 'oz', 'ounce': 'oz', 'ounces': 'oz',
+    'floz': 'floz',
+    'ml': 'ml', 'mls': 'ml', 'millilitre': 'ml', 'milliliter': 'ml',
+    'cl': 'cl',
+    'l': 'l', 'lt': 'l', 'ltr': 'l', 'ltrs': 'l', 'litre': 'l', 'litres': 'l', 'liter': 'l', 'liters': 'l',
+    'gal': 'gal', 'gallon': 'gal', 'gallons': 'gal',
+    'pk': 'pack', 'pck': 'pack', 'pack': 'pack', 'packs': 'pack',
+    'ct': 'ct', 'cnt': 'ct', 'count': 'ct', 'pc': 'ct', 'pcs': 'ct', 'piece': 'ct', 'pieces': 'ct',
+}
+
+COUNT_UNITS = {'pack', 'ct'}
+
+# Receipt abbreviations -> words, applied to whole tokens only
+ABBREVIATIONS = {
+    'bf': 'beef', 'bef': 'beef', 'chkn': 'chicken', 'chk': 'chicken', 'ckn': 'chicken',
+    'brd': 'bread', 'brst': 'breast', 'wht': 'white', 'whl': 'whole', 'mlk': 'milk',
+    'chs': 'cheese', 'chse': 'cheese', 'jce': 'juice', 'bev': 'beverage', 'veg': 'vegetable',
+    'org': 'organic', 'frz': 'frozen', 'frzn': 'frozen', 'fz': 'frozen', 'sml': 'small',
+    'lrg': 'large', 'med': 'medium', 'asst': 'assorted', 'bnls': 'boneless',
+    'sknls': 'skinless', 'crm': 'cream', 'choc': 'chocolate', 'strwb': 'strawberry',
+    'vnla': 'vanilla', 'ff': 'fat free', 'lf': 'low fat', 'w': 'with',
+}
+
+SIZE = re.compile(
+    r'(?<![\w.])(\d+(?:\.\d+)?)\s*(' + '|'.join(sorted(UNITS, key=len, reverse=True)) + r')(?![a-z])'
+)
+DECIMAL_COMMA = re.compile(r'(?<=\d),(?=\d)')
+NON_WORD = re.compile(r'[^a-z0-9.]+')
+STRAY_DOT = re.compile(r'(?<!\d)\.|\.(?!\d)')
+
+
+def fold(text):
+    """Lower-case and strip accents/compatibility forms ("Café" -> "cafe", "ﬁ" -> "fi")"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+@lru_cache(maxsize=8192)
+def parse_product_name(name):
+    """
+    Normalize a product name and pull out its size
+
+    Folds case and Unicode, drops punctuation, expands receipt abbreviations
+    and rewrites sizes canonically at the end of the name, so "GRACE CORNED
+    BF 340 GMS", "Grace Corned Beef (340g)" and "grace_corned_beef_340g" all
+    become "grace corned beef 340g". Normalizing a normalized name returns it
+    unchanged.
+
+    Args:
+        name: Product name as written on a receipt, in a fixture or by a user
+
+    Returns:
+        NormalizedName: (name, size as Decimal or None, canonical unit or ''),
+            size and unit being the first measure, or the first count if
+            there is no measure
+    """
+    text = DECIMAL_COMMA.sub('.', fold(name).replace('_', ' '))
+    text = NON_WORD.sub(' ', text)
+    text = STRAY_DOT.sub(' ', text)
+
+    # Measures (340g, 1.5l) first, then counts (6pack), each written
+    # canonically without trailing zeros: 1.50 -> 1.5
+    measures = []
+    counts = []
+    for match in SIZE.finditer(text):
+        try:
+            amount = Decimal(format(Decimal(match.group(1)).normalize(), 'f'))
+        except InvalidOperation:
+            continue
+        unit = UNITS[match.group(2)]
+        (counts if unit in COUNT_UNITS else measures).append((amount, unit))
+    text = SIZE.sub(' ', text)
+
+    words = []
+    for token in text.split():
+        words.extend(ABBREVIATIONS.get(token, token).split())
+    sizes = measures + counts
+    words.extend(f"{amount}{unit}" for amount, unit in sizes)
+
+    size, unit = sizes[0] if sizes else (None, '')
+    return NormalizedName(' '.join(words), size, unit)
+
+
+def normalize_product_name(name):
+    """Canonical matching key of a product name (see parse_product_name)"""
+    return parse_product_name(name or '').name
@@ -0,0 +1,73 @@
+"""
+Batch price comparison across stores
+backend/products/services/price_comparison.py
+"""
+
+import os
+from products.models import CurrentPrice
+
+
+class PriceComparisonService:
+    """Compare current prices of many products, one query per chunk of ids.
+
+    A request for up to COMPARE_CHUNK_SIZE products is a single query over
+    current_prices joined to products and stores; larger requests (up to
+    COMPARE_MAX_PRODUCTS) are answered chunk by chunk, so results can be
+    streamed while later chunks are still being read.
+    """
+
+    MAX_PRODUCTS = int(os.getenv('COMPARE_MAX_PRODUCTS', '1000'))
+    CHUNK_SIZE = int(os.getenv('COMPARE_CHUNK_SIZE', '500'))
+
+    @staticmethod
+    def _chunk_results(product_ids, include_unapproved):
+        rows = CurrentPrice.objects.filter(product_id__in=product_ids)
+        if not include_unapproved:
+            rows = rows.filter(product__is_approved=True, store__is_approved=True)
+        rows = rows.order_by('product_id', 'price', 'store_id').values_list(
+            'product_id', 'product__name', 'product__brand', 'store_id', 'store__name', 'price'
+        )
+
+        results = {}
+        for product_id, product_name, brand, store_id, store_name, price in rows:
+            result = results.get(product_id)
+            if result is None:
+                result = results[product_id] = {
+                    'product_id': product_id,
+                    'product_name': product_name,
+                    'brand': brand,
+                    'prices': []
+                }
+            result['prices'].append({
+                'store_id': store_id,
+                'store_name': store_name,
+                'price': float(price)
+            })
+
+        for result in results.values():
+            price_values = [p['price'] for p in result['prices']]
+            result['lowest_price'] = min(price_values)
+            result['highest_price'] = max(price_values)
+            result['price_difference'] = result['highest_price'] - result['lowest_price']
+        return results
+
+    @classmethod
+    def compare(cls, product_ids, include_unapproved=False):
+        """
+        Yield one comparison per product that has current prices
+
+        Args:
+            product_ids: Product ids, at most MAX_PRODUCTS; duplicates are compared once
+            include_unapproved: Staff view: unapproved products and stores too
+
+        Yields:
+            dict: product_id, product_name, brand, prices (cheapest first),
+                lowest_price, highest_price, price_difference; in request order
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        for start in range(0, len(product_ids), cls.CHUNK_SIZE):
+            chunk = product_ids[start:start + cls.CHUNK_SIZE]
+            results = cls._chunk_results(chunk, include_unapproved)
+            for product_id in chunk:
+                if product_id in results:
+                    yield results[product_id]
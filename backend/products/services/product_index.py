@@ -0,0 +1,238 @@
+"""
+In-memory trigram index for fuzzy product name matching
+backend/products/services/product_index.py
+"""
+
+import os
+import re
+import math
+import time
+import threading
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import Product
+from products.services.normalization import parse_product_name
+
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def trigrams(text):
+    """
+    Trigram set of a name, pg_trgm style
+
+    Each word is lower-cased and padded with two spaces in front and one
+    behind, so short words and word starts still produce trigrams.
+    """
+    grams = set()
+    for word in WORD.findall((text or '').lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class ProductTrigramIndex:
+    """Trigram inverted index over approved, active products.
+
+    lookup() scores names by Jaccard similarity of their trigram sets. Only
+    the rarest trigrams of the query are used to collect candidates: a product
+    reaching the similarity threshold must share at least ceil(t * |query|)
+    trigrams with the query, so it has to contain one of the
+    |query| - ceil(t * |query|) + 1 rarest ones. Candidates are verified
+    against their stored trigram sets, rarest posting list first, and a
+    lookup that runs past PRODUCT_INDEX_BUDGET_MS returns what it has found.
+
+    lookup() is loose (PRODUCT_MATCH_THRESHOLD) and only suggests possible
+    duplicates to staff. best_match() links receipt lines to products, so it
+    is strict: PRODUCT_LINK_THRESHOLD, and the same size, unit and number of
+    words, since "corned pork 340g" vs "corned beef 340g" or "cola 2l" vs
+    "cola 1l" are different products however similar the names look.
+
+    The index is built lazily on first use, kept current by Product signals
+    in this process, and rebuilt after PRODUCT_INDEX_TTL_SECONDS so other
+    processes' writes show up too.
+    """
+
+    def __init__(self, ttl_seconds=None, budget_ms=None, threshold=None, link_threshold=None):
+        self.ttl_seconds = ttl_seconds or float(os.getenv('PRODUCT_INDEX_TTL_SECONDS', '600'))
+        self.budget_ms = budget_ms or float(os.getenv('PRODUCT_INDEX_BUDGET_MS', '1.0'))
+        self.threshold = threshold or float(os.getenv('PRODUCT_MATCH_THRESHOLD', '0.5'))
+        self.link_threshold = link_threshold or float(os.getenv('PRODUCT_LINK_THRESHOLD', '0.85'))
+        self._lock = threading.RLock()
+        self._postings = {}  # trigram -> set of product ids
+        self._products = {}  # product id -> (name, brand_lower, trigram set)
+        self._built_at = None
+        self.lookups = 0
+        self.truncated = 0
+
+    # ---------------------------------------------------------------- building
+
+    def rebuild(self):
+        """Load every approved, active product"""
+        rows = Product.objects.filter(is_approved=True, is_active=True).values_list(
+            'id', 'normalized_name', 'brand'
+        )
+        postings = {}
+        products = {}
+        for product_id, normalized_name, brand in rows.iterator():
+            grams = trigrams(normalized_name)
+            products[product_id] = (normalized_name, (brand or '').lower(), grams)
+            for gram in grams:
+                postings.setdefault(gram, set()).add(product_id)
+
+        with self._lock:
+            self._postings = postings
+            self._products = products
+            self._built_at = time.monotonic()
+        return self
+
+    def _ensure_built(self):
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at >= self.ttl_seconds:
+            self.rebuild()
+
+    def add(self, product_id, normalized_name, brand=''):
+        """Index (or re-index) one product"""
+        with self._lock:
+            if self._built_at is None:
+                return  # picked up by the first build
+            self._remove(product_id)
+            grams = trigrams(normalized_name)
+            self._products[product_id] = (normalized_name, (brand or '').lower(), grams)
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(product_id)
+
+    def remove(self, product_id):
+        """Drop one product from the index"""
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+        for gram in entry[2]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def sync(self, product):
+        """Add or remove a product depending on whether it should be matchable"""
+        if product.is_approved and product.is_active:
+            self.add(product.id, product.normalized_name, product.brand)
+        else:
+            self.remove(product.id)
+
+    # ----------------------------------------------------------------- lookups
+
+    def lookup(self, name, brand='', threshold=None, limit=5, exclude_id=None):
+        """
+        Approved products whose names are similar to `name`
+
+        Args:
+            name: Product name as read from a receipt (or a product's normalized name)
+            brand: When given, products with a different (non-empty) brand are skipped
+            threshold: Minimum similarity, default PRODUCT_MATCH_THRESHOLD
+            limit: Maximum number of matches
+            exclude_id: Product id to leave out (e.g. the product itself)
+
+        Returns:
+            list of (product_id, similarity) pairs, best first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        query = trigrams(name)
+        if not query:
+            return []
+
+        self._ensure_built()
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        brand = (brand or '').lower()
+
+        with self._lock:
+            self.lookups += 1
+            postings = self._postings
+            products = self._products
+
+            # Rarest first; trigrams nobody has can't produce candidates
+            ranked = sorted((gram for gram in query if gram in postings), key=lambda gram: len(postings[gram]))
+            prefix = max(len(query) - math.ceil(threshold * len(query)) + 1, 1)
+            query_size = len(query)
+            min_size = threshold * query_size
+            max_size = query_size / threshold if threshold else float('inf')
+
+            # Candidates sharing the rarest trigrams are verified first, so a
+            # lookup cut short by the budget has still seen the likeliest ones
+            matches = []
+            seen = set() if exclude_id is None else {exclude_id}
+            for gram in ranked[:prefix]:
+                new_ids = postings[gram] - seen
+                seen |= new_ids
+                for checked, product_id in enumerate(new_ids):
+                    if checked % 64 == 63 and time.perf_counter() > deadline:
+                        break
+                    _, product_brand, grams = products[product_id]
+                    if not min_size <= len(grams) <= max_size:
+                        continue
+                    if brand and product_brand and product_brand != brand:
+                        continue
+                    overlap = len(query & grams)
+                    similarity = overlap / (query_size + len(grams) - overlap)
+                    if similarity >= threshold:
+                        matches.append((product_id, round(similarity, 4)))
+                if time.perf_counter() > deadline:
+                    self.truncated += 1
+                    break
+
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+    def best_match(self, name, brand='', threshold=None):
+        """
+        (product_id, similarity) of the approved product `name` can safely be
+        linked to, or None
+
+        Args:
+            name: Normalized product name read from a receipt
+            brand: When given, products with a different (non-empty) brand are skipped
+            threshold: Minimum similarity, default PRODUCT_LINK_THRESHOLD
+        """
+        threshold = self.link_threshold if threshold is None else threshold
+        wanted = parse_product_name(name)
+        words = len(wanted.name.split())
+        for product_id, similarity in self.lookup(name, brand=brand, threshold=threshold):
+            entry = self._products.get(product_id)
+            if entry is None:
+                continue
+            candidate = parse_product_name(entry[0])
+            if (candidate.size, candidate.unit) == (wanted.size, wanted.unit) \
+                    and len(candidate.name.split()) == words:
+                return product_id, similarity
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'products': len(self._products),
+                'trigrams': len(self._postings),
+                'lookups': self.lookups,
+                'truncated': self.truncated,
+            }
+
+
+# Shared by the receipt pipeline and the admin views in this process
+product_index = ProductTrigramIndex()
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, **kwargs):
+    transaction.on_commit(lambda: product_index.sync(instance))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    product_id = instance.id
+    transaction.on_commit(lambda: product_index.remove(product_id))
@@ -0,0 +1,132 @@
+"""
+Ranked full-text product search
+backend/products/services/product_search.py
+"""
+
+import re
+from django.db import connection, DatabaseError
+from products.services.normalization import fold, normalize_product_name
+
+
+TOKEN = re.compile(r'[^\W_]+')
+
+# Words of a query that go into the MATCH expression; more add little
+MAX_TOKENS = 8
+
+
+class ProductSearchService:
+    """BM25-ranked prefix search over the product_search FTS5 table.
+
+    The table (name, aliases = normalized name, brand, category, barcode) is
+    created by migration products 0005 and kept current by triggers on the
+    products and categories tables, so bulk writes are indexed too. Every
+    query word is matched as a prefix; the normalized form of the query is
+    tried as an alternative, so "corned bf" also finds "corned beef".
+
+    Only SQLite with FTS5 has the table; search() returns None elsewhere and
+    callers fall back to icontains filtering.
+    """
+
+    _available = None
+
+    @classmethod
+    def available(cls):
+        """Whether the product_search table exists in this database"""
+        if cls._available is None:
+            if connection.vendor != 'sqlite':
+                cls._available = False
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_search'"
+                    )
+                    cls._available = cursor.fetchone() is not None
+        return cls._available
+
+    @staticmethod
+    def match_expression(query):
+        """
+        FTS5 MATCH expression for a user query
+
+        Args:
+            query: Text as typed by the user
+
+        Returns:
+            str: e.g. '("corned"* "bf"*) OR ("corned"* "beef"*)', or '' if the
+                query has no words
+        """
+        alternatives = []
+        for text in (fold(query), normalize_product_name(query)):
+            tokens = TOKEN.findall(text)[:MAX_TOKENS]
+            if tokens:
+                # Words only contain letters and digits, so quoting is safe
+                expression = '(' + ' '.join(f'"{token}"*' for token in tokens) + ')'
+                if expression not in alternatives:
+                    alternatives.append(expression)
+        return ' OR '.join(alternatives)
+
+    @classmethod
+    def search(cls, query, approved_only=True, category_id=None, store_id=None, limit=20):
+        """
+        Ids of active products matching a query, best match first
+
+        Args:
+            query: Text as typed by the user
+            approved_only: Leave out unapproved products
+            category_id: Only products in this category
+            store_id: Only products with a current price at this store
+            limit: Maximum number of ids
+
+        Returns:
+            list of product ids, or None if full-text search can't be used
+        """
+        expression = cls.match_expression(query)
+        if not expression or not cls.available():
+            return None
+
+        sql = [
+            'SELECT p.id FROM product_search',
+            'JOIN products p ON p.id = product_search.rowid',
+            'WHERE product_search MATCH %s AND p.is_active',
+        ]
+        params = [expression]
+        if approved_only:
+            sql.append('AND p.is_approved')
+        if category_id is not None:
+            sql.append('AND p.category_id = %s')
+            params.append(category_id)
+        if store_id is not None:
+            sql.append('AND EXISTS (SELECT 1 FROM current_prices cp WHERE cp.product_id = p.id AND cp.store_id = %s)')
+            params.append(store_id)
+        sql.append('ORDER BY product_search.rank LIMIT %s')
+        params.append(limit)
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(' '.join(sql), params)
+                return [row[0] for row in cursor.fetchall()]
+        except DatabaseError as e:
+            print(f"Full-text product search failed, using icontains: {str(e)}")
+            return None
+
+    @staticmethod
+    def rebuild():
+        """
+        Re-index every product (after restoring a database without the triggers, say)
+
+        Returns:
+            int: Number of products indexed
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM product_search')
+            cursor.execute(
+                """
+                INSERT INTO product_search(rowid, name, aliases, brand, category, barcode)
+                SELECT p.id, p.name, p.normalized_name, p.brand, coalesce(c.name, ''), coalesce(p.barcode, '')
+                FROM products p LEFT JOIN categories c ON c.id = p.category_id
+                """
+            )
+            indexed = cursor.rowcount
+            # Merge the index b-trees written by the bulk insert
+            cursor.execute("INSERT INTO product_search(product_search) VALUES ('optimize')")
+        return indexed
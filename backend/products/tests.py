@@ -1,3 +1,289 @@
-from django.test import TestCase
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from .models import Store, Category, Product, PriceHistory
+from .services.product_search import ProductSearchService
+from .services.autocomplete import ProductAutocompleteIndex
+from .services.product_index import ProductTrigramIndex
+from .services.price_comparison import PriceComparisonService
+from .services.normalization import normalize_product_name, parse_product_name
+from receipts.models import Receipt, ReceiptItem
 
-# Create your tests here.
+
+class PricedProductsMixin:
+    """A regular user, three approved stores and helpers to add priced products"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budget', password='budget-pass')
+        self.staff = User.objects.create_user(username='staff', password='staff-pass', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stores = [Store.objects.create(name=f'Store {i}', is_approved=True) for i in range(3)]
+        self.category = Category.objects.create(name='Dairy', is_approved=True)
+
+    def add_products(self, count, start=0):
+        for i in range(start, start + count):
+            product = Product.objects.create(name=f'Product {i:03d}', category=self.category, is_approved=True)
+            for n, store in enumerate(self.stores):
+                PriceHistory.objects.create(
+                    product=product, store=store, price=Decimal('10.00') - n,
+                    is_active=True, is_approved=True, created_by=self.staff
+                )
+
+
+class ProductListQueryBudgetTests(PricedProductsMixin, TestCase):
+    """Product listings read lowest prices from annotations, not one query per row"""
+
+    def test_product_list_query_count_does_not_grow_with_page_size(self):
+        self.add_products(1)
+        # Page COUNT and page SELECT with the lowest price subqueries
+        with self.assertNumQueries(2):
+            self.client.get('/api/products/products/')
+        self.add_products(19, start=1)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/products/products/')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertTrue(all(product['lowest_price'] == 8.0 for product in response.data['results']))
+
+    def test_search_reads_annotated_lowest_price(self):
+        self.add_products(5)
+        ProductSearchService.available()
+        # Ranked ids from the full-text index, then the products
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/products/products/search/', {'query': 'product'}, format='json')
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(response.data[0]['lowest_price'], 8.0)
+
+    def test_lowest_price_follows_new_approved_price(self):
+        self.add_products(1)
+        product = Product.objects.get()
+        PriceHistory.objects.create(
+            product=product, store=self.stores[0], price=Decimal('2.50'),
+            date_recorded='2030-01-01', is_active=True, is_approved=True
+        )
+        annotated = Product.objects.with_lowest_price().get(id=product.id)
+        self.assertEqual(annotated.lowest_price_amount, Decimal('2.50'))
+        self.assertEqual(annotated.lowest_price_store_id, self.stores[0].id)
+        self.assertEqual(product.get_lowest_price().price, Decimal('2.50'))
+
+
+class ProductMatchTests(TestCase):
+    """Receipt lines link only to near-identical products of the same size"""
+
+    def setUp(self):
+        for name in ('Grace Corned Beef 340g', 'Coca Cola 1L', 'Serge Island Milk Lite 1L'):
+            Product.objects.create(name=name, is_approved=True)
+        self.index = ProductTrigramIndex(threshold=0.5, link_threshold=0.85).rebuild()
+
+    def best_match(self, name):
+        match = self.index.best_match(normalize_product_name(name))
+        return match and Product.objects.get(id=match[0]).name
+
+    def test_ocr_misread_links_to_product(self):
+        self.assertEqual(self.best_match('Grace Cornedd Beef 340g'), 'Grace Corned Beef 340g')
+
+    def test_similar_names_of_different_products_do_not_link(self):
+        self.assertIsNone(self.best_match('Grace Corned Pork 340g'))
+        self.assertIsNone(self.best_match('Coca Cola 2L'))
+        self.assertIsNone(self.best_match('Serge Island Milk 1L'))
+        # They are still shown to staff as possible duplicates
+        self.assertTrue(self.index.lookup(normalize_product_name('Coca Cola 2L')))
+
+    def test_possible_duplicates_rejects_bad_parameters(self):
+        staff = User.objects.create_user(username='staff', password='staff-pass', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        url = '/api/products/admin/possible-duplicates/'
+        for params in ({'product_id': 'abc'}, {'limit': '-1'}, {'threshold': '1.5'}):
+            self.assertEqual(client.get(url, params).status_code, 400)
+        self.assertEqual(client.get(url, {'product_id': '1', 'limit': '3'}).status_code, 200)
+
+
+class NormalizationTests(SimpleTestCase):
+    """Receipt, fixture and user spellings of a product get one matching key"""
+
+    CASES = [
+        # name, normalized name, size, unit
+        ('GRACE CORNED BF 340 GMS', 'grace corned beef 340g', Decimal('340'), 'g'),
+        ('Grace Corned Beef (340g)', 'grace corned beef 340g', Decimal('340'), 'g'),
+        ('grace_corned_beef_340g', 'grace corned beef 340g', Decimal('340'), 'g'),
+        ('WHL MLK 1,50 L', 'whole milk 1.5l', Decimal('1.5'), 'l'),
+        ('Chkn Brst Bnls 2.5 LBS', 'chicken breast boneless 2.5lb', Decimal('2.5'), 'lb'),
+        ('FF YOGURT 500 g', 'fat free yogurt 500g', Decimal('500'), 'g'),
+        ('ORANGE JCE 1 Ltr', 'orange juice 1l', Decimal('1'), 'l'),
+        ('Café Crème 6 PK 330ml', 'cafe creme 330ml 6pack', Decimal('330'), 'ml'),
+        ('Bread', 'bread', None, ''),
+        ('', '', None, ''),
+    ]
+
+    def test_names_are_normalized(self):
+        for name, normalized, size, unit in self.CASES:
+            with self.subTest(name=name):
+                self.assertEqual(tuple(parse_product_name(name)), (normalized, size, unit))
+                self.assertEqual(normalize_product_name(name), normalized)
+
+    def test_normalizing_is_idempotent(self):
+        for name, normalized, size, unit in self.CASES:
+            with self.subTest(name=name):
+                self.assertEqual(tuple(parse_product_name(normalized)), (normalized, size, unit))
+
+    def test_abbreviations_only_expand_whole_words(self):
+        self.assertEqual(normalize_product_name('BF BURGER'), 'beef burger')
+        self.assertEqual(normalize_product_name('BFAST CEREAL'), 'bfast cereal')
+        self.assertEqual(normalize_product_name(None), '')
+
+
+class BackfillNormalizedNamesCommandTests(TestCase):
+    """backfill_normalized_names rewrites stale keys in chunks and reports shared ones"""
+
+    NAMES = ['Grace Corned Beef 340g', 'GRACE CORNED BF 340 GMS', 'WHL MLK 1,50 L', 'Coca Cola 1L', 'Bread']
+
+    def setUp(self):
+        for name in self.NAMES:
+            Product.objects.create(name=name, is_approved=True)
+        Product.objects.update(normalized_name='stale')
+        user = User.objects.create_user(username='backfill', password='backfill-pass')
+        receipt = Receipt.objects.create(user=user)
+        ReceiptItem.objects.create(
+            receipt=receipt, product_name='WHL MLK 1,50 L',
+            quantity=1, unit_price=Decimal('1.00'), total_price=Decimal('1.00')
+        )
+        ReceiptItem.objects.update(normalized_name='stale')
+
+    def backfill(self, *args):
+        out = StringIO()
+        call_command('backfill_normalized_names', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_writes_nothing(self):
+        out = self.backfill('--dry-run')
+        self.assertIn('Products: 5 of 5 normalized name(s) would change', out)
+        self.assertIn('Receipt items: 1 of 1 normalized name(s) would change', out)
+        self.assertNotIn('shared', out)
+        self.assertEqual(set(Product.objects.values_list('normalized_name', flat=True)), {'stale'})
+        self.assertEqual(ReceiptItem.objects.get().normalized_name, 'stale')
+
+    def test_backfill_updates_in_chunks_and_reports_shared_keys(self):
+        with mock.patch.object(Product.objects, 'bulk_update', wraps=Product.objects.bulk_update) as bulk_update:
+            out = self.backfill('--chunk-size', '2')
+
+        self.assertEqual([len(call.args[0]) for call in bulk_update.call_args_list], [2, 2, 1])
+        self.assertIn('Products: 5 of 5 normalized name(s) updated', out)
+        self.assertIn('Receipt items: 1 of 1 normalized name(s) updated', out)
+        self.assertIn('1 normalized name/brand pair(s) are shared by several approved products', out)
+        self.assertEqual(
+            sorted(Product.objects.values_list('normalized_name', flat=True)),
+            ['bread', 'coca cola 1l', 'grace corned beef 340g', 'grace corned beef 340g', 'whole milk 1.5l']
+        )
+        self.assertEqual(ReceiptItem.objects.get().normalized_name, 'whole milk 1.5l')
+
+        out = self.backfill('--only', 'products')
+        self.assertIn('Products: 0 of 5 normalized name(s) updated', out)
+        self.assertNotIn('Receipt items', out)
+
+
+class ProductSearchTests(TestCase):
+    """Full-text product search: prefixes, normalized aliases, ranking and sync"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='search', password='search-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.meat = Category.objects.create(name='Meat', is_approved=True)
+
+    def search(self, query):
+        response = self.client.post('/api/products/products/search/', {'query': query}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [product['name'] for product in response.data]
+
+    def test_prefix_and_abbreviation_match(self):
+        Product.objects.create(name='Grace Corned Beef 340g', brand='Grace', is_approved=True)
+        Product.objects.create(name='Lasco Food Drink', brand='Lasco', is_approved=True)
+        self.assertEqual(self.search('gra corn'), ['Grace Corned Beef 340g'])
+        self.assertEqual(self.search('CORNED BF'), ['Grace Corned Beef 340g'])
+
+    def test_name_matches_rank_above_brand_and_category_matches(self):
+        Product.objects.create(name='Sausage Links', brand='Grace', category=self.meat, is_approved=True)
+        Product.objects.create(name='Grace Sausage', is_approved=True)
+        self.assertEqual(self.search('grace'), ['Grace Sausage', 'Sausage Links'])
+        self.assertEqual(self.search('meat'), ['Sausage Links'])
+
+    def test_unapproved_products_are_hidden_from_regular_users(self):
+        Product.objects.create(name='Pending Patty', is_approved=False)
+        self.assertEqual(self.search('patty'), [])
+
+    def test_index_follows_renames_and_deletes(self):
+        product = Product.objects.create(name='Old Name', is_approved=True)
+        product.name = 'Bulla Cake'
+        product.save()
+        self.assertEqual(self.search('old name'), [])
+        self.assertEqual(self.search('bulla'), ['Bulla Cake'])
+        product.delete()
+        self.assertEqual(self.search('bulla'), [])
+
+
+class ProductAutocompleteIndexTests(TestCase):
+    """Prefix suggestions ranked by popularity, kept current without rebuilding"""
+
+    def setUp(self):
+        from receipts.models import Receipt, ReceiptItem
+
+        user = User.objects.create_user(username='autocomplete', password='autocomplete-pass')
+        self.popular = Product.objects.create(name='Corned Beef Hash', is_approved=True)
+        self.plain = Product.objects.create(name='Cornmeal', is_approved=True)
+        Product.objects.create(name='Grace Corned Beef', is_approved=False)
+        receipt = Receipt.objects.create(user=user, status='completed')
+        ReceiptItem.objects.create(
+            receipt=receipt, product=self.popular, product_name='CORNED BEEF HASH',
+            quantity=1, unit_price=Decimal('1.00'), total_price=Decimal('1.00')
+        )
+        self.index = ProductAutocompleteIndex().rebuild()
+
+    def suggest(self, query):
+        return [product_id for product_id, _, _ in self.index.lookup(query)]
+
+    def test_prefixes_rank_popular_products_first(self):
+        self.assertEqual(self.suggest('corn'), [self.popular.id, self.plain.id])
+        self.assertEqual(self.suggest('BEEF'), [self.popular.id])
+        self.assertEqual(self.suggest('corned bf'), [self.popular.id])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_saved_and_deleted_products_show_without_rebuild(self):
+        added = Product.objects.create(name='Cornflakes', is_approved=True)
+        self.index.sync(added)
+        self.assertEqual(self.suggest('cornf'), [added.id])
+        self.assertEqual(self.suggest('corn'), [self.popular.id, self.plain.id, added.id])
+        self.index.remove(self.popular.id)
+        self.assertEqual(self.suggest('corn'), [self.plain.id, added.id])
+
+
+class CompareMultipleProductsTests(PricedProductsMixin, TestCase):
+    """Batch comparison reads all requested products' prices in one query"""
+
+    url = '/api/products/products/compare-multiple/'
+
+    def test_comparison_is_one_query(self):
+        self.add_products(30)
+        product_ids = list(Product.objects.order_by('-id').values_list('id', flat=True))
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {'product_ids': product_ids}, format='json')
+        results = response.data['results']
+        self.assertEqual([result['product_id'] for result in results], product_ids)
+        self.assertEqual(results[0]['lowest_price'], 8.0)
+        self.assertEqual(results[0]['price_difference'], 2.0)
+
+    def test_streamed_comparison(self):
+        self.add_products(3)
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        response = self.client.post(self.url + '?stream=true', {'product_ids': product_ids}, format='json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+
+    def test_request_over_the_cap_is_rejected(self):
+        product_ids = list(range(PriceComparisonService.MAX_PRODUCTS + 1))
+        response = self.client.post(self.url, {'product_ids': product_ids}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -39,6 +39,7 @@ urlpatterns = [
     path('products/<int:product_id>/update/', views.update_product, name='update_product'),
     path('products/<int:product_id>/delete/', views.delete_product, name='delete_product'),
     path('products/search/', views.search_products, name='search_products'),
+    path('products/autocomplete/', views.autocomplete_products, name='autocomplete_products'),
     
     # ============= PRICE ENDPOINTS =============
     path('prices/', views.get_all_prices, name='get_all_prices'), 
@@ -58,4 +59,5 @@ urlpatterns = [
     # ============= ADMIN DASHBOARD ENDPOINTS =============
     path('admin/pending-count/', views.get_pending_approvals_count, name='get_pending_approvals_count'),
     path('admin/pending-items/', views.get_all_pending_items, name='get_all_pending_items'),
+    path('admin/possible-duplicates/', views.get_possible_duplicates, name='get_possible_duplicates'),
 ]
\ No newline at end of file
@@ -3,10 +3,12 @@ Views for products app with complete approval workflow
 backend/products/views.py
 """
 
+import json
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from .models import Store, Category, Product, PriceHistory
@@ -23,6 +25,11 @@ from .serializers import (
     AddPriceSerializer,
     ProductSearchSerializer
 )
+from .services.normalization import normalize_product_name
+from .services.product_index import product_index
+from .services.autocomplete import autocomplete_index
+from .services.price_comparison import PriceComparisonService
+from .services.product_search import ProductSearchService
 
 
 # ===================== STORE VIEWS =====================
@@ -296,7 +303,7 @@ def get_products(request):
     else:
         products = Product.objects.filter(is_active=True, is_approved=True)
     
-    products = products.select_related('category').order_by('name')
+    products = products.select_related('category').with_lowest_price().order_by('name')
     
     # Apply filters
     category_id = request.query_params.get('category')
@@ -328,7 +335,7 @@ def get_pending_products(request):
     products = Product.objects.filter(
         is_active=True, 
         is_approved=False
-    ).select_related('category').order_by('-created_at')
+    ).select_related('category').with_lowest_price().order_by('-created_at')
     
     serializer = ProductListSerializer(products, many=True)
     return Response(serializer.data)
@@ -447,6 +454,20 @@ def search_products(request):
     category_id = serializer.validated_data.get('category')
     store_id = serializer.validated_data.get('store')
     
+    # Ranked full-text search where the index exists
+    product_ids = ProductSearchService.search(
+        query,
+        approved_only=not request.user.is_staff,
+        category_id=category_id,
+        store_id=store_id,
+        limit=20
+    )
+    if product_ids is not None:
+        found = Product.objects.select_related('category').with_lowest_price().in_bulk(product_ids)
+        products = [found[product_id] for product_id in product_ids if product_id in found]
+        serializer = ProductListSerializer(products, many=True)
+        return Response(serializer.data)
+    
     # Build base query
     if request.user.is_staff:
         products = Product.objects.filter(is_active=True)
@@ -456,7 +477,7 @@ def search_products(request):
     # Apply search filters
     products = products.filter(
         Q(name__icontains=query) |
-        Q(normalized_name__icontains=query) |
+        Q(normalized_name__icontains=normalize_product_name(query) or query) |
         Q(brand__icontains=query) |
         Q(barcode__icontains=query)
     )
@@ -465,18 +486,36 @@ def search_products(request):
         products = products.filter(category_id=category_id)
     
     if store_id:
-        products = products.filter(
-            price_history__store_id=store_id, 
-            price_history__is_active=True,
-            price_history__is_approved=True
-        ).distinct()
+        # At most one current price per product and store, so no duplicates
+        products = products.filter(current_prices__store_id=store_id)
     
-    products = products.select_related('category')[:20]
+    products = products.select_related('category').with_lowest_price()[:20]
     
     serializer = ProductListSerializer(products, many=True)
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def autocomplete_products(request):
+    """Suggest approved products for a partly typed name, most popular first"""
+    query = request.query_params.get('q', '')
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        return Response(
+            {'error': 'limit must be a number'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Answered from memory, see ProductAutocompleteIndex
+    suggestions = autocomplete_index.lookup(query, limit=max(limit, 1))
+    return Response([
+        {'id': product_id, 'name': name, 'brand': brand}
+        for product_id, name, brand in suggestions
+    ])
+
+
 # ===================== PRICE VIEWS =====================
 
 @api_view(['GET'])
@@ -692,20 +731,13 @@ def compare_product_prices(request, product_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Get active approved prices for all approved stores
-    if request.user.is_staff:
-        active_prices = product.price_history.filter(
-            is_active=True,
-            is_approved=True
-        ).select_related('store')
-    else:
-        active_prices = product.price_history.filter(
-            is_active=True,
-            is_approved=True,
-            store__is_approved=True
-        ).select_related('store')
+    # Current approved prices, at approved stores for regular users
+    active_prices = product.current_prices.select_related('store')
+    if not request.user.is_staff:
+        active_prices = active_prices.filter(store__is_approved=True)
+    active_prices = list(active_prices)
     
-    if not active_prices.exists():
+    if not active_prices:
         return Response({
             'message': 'No prices available for this product',
             'product_id': product_id,
@@ -747,63 +779,43 @@ def compare_product_prices(request, product_id):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def compare_multiple_products(request):
-    """Compare approved prices for multiple products across stores"""
+    """Compare approved prices for multiple products across stores
+
+    Pass ?stream=true to receive one JSON result per line (NDJSON) as each
+    chunk of products is read, instead of a single {"results": [...]} body.
+    """
     product_ids = request.data.get('product_ids', [])
     
-    if not product_ids:
+    if not product_ids or not isinstance(product_ids, list):
         return Response(
             {'error': 'product_ids array is required'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    results = []
-    for product_id in product_ids:
-        try:
-            product = Product.objects.get(id=product_id)
-            
-            # Skip unapproved products for regular users
-            if not request.user.is_staff and not product.is_approved:
-                continue
-            
-            # Get active approved prices for approved stores
-            if request.user.is_staff:
-                active_prices = product.price_history.filter(
-                    is_active=True,
-                    is_approved=True
-                ).select_related('store')
-            else:
-                active_prices = product.price_history.filter(
-                    is_active=True,
-                    is_approved=True,
-                    store__is_approved=True
-                ).select_related('store')
-            
-            if active_prices.exists():
-                prices_data = []
-                for price in active_prices:
-                    prices_data.append({
-                        'store_id': price.store.id,
-                        'store_name': price.store.name,
-                        'price': float(price.price)
-                    })
-                
-                price_values = [p['price'] for p in prices_data]
-                lowest = min(price_values)
-                highest = max(price_values)
-                
-                results.append({
-                    'product_id': product.id,
-                    'product_name': product.name,
-                    'brand': product.brand,
-                    'prices': prices_data,
-                    'lowest_price': lowest,
-                    'highest_price': highest,
-                    'price_difference': highest - lowest
-                })
-        except Product.DoesNotExist:
-            continue
-    
-    return Response({'results': results})
+    try:
+        product_ids = [int(product_id) for product_id in product_ids]
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'product_ids must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if len(product_ids) > PriceComparisonService.MAX_PRODUCTS:
+        return Response(
+            {'error': f'At most {PriceComparisonService.MAX_PRODUCTS} products can be compared at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Unapproved products and stores are skipped for regular users
+    results = PriceComparisonService.compare(product_ids, include_unapproved=request.user.is_staff)
+    
+    if request.query_params.get('stream', '').lower() in ('1', 'true'):
+        return StreamingHttpResponse(
+            (json.dumps(result) + '\n' for result in results),
+            content_type='application/x-ndjson'
+        )
+    
+    return Response({'results': list(results)})
 
 
 # ===================== ADMIN DASHBOARD VIEWS =====================
@@ -865,4 +877,84 @@ def get_all_pending_items(request):
         'categories': CategorySerializer(pending_categories, many=True).data,
         'products': ProductSerializer(pending_products, many=True).data,
         'prices': PriceHistorySerializer(pending_prices, many=True).data,
-    })
\ No newline at end of file
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_possible_duplicates(request):
+    """Pending products that look like approved ones - staff only
+
+    Query params:
+        product_id: Only check this product
+        threshold: Minimum similarity (0-1), default PRODUCT_MATCH_THRESHOLD
+        limit: Matches per product (default 5)
+    """
+    if not request.user.is_staff:
+        return Response(
+            {'error': 'Only staff can view possible duplicates'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    try:
+        threshold = float(request.query_params.get('threshold', product_index.threshold))
+        limit = min(int(request.query_params.get('limit', 5)), 20)
+        product_id = request.query_params.get('product_id')
+        if product_id:
+            product_id = int(product_id)
+    except ValueError:
+        return Response(
+            {'error': 'threshold, limit and product_id must be numbers'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if not 0 < threshold <= 1 or limit < 1:
+        return Response(
+            {'error': 'threshold must be between 0 and 1 and limit must be positive'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    pending = Product.objects.filter(
+        is_active=True, 
+        is_approved=False
+    ).select_related('category').with_lowest_price().order_by('-created_at')
+    
+    if product_id:
+        pending = pending.filter(id=product_id)
+    
+    # Match in memory first, then load every matched product in one query
+    candidates = []
+    for product in pending[:200]:
+        matches = product_index.lookup(
+            product.normalized_name or product.name,
+            brand=product.brand,
+            threshold=threshold,
+            limit=limit,
+            exclude_id=product.id
+        )
+        if matches:
+            candidates.append((product, matches))
+    
+    matched = Product.objects.select_related('category').with_lowest_price().in_bulk(
+        {match_id for _, matches in candidates for match_id, _ in matches}
+    )
+    
+    results = []
+    for product, matches in candidates:
+        results.append({
+            'product': ProductListSerializer(product).data,
+            'matches': [
+                {
+                    'product': ProductListSerializer(matched[match_id]).data,
+                    'similarity': similarity
+                }
+                for match_id, similarity in matches
+                if match_id in matched
+            ]
+        })
+    
+    return Response({
+        'count': len(results),
+        'threshold': threshold,
+        'results': results
+    })
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ReceiptsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'receipts'
+
+    def ready(self):
+        # Connect the catalog resolver's invalidation signals
+        from receipts.services import catalog_resolver  # noqa: F401
+        # Keep monthly spending rollups in step with receipts
+        from receipts.services import spending_rollups  # noqa: F401
+        # Drop cached statistics when a user's receipts change
+        from receipts.services import receipt_stats  # noqa: F401
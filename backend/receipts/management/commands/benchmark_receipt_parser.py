@@ -0,0 +1,136 @@
+"""
+Management command to benchmark receipt parsers against the golden corpus
+receipts/management/commands/benchmark_receipt_parser.py
+
+python manage.py benchmark_receipt_parser
+python manage.py benchmark_receipt_parser --parser reference --iterations 50
+python manage.py benchmark_receipt_parser --parser fallback --iterations 1
+python manage.py benchmark_receipt_parser --min-accuracy 0.95 --json
+python manage.py benchmark_receipt_parser --write-golden
+"""
+
+import json
+from django.core.management.base import BaseCommand, CommandError
+from receipts.services.parser_benchmark import (
+    ParserBenchmark, get_parse_function, load_corpus, to_golden
+)
+
+
+PARSERS = ['reference', 'fallback']
+
+
+class Command(BaseCommand):
+    help = 'Measure receipt parser latency, throughput and field-level accuracy on the corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--parser',
+            action='append',
+            choices=PARSERS,
+            help='Parser to benchmark (repeatable, default: reference)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Timed parses per sample'
+        )
+        parser.add_argument(
+            '--corpus',
+            help='Corpus directory (default: receipts/benchmarks/corpus)'
+        )
+        parser.add_argument(
+            '--min-accuracy',
+            type=float,
+            help='Fail if any parser scores below this field-level accuracy (0-1)'
+        )
+        parser.add_argument(
+            '--verbose-mismatches',
+            action='store_true',
+            help='List every mismatching field'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the full report as JSON'
+        )
+        parser.add_argument(
+            '--write-golden',
+            action='store_true',
+            help='Write missing golden files from the reference parser output, then exit'
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='With --write-golden, also replace existing golden files'
+        )
+
+    def handle(self, *args, **options):
+        samples = load_corpus(options['corpus'])
+        if not samples:
+            raise CommandError('No corpus samples found')
+
+        if options['write_golden']:
+            self._write_golden(samples, options['overwrite'])
+            return
+
+        reports = {}
+        for parser_name in options['parser'] or ['reference']:
+            benchmark = ParserBenchmark(
+                get_parse_function(parser_name),
+                iterations=options['iterations'],
+                quiet=parser_name == 'fallback'
+            )
+            reports[parser_name] = benchmark.run(samples)
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+        else:
+            for parser_name, report in reports.items():
+                self._print_report(parser_name, report, options['verbose_mismatches'])
+
+        min_accuracy = options['min_accuracy']
+        if min_accuracy is not None:
+            failing = [
+                f"{name} ({report['accuracy']})"
+                for name, report in reports.items()
+                if report['accuracy'] is not None and report['accuracy'] < min_accuracy
+            ]
+            if failing:
+                raise CommandError(f"Accuracy below {min_accuracy}: {', '.join(failing)}")
+
+    def _print_report(self, parser_name, report, verbose):
+        accuracy = report['accuracy']
+        accuracy_text = f"{accuracy:.2%}" if accuracy is not None else 'n/a (no golden files)'
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{parser_name}: p50 {report['p50_ms']:.3f}ms, p99 {report['p99_ms']:.3f}ms, "
+            f"{report['receipts_per_second']:.0f} receipts/s, accuracy {accuracy_text} "
+            f"({report['fields_matched']}/{report['fields_total']} fields)"
+        ))
+        for sample in report['per_sample']:
+            sample_accuracy = f"{sample['accuracy']:.2%}" if sample['accuracy'] is not None else 'n/a'
+            self.stdout.write(
+                f"  {sample['name']:<32} p50 {sample['p50_ms']:>8.3f}ms  p99 {sample['p99_ms']:>8.3f}ms  "
+                f"items {sample['items']:>3}  accuracy {sample_accuracy}"
+            )
+            mismatches = sample['mismatches'] if verbose else sample['mismatches'][:3]
+            for mismatch in mismatches:
+                self.stdout.write(self.style.WARNING(f"    {mismatch}"))
+            if len(sample['mismatches']) > len(mismatches):
+                self.stdout.write(f"    ... {len(sample['mismatches']) - len(mismatches)} more")
+
+    def _write_golden(self, samples, overwrite):
+        parse = get_parse_function('reference')
+        written = 0
+        for sample in samples:
+            if sample['golden'] is not None and not overwrite:
+                continue
+            golden = to_golden(parse(sample['text']))
+            sample['golden_path'].write_text(json.dumps(golden, indent=2) + '\n', encoding='utf-8')
+            written += 1
+            self.stdout.write(f"Wrote {sample['golden_path'].name}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} golden file(s) written; review them before committing"
+        ))
@@ -0,0 +1,39 @@
+"""
+Management command to generate receipt thumbnails ahead of time
+receipts/management/commands/generate_receipt_thumbnails.py
+
+python manage.py generate_receipt_thumbnails
+python manage.py generate_receipt_thumbnails --force
+"""
+
+from django.core.management.base import BaseCommand
+from receipts.models import Receipt
+from receipts.services.thumbnails import ReceiptThumbnailService
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails for receipts that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate thumbnails for every receipt'
+        )
+
+    def handle(self, *args, **options):
+        receipts = Receipt.objects.exclude(receipt_image='')
+        if not options['force']:
+            receipts = receipts.filter(thumbnails_ready=False)
+
+        generated = 0
+        failed = 0
+        for receipt in receipts.iterator():
+            if ReceiptThumbnailService.generate(receipt, force=options['force']):
+                generated += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated thumbnails for {generated} receipt(s), {failed} failed"
+        ))
@@ -0,0 +1,21 @@
+"""
+Management command to recompute monthly spending rollups from receipts
+receipts/management/commands/rebuild_spending_rollups.py
+
+python manage.py rebuild_spending_rollups
+python manage.py rebuild_spending_rollups --user-id 42
+"""
+
+from django.core.management.base import BaseCommand
+from receipts.services.spending_rollups import SpendingRollupService
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly spending rollup table from completed receipts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help="Only rebuild this user's rollups")
+
+    def handle(self, *args, **options):
+        rows = SpendingRollupService.rebuild(user_id=options['user_id'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} spending rollup row(s)"))
@@ -0,0 +1,102 @@
+"""
+Management command to re-parse stored OCR text in bulk
+receipts/management/commands/reparse_receipts.py
+
+python manage.py reparse_receipts --stale
+python manage.py reparse_receipts --workers 8 --chunk-size 500 --batch-size 100
+python manage.py reparse_receipts --status failed --from-date 2025-01-01 --to-date 2025-06-30
+python manage.py reparse_receipts --parser-version manual:1 --checkpoint /tmp/reparse.json
+python manage.py reparse_receipts --checkpoint /tmp/reparse.json --resume
+python manage.py reparse_receipts --stale --dry-run
+"""
+
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from receipts.models import Receipt
+from receipts.services.bulk_reparse import PARSERS, BulkReparser, target_parser_version
+
+
+class Command(BaseCommand):
+    help = 'Re-parse receipts from their stored OCR text across a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--parser',
+            choices=PARSERS,
+            default='manual',
+            help='Parser to apply (default: manual ReceiptParser)'
+        )
+        parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Receipts read and parsed per chunk')
+        parser.add_argument('--batch-size', type=int, default=50, help='Receipts written per transaction')
+        parser.add_argument(
+            '--status',
+            action='append',
+            choices=[choice for choice, _ in Receipt.STATUS_CHOICES],
+            help='Only receipts with this status (repeatable, default: completed and failed)'
+        )
+        parser.add_argument('--from-date', type=date.fromisoformat, help='Only receipts uploaded on or after YYYY-MM-DD')
+        parser.add_argument('--to-date', type=date.fromisoformat, help='Only receipts uploaded on or before YYYY-MM-DD')
+        parser.add_argument(
+            '--parser-version',
+            action='append',
+            help='Only receipts parsed with this version (repeatable; "" for never versioned)'
+        )
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help="Skip receipts already at the chosen parser's version"
+        )
+        parser.add_argument('--user-id', type=int, help="Only this user's receipts")
+        parser.add_argument('--after-id', type=int, default=0, help='Start after this receipt id')
+        parser.add_argument('--checkpoint', help='File recording the last committed receipt id')
+        parser.add_argument('--resume', action='store_true', help='Start after the id in --checkpoint')
+        parser.add_argument('--dry-run', action='store_true', help='Parse and count, but write nothing')
+        parser.add_argument('--verbose-writes', action='store_true', help='Show per-receipt write output')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--chunk-size and --batch-size must be positive')
+        if options['resume'] and not options['checkpoint']:
+            raise CommandError('--resume needs --checkpoint')
+
+        queryset = Receipt.objects.exclude(ocr_text='').filter(
+            status__in=options['status'] or ['completed', 'failed']
+        )
+        if options['from_date']:
+            queryset = queryset.filter(created_at__date__gte=options['from_date'])
+        if options['to_date']:
+            queryset = queryset.filter(created_at__date__lte=options['to_date'])
+        if options['parser_version'] is not None:
+            queryset = queryset.filter(parser_version__in=options['parser_version'])
+        if options['user_id']:
+            queryset = queryset.filter(user_id=options['user_id'])
+        if options['stale']:
+            version = target_parser_version(options['parser'])
+            if version is None:
+                raise CommandError(f"--stale needs a parser with a fixed version, not {options['parser']}")
+            queryset = queryset.exclude(parser_version=version)
+
+        reparser = BulkReparser(
+            parser_name=options['parser'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            checkpoint_path=options['checkpoint'],
+            verbose=options['verbose_writes'],
+            progress=self.stdout.write
+        )
+
+        after_id = options['after_id']
+        if options['resume']:
+            after_id = max(after_id, reparser.read_checkpoint())
+            self.stdout.write(f"Resuming after receipt {after_id}")
+
+        stats = reparser.run(queryset, after_id=after_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {stats['processed']} processed, {stats['updated']} updated "
+            f"({stats['items']} items), {stats['unparsed']} unparsed, {stats['failed']} failed"
+            + (f" in {stats['elapsed_seconds']}s" if 'elapsed_seconds' in stats else '')
+        ))
@@ -0,0 +1,115 @@
+"""
+Management command to run a local stand-in for the Azure Read and OpenAI APIs
+receipts/management/commands/run_ocr_llm_standin.py
+
+python manage.py run_ocr_llm_standin
+python manage.py run_ocr_llm_standin --port 8765 --ocr-processing-time lognormal:1500,0.5 --chat-latency lognormal:2500,0.4
+python manage.py run_ocr_llm_standin --throttle-rate 0.05 --error-rate 0.01 --seed 42
+python manage.py run_ocr_llm_standin --recordings /path/to/recordings --from-ocr-cache 50
+
+Then start the API server and workers with
+RECEIPT_SERVICES_STANDIN_URL=http://127.0.0.1:8765 so AzureOCRService and
+OpenAIReceiptParser talk to the stand-in. Uploads of identical images are
+served from the OCR result cache, so load tests should use distinct images.
+"""
+
+import json
+import random
+from django.core.management.base import BaseCommand, CommandError
+from receipts.services.standin_server import (
+    LatencyDistribution, StandinService, create_standin_server, load_recordings
+)
+
+
+class Command(BaseCommand):
+    help = 'Serve recorded Azure Read and chat-completions responses for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+        parser.add_argument(
+            '--recordings',
+            help='Directory of recording JSON files (default: the parser benchmark corpus)'
+        )
+        parser.add_argument(
+            '--from-ocr-cache',
+            type=int,
+            default=0,
+            help='Also replay up to N real Read results from the OCR result cache'
+        )
+        parser.add_argument(
+            '--submit-latency',
+            default='uniform:80,200',
+            help='Latency of the Read submit call, e.g. fixed:100, uniform:80,200, lognormal:120,0.3 (ms)'
+        )
+        parser.add_argument(
+            '--ocr-processing-time',
+            default='lognormal:1200,0.5',
+            help='Time until a Read operation reports succeeded (ms)'
+        )
+        parser.add_argument(
+            '--chat-latency',
+            default='lognormal:2500,0.4',
+            help='Latency of a chat completion (ms)'
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of requests answered with HTTP 500'
+        )
+        parser.add_argument(
+            '--throttle-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of requests answered with HTTP 429 and Retry-After'
+        )
+        parser.add_argument(
+            '--retry-after',
+            type=int,
+            default=1,
+            help='Retry-After seconds sent with throttled responses'
+        )
+        parser.add_argument('--seed', type=int, help='Random seed for latencies and failures')
+        parser.add_argument('--verbose-requests', action='store_true', help='Log every request')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            submit_latency = LatencyDistribution.parse(options['submit_latency'], rng)
+            processing_time = LatencyDistribution.parse(options['ocr_processing_time'], rng)
+            chat_latency = LatencyDistribution.parse(options['chat_latency'], rng)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not 0 <= options['error_rate'] + options['throttle_rate'] <= 1:
+            raise CommandError('--error-rate plus --throttle-rate must be between 0 and 1')
+
+        recordings = load_recordings(options['recordings'], options['from_ocr_cache'])
+        if not recordings:
+            raise CommandError('No recordings found')
+
+        service = StandinService(
+            recordings,
+            submit_latency=submit_latency,
+            processing_time=processing_time,
+            chat_latency=chat_latency,
+            error_rate=options['error_rate'],
+            throttle_rate=options['throttle_rate'],
+            retry_after=options['retry_after'],
+            seed=options['seed']
+        )
+        server = create_standin_server(service, options['host'], options['port'], options['verbose_requests'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stand-in listening on http://{options['host']}:{options['port']} with {len(recordings)} recording(s): "
+            f"submit {submit_latency}, OCR {processing_time}, chat {chat_latency}, "
+            f"errors {options['error_rate']:.1%}, throttled {options['throttle_rate']:.1%}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(json.dumps(service.stats, indent=2))
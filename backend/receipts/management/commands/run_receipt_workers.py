@@ -0,0 +1,126 @@
+"""
+Management command to run a pool of receipt processing workers
+receipts/management/commands/run_receipt_workers.py
+
+python manage.py run_receipt_workers
+python manage.py run_receipt_workers --workers 4
+python manage.py run_receipt_workers --workers 2 --lease-seconds 300 --poll-interval 0.5
+python manage.py run_receipt_workers --workers 2 --batch-size 16
+python manage.py run_receipt_workers --once
+"""
+
+import os
+import multiprocessing
+import signal
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from receipts.services.job_queue import ReceiptJobQueue
+
+
+def _worker_loop(lease_seconds, poll_interval, once, batch_size):
+    """Claim and run jobs until stopped (or until the queue is empty with --once)"""
+    # Each process needs its own database connection
+    connections.close_all()
+
+    stopping = {'value': False}
+
+    def _stop(signum, frame):
+        stopping['value'] = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    queue = ReceiptJobQueue(lease_seconds=lease_seconds)
+    worker_id = queue.worker_id()
+
+    while not stopping['value']:
+        # A batch shares one round of concurrent OCR polling
+        jobs = queue.claim_batch(worker_id, batch_size)
+        if not jobs:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        started = time.perf_counter()
+        final_statuses = queue.run_jobs(jobs)
+        elapsed = time.perf_counter() - started
+        for job in jobs:
+            print(f"[{worker_id}] job {job.id} receipt {job.receipt_id}: {final_statuses[job.id]} "
+                  f"(attempt {job.attempts}/{job.max_attempts}, batch of {len(jobs)} in {elapsed:.2f}s)")
+
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of worker processes that process queued receipts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--lease-seconds',
+            type=int,
+            default=120,
+            help='How long a claimed job is owned before other workers may retake it',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=int(os.getenv('RECEIPT_WORKER_BATCH_SIZE', '8')),
+            help='Jobs each worker claims at once; their OCR is polled concurrently',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is drained instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        worker_count = options['workers']
+        if worker_count < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        worker_args = (options['lease_seconds'], options['poll_interval'], options['once'], options['batch_size'])
+
+        if worker_count == 1:
+            self.stdout.write(self.style.SUCCESS('Running 1 receipt worker in-process...'))
+            _worker_loop(*worker_args)
+            return
+
+        # Don't share the parent's connection with forked children
+        connections.close_all()
+
+        self.stdout.write(self.style.SUCCESS(f'Starting {worker_count} receipt workers...'))
+        processes = [
+            multiprocessing.Process(target=_worker_loop, args=worker_args, daemon=False)
+            for _ in range(worker_count)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping workers...'))
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in processes:
+                process.join()
+
+        self.stdout.write(self.style.SUCCESS('All receipt workers stopped.'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0003_receipt_image_sha256_ocrcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False),
+        ),
+    ]
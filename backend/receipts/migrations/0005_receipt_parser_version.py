@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0004_receipt_thumbnails_ready'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='parser_version',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
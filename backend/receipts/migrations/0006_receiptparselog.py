@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0005_receipt_parser_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptParseLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('route', models.CharField(choices=[('local', 'Local parser passed checks'), ('local_unchecked', 'Local parser, LLM not configured'), ('llm', 'Escalated to LLM'), ('local_fallback', 'LLM failed, used local parser')], max_length=20)),
+                ('checks_failed', models.JSONField(blank=True, default=list)),
+                ('confidence', models.CharField(blank=True, max_length=10)),
+                ('parser_version', models.CharField(blank=True, max_length=64)),
+                ('local_ms', models.FloatField(blank=True, null=True)),
+                ('llm_ms', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('receipt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parse_logs', to='receipts.receipt')),
+            ],
+            options={
+                'db_table': 'receipt_parse_logs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['route', 'created_at'], name='receipt_par_route_ef5a9c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:25
+
+import datetime
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    """Roll up the completed receipts that already exist"""
+    Receipt = apps.get_model('receipts', 'Receipt')
+    MonthlySpendingRollup = apps.get_model('receipts', 'MonthlySpendingRollup')
+
+    grouped = Receipt.objects.filter(status='completed').annotate(
+        month=TruncMonth('purchase_date')
+    ).values('user_id', 'month', 'store_name').annotate(
+        receipt_count=Count('id'), total_spent=Sum('total_amount')
+    ).order_by()
+
+    rows = {}
+    for group in grouped.iterator():
+        key = (group['user_id'], group['month'] or datetime.date(1, 1, 1), group['store_name'] or '')
+        row = rows.setdefault(key, [0, Decimal('0')])
+        row[0] += group['receipt_count']
+        row[1] += group['total_spent'] or Decimal('0')
+
+    MonthlySpendingRollup.objects.bulk_create([
+        MonthlySpendingRollup(
+            user_id=user_id, month=month, store_name=store_name,
+            receipt_count=count, total_spent=total
+        )
+        for (user_id, month, store_name), (count, total) in rows.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0006_receiptparselog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('store_name', models.CharField(blank=True, max_length=255)),
+                ('receipt_count', models.IntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'monthly_spending_rollups',
+                'ordering': ['user', 'month', 'store_name'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'store_name'), name='unique_spending_rollup')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -3,12 +3,21 @@ Receipt and Receipt Item models
 backend/receipts/models.py
 """
 
-from django.db import models
+from datetime import date
+from django.db import models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from django.contrib.auth.models import User
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
 
 
+class ReceiptQuerySet(models.QuerySet):
+    def with_items_count(self):
+        """Annotate items_count, read by the receipt serializers instead of a COUNT per row"""
+        return self.annotate(items_count=models.Count('items'))
+
+
 class Receipt(models.Model):
     """Main receipt model"""
     STATUS_CHOICES = [
@@ -27,22 +36,43 @@ class Receipt(models.Model):
     
     # Image fields
     receipt_image = models.ImageField(upload_to='receipts/%Y/%m/%d/')
+    # Thumbnails are generated by the processing pipeline, never on access
     receipt_thumbnail = ImageSpecField(
         source='receipt_image',
         processors=[ResizeToFill(300, 400)],
         format='JPEG',
-        options={'quality': 85}
+        options={'quality': 85},
+        cachefile_strategy='receipts.services.thumbnails.DeferredThumbnailStrategy'
+    )
+    receipt_thumbnail_small = ImageSpecField(
+        source='receipt_image',
+        processors=[ResizeToFill(150, 200)],
+        format='JPEG',
+        options={'quality': 80},
+        cachefile_strategy='receipts.services.thumbnails.DeferredThumbnailStrategy'
+    )
+    receipt_thumbnail_large = ImageSpecField(
+        source='receipt_image',
+        processors=[ResizeToFill(600, 800)],
+        format='JPEG',
+        options={'quality': 85},
+        cachefile_strategy='receipts.services.thumbnails.DeferredThumbnailStrategy'
     )
+    thumbnails_ready = models.BooleanField(default=False)
+    image_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     
     # OCR and processing
     ocr_text = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     processing_error = models.TextField(blank=True)
+    parser_version = models.CharField(max_length=64, blank=True, db_index=True)
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ReceiptQuerySet.as_manager()
+
     class Meta:
         db_table = 'receipts'
         ordering = ['-purchase_date', '-created_at']
@@ -54,6 +84,13 @@ class Receipt(models.Model):
     def __str__(self):
         return f"Receipt from {self.store_name} - {self.purchase_date or self.created_at.date()}"
 
+    def save(self, *args, **kwargs):
+        # The spending rollup reads the old row in pre_save and is adjusted
+        # in post_save; Model.save() opens no transaction before pre_save,
+        # so keep the read, the save and the adjustment in one here
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def calculate_total(self):
         """Calculate total from receipt items"""
         total = sum(item.total_price for item in self.items.all())
@@ -96,4 +133,115 @@ class ReceiptItem(models.Model):
         if not self.total_price:
             self.total_price = self.quantity * self.unit_price
         super().save(*args, **kwargs)
-        
\ No newline at end of file
+        
+
+class ReceiptProcessingJob(models.Model):
+    """Queued OCR/parsing work for a receipt, claimed by run_receipt_workers"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='processing_jobs')
+    extract_text = models.BooleanField(default=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    
+    # Leasing - a running job whose lease expired is considered abandoned
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'receipt_processing_jobs'
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['status', 'lease_expires_at']),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} for receipt {self.receipt_id} ({self.status})"
+
+
+class OCRCacheEntry(models.Model):
+    """OCR output for an image, keyed by the SHA-256 of its bytes"""
+    image_sha256 = models.CharField(max_length=64, unique=True)
+    text = models.TextField(blank=True)
+    raw_result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    size_bytes = models.PositiveIntegerField(default=0)
+    hit_count = models.PositiveIntegerField(default=0)
+    last_accessed_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ocr_cache_entries'
+        verbose_name_plural = 'OCR Cache Entries'
+        ordering = ['-last_accessed_at']
+
+    def __str__(self):
+        return f"OCR cache {self.image_sha256[:12]} ({self.hit_count} hits)"
+
+
+class ReceiptParseLog(models.Model):
+    """How a receipt's OCR text was parsed: local parser, LLM, or both"""
+    ROUTE_CHOICES = [
+        ('local', 'Local parser passed checks'),
+        ('local_unchecked', 'Local parser, LLM not configured'),
+        ('llm', 'Escalated to LLM'),
+        ('local_fallback', 'LLM failed, used local parser'),
+    ]
+
+    receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='parse_logs')
+    route = models.CharField(max_length=20, choices=ROUTE_CHOICES)
+    checks_failed = models.JSONField(default=list, blank=True)
+    confidence = models.CharField(max_length=10, blank=True)
+    parser_version = models.CharField(max_length=64, blank=True)
+    local_ms = models.FloatField(null=True, blank=True)
+    llm_ms = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'receipt_parse_logs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['route', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Receipt {self.receipt_id} parsed via {self.route}"
+
+
+class MonthlySpendingRollup(models.Model):
+    """Completed receipts summed per user, month and store.
+
+    Maintained by receipts.services.spending_rollups whenever a receipt is
+    saved or deleted; `rebuild_spending_rollups` recomputes it from scratch.
+    """
+    # Month of receipts without a purchase date
+    UNDATED_MONTH = date(1, 1, 1)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_rollups')
+    month = models.DateField()  # First day of the month
+    store_name = models.CharField(max_length=255, blank=True)
+    receipt_count = models.IntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'monthly_spending_rollups'
+        ordering = ['user', 'month', 'store_name']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'store_name'], name='unique_spending_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.store_name}: {self.total_spent}"
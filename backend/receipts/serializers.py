@@ -6,6 +6,8 @@ backend/receipts/serializers.py
 from rest_framework import serializers
 from .models import Receipt, ReceiptItem
 from products.models import Product
+from .upload_handlers import file_sha256
+from .services.thumbnails import ReceiptThumbnailService
 
 
 class ReceiptItemSerializer(serializers.ModelSerializer):
@@ -47,6 +49,7 @@ class ReceiptSerializer(serializers.ModelSerializer):
     items_count = serializers.SerializerMethodField()
     receipt_image_url = serializers.SerializerMethodField()
     receipt_thumbnail_url = serializers.SerializerMethodField()
+    receipt_thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = Receipt
@@ -54,7 +57,7 @@ class ReceiptSerializer(serializers.ModelSerializer):
             'id', 'user', 'store_name', 'store_location',
             'purchase_date', 'total_amount', 'tax_amount',
             'receipt_image', 'receipt_image_url', 'receipt_thumbnail_url',
-            'ocr_text', 'status', 'processing_error',
+            'receipt_thumbnails', 'ocr_text', 'status', 'processing_error',
             'items', 'items_count', 'created_at', 'updated_at'
         ]
         read_only_fields = [
@@ -64,7 +67,8 @@ class ReceiptSerializer(serializers.ModelSerializer):
     
     def get_items_count(self, obj):
         """Get count of items in receipt"""
-        return obj.items.count()
+        items_count = getattr(obj, 'items_count', None)
+        return obj.items.count() if items_count is None else items_count
     
     def get_receipt_image_url(self, obj):
         """Get full URL for receipt image"""
@@ -76,38 +80,40 @@ class ReceiptSerializer(serializers.ModelSerializer):
         return None
     
     def get_receipt_thumbnail_url(self, obj):
-        """Get full URL for receipt thumbnail"""
-        if obj.receipt_thumbnail:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.receipt_thumbnail.url)
-            return obj.receipt_thumbnail.url
-        return None
+        """Get full URL for receipt thumbnail (None until generated)"""
+        urls = ReceiptThumbnailService.urls(obj, self.context.get('request'))
+        return urls['medium'] if urls else None
+    
+    def get_receipt_thumbnails(self, obj):
+        """Get thumbnail URLs by size (None until generated)"""
+        return ReceiptThumbnailService.urls(obj, self.context.get('request'))
 
 
 class ReceiptListSerializer(serializers.ModelSerializer):
     """Minimal serializer for receipt lists"""
     items_count = serializers.SerializerMethodField()
     receipt_thumbnail_url = serializers.SerializerMethodField()
+    receipt_thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = Receipt
         fields = [
             'id', 'store_name', 'store_location',
             'purchase_date', 'total_amount', 'status',
-            'items_count', 'receipt_thumbnail_url', 'created_at'
+            'items_count', 'receipt_thumbnail_url', 'receipt_thumbnails', 'created_at'
         ]
     
     def get_items_count(self, obj):
-        return obj.items.count()
+        # Receipt.objects.with_items_count() spares a COUNT per receipt
+        items_count = getattr(obj, 'items_count', None)
+        return obj.items.count() if items_count is None else items_count
     
     def get_receipt_thumbnail_url(self, obj):
-        if obj.receipt_thumbnail:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.receipt_thumbnail.url)
-            return obj.receipt_thumbnail.url
-        return None
+        urls = ReceiptThumbnailService.urls(obj, self.context.get('request'))
+        return urls['medium'] if urls else None
+    
+    def get_receipt_thumbnails(self, obj):
+        return ReceiptThumbnailService.urls(obj, self.context.get('request'))
 
 
 class ReceiptUploadSerializer(serializers.ModelSerializer):
@@ -121,6 +127,7 @@ class ReceiptUploadSerializer(serializers.ModelSerializer):
         """Create receipt with pending status"""
         validated_data['status'] = 'pending'
         validated_data['user'] = self.context['request'].user
+        validated_data['image_sha256'] = file_sha256(validated_data['receipt_image'])
         return super().create(validated_data)
 
 
@@ -0,0 +1,229 @@
+"""
+Bulk re-parsing of stored receipt OCR text
+backend/receipts/services/bulk_reparse.py
+"""
+
+import io
+import json
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from django.db import connections, transaction
+from receipts.services.keyword_automaton import category_keyword_index
+
+
+PARSERS = ('manual', 'openai', 'fallback')
+
+# Parse function of this worker process, set by _init_worker
+_worker_parse = None
+
+
+def build_parse_function(parser_name, category_automaton=None):
+    """
+    Callable taking OCR text and returning parser output with 'parser_version'
+
+    Args:
+        parser_name: 'manual' (ReceiptParser), 'openai' (OpenAIReceiptParser)
+            or 'fallback' (the pipeline's OpenAI-then-manual path)
+        category_automaton: Category keywords for the local parsers, loaded
+            once by the caller (default: built-in keywords only)
+    """
+    if parser_name == 'manual':
+        from receipts.services.receipt_parser import ReceiptParser
+        parser = ReceiptParser(category_automaton=category_automaton)
+
+        def parse(text):
+            parsed = parser.parse_receipt_text(text)
+            parsed['parser_version'] = parser.PARSER_VERSION
+            return parsed
+        return parse
+
+    if parser_name == 'openai':
+        from receipts.services.openai_receipt_parser import OpenAIReceiptParser
+        parser = OpenAIReceiptParser()
+
+        def parse(text):
+            parsed = parser.parse_receipt_text(text)
+            parsed['parser_version'] = parser.parser_version()
+            return parsed
+        return parse
+
+    if parser_name == 'fallback':
+        from receipts.services.keyword_automaton import BUILTIN_CATEGORY_AUTOMATON
+        from receipts.services.parser_router import ParserRouter
+        return ParserRouter(category_automaton=category_automaton or BUILTIN_CATEGORY_AUTOMATON).parse
+
+    raise ValueError(f"Unknown parser: {parser_name}")
+
+
+def target_parser_version(parser_name):
+    """Version string receipts get from this parser, or None if it depends on the text"""
+    if parser_name == 'manual':
+        from receipts.services.receipt_parser import ReceiptParser
+        return ReceiptParser.PARSER_VERSION
+    if parser_name == 'openai':
+        from receipts.services.openai_receipt_parser import OpenAIReceiptParser
+        return OpenAIReceiptParser().parser_version()
+    return None
+
+
+def _init_worker(parser_name, category_automaton):
+    global _worker_parse
+    _worker_parse = build_parse_function(parser_name, category_automaton)
+
+
+def _parse_in_worker(task):
+    receipt_id, text = task
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return receipt_id, _worker_parse(text)
+    except Exception as e:
+        return receipt_id, {'success': False, 'is_receipt': False, 'error': f'Parser error: {str(e)}'}
+
+
+class BulkReparser:
+    """Re-parse receipts' stored OCR text and write the results back.
+
+    Receipts are streamed in id order (keyset pagination), parsed across a
+    process pool and written back `batch_size` receipts per transaction. The
+    next chunk is parsed while the current one is written. After every
+    committed batch the last receipt id goes to the checkpoint file, so an
+    interrupted run can resume where it stopped.
+    """
+
+    def __init__(self, parser_name='manual', workers=None, chunk_size=200, batch_size=50,
+                 dry_run=False, checkpoint_path=None, verbose=False, progress=print):
+        self.parser_name = parser_name
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.verbose = verbose
+        self.progress = progress
+        self.stats = {'processed': 0, 'updated': 0, 'unparsed': 0, 'failed': 0, 'items': 0}
+
+    # ------------------------------------------------------------- checkpoint
+
+    def read_checkpoint(self):
+        """Last committed receipt id from the checkpoint file, or 0"""
+        if not self.checkpoint_path or not self.checkpoint_path.exists():
+            return 0
+        return int(json.loads(self.checkpoint_path.read_text()).get('last_id', 0))
+
+    def _write_checkpoint(self, last_id):
+        if self.checkpoint_path and not self.dry_run:
+            self.checkpoint_path.write_text(json.dumps({
+                'last_id': last_id,
+                'parser': self.parser_name,
+                **self.stats,
+            }))
+
+    # -------------------------------------------------------------------- run
+
+    def _chunks(self, queryset, after_id):
+        """Yield lists of (id, ocr_text), keyset-paginated by id"""
+        last_id = after_id
+        while True:
+            chunk = list(
+                queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'ocr_text')[:self.chunk_size]
+            )
+            if not chunk:
+                return
+            last_id = chunk[-1][0]
+            yield chunk
+
+    def run(self, queryset, after_id=0):
+        """
+        Re-parse every receipt in the queryset with id > after_id
+
+        Returns:
+            dict: processed / updated / unparsed / failed / items counters
+        """
+        total = queryset.filter(id__gt=after_id).count()
+        started = time.monotonic()
+        self.progress(f"Re-parsing {total} receipt(s) with the {self.parser_name} parser"
+                      f"{' (dry run)' if self.dry_run else ''}")
+        if not total:
+            return self.stats
+
+        chunks = self._chunks(queryset, after_id)
+        first = next(chunks, None)
+        # Loaded here once; the parsing workers never touch the database
+        category_automaton = category_keyword_index.automaton()
+
+        # Workers are forked on the first map(); they must not inherit this
+        # process's database connection
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.parser_name, category_automaton)
+        ) as executor:
+            pending = None
+            if first is not None:
+                pending = executor.map(_parse_in_worker, first, chunksize=max(len(first) // 16, 1))
+
+            while pending is not None:
+                # Start parsing the next chunk before writing this one
+                next_chunk = next(chunks, None)
+                results = list(pending)
+                pending = None
+                if next_chunk is not None:
+                    pending = executor.map(_parse_in_worker, next_chunk, chunksize=max(len(next_chunk) // 16, 1))
+
+                for start in range(0, len(results), self.batch_size):
+                    batch = results[start:start + self.batch_size]
+                    self._write_batch(batch)
+                    self._write_checkpoint(batch[-1][0])
+
+                elapsed = time.monotonic() - started
+                rate = self.stats['processed'] / elapsed if elapsed else 0.0
+                remaining = (total - self.stats['processed']) / rate if rate else 0.0
+                self.progress(
+                    f"{self.stats['processed']}/{total} receipts, {rate:.1f}/s, "
+                    f"~{remaining:.0f}s left (updated {self.stats['updated']}, "
+                    f"unparsed {self.stats['unparsed']}, failed {self.stats['failed']})"
+                )
+
+        self.stats['elapsed_seconds'] = round(time.monotonic() - started, 2)
+        return self.stats
+
+    def _write_batch(self, batch):
+        """Apply one batch of parse results in a single transaction"""
+        from receipts.models import Receipt
+        from receipts.services.ocr_service import AzureOCRService
+        from receipts.services.parser_router import ParserRouter
+
+        receipts = Receipt.objects.select_related('user').in_bulk([receipt_id for receipt_id, _ in batch])
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+
+        with output, transaction.atomic():
+            for receipt_id, parsed in batch:
+                self.stats['processed'] += 1
+                receipt = receipts.get(receipt_id)
+                if receipt is None:
+                    continue
+
+                # Leave receipts the new parser can't read as they are
+                if not parsed.get('success') or not parsed.get('is_receipt'):
+                    self.stats['unparsed'] += 1
+                    continue
+
+                if self.dry_run:
+                    self.stats['updated'] += 1
+                    self.stats['items'] += len(parsed.get('items') or [])
+                    continue
+
+                try:
+                    # One savepoint per receipt, so a bad row doesn't sink the batch
+                    with transaction.atomic():
+                        receipt.items.all().delete()
+                        receipt.processing_error = ''
+                        self.stats['items'] += AzureOCRService.apply_parsed_receipt(receipt, parsed)
+                        ParserRouter.record(receipt, parsed)
+                    self.stats['updated'] += 1
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    self.progress(f"Receipt {receipt_id} failed: {str(e)}")
@@ -0,0 +1,126 @@
+"""
+In-process resolver for matching receipt lines to approved catalog rows
+backend/receipts/services/catalog_resolver.py
+"""
+
+import os
+import time
+import threading
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import Store, Category, Product
+
+
+class CatalogResolver:
+    """Warm maps of approved products, stores and categories.
+
+    - (normalized_name, brand) -> product id
+    - store name -> store id
+    - category name -> category id
+
+    Each map carries a version that save/delete signals bump; a map is
+    reloaded lazily the next time it is read after its version changed.
+    Other processes only see changes through the signals of their own writes,
+    so maps also expire after CATALOG_RESOLVER_TTL_SECONDS.
+    """
+
+    MAPS = ('products', 'stores', 'categories')
+
+    def __init__(self, ttl_seconds=None):
+        self.ttl_seconds = ttl_seconds or float(os.getenv('CATALOG_RESOLVER_TTL_SECONDS', '300'))
+        self._lock = threading.Lock()
+        self._versions = {name: 0 for name in self.MAPS}
+        self._loaded = {name: None for name in self.MAPS}  # name -> (version, loaded_at, data)
+
+    # ------------------------------------------------------------ invalidation
+
+    def invalidate(self, map_name=None):
+        """Bump the version of one map (or all of them)"""
+        with self._lock:
+            for name in ([map_name] if map_name else self.MAPS):
+                self._versions[name] += 1
+
+    def invalidate_on_commit(self, map_name=None):
+        """Invalidate once the current transaction commits, so a reload sees the new rows"""
+        transaction.on_commit(lambda: self.invalidate(map_name))
+
+    # ----------------------------------------------------------------- loading
+
+    def _get_map(self, name):
+        with self._lock:
+            version = self._versions[name]
+            loaded = self._loaded[name]
+            if loaded and loaded[0] == version and time.monotonic() - loaded[1] < self.ttl_seconds:
+                return loaded[2]
+
+        data = getattr(self, f'_load_{name}')()
+
+        with self._lock:
+            # Don't clobber a newer load or record data older than an invalidation
+            if self._versions[name] == version:
+                self._loaded[name] = (version, time.monotonic(), data)
+        return data
+
+    @staticmethod
+    def _load_products():
+        by_name = {}
+        by_name_brand = {}
+        rows = Product.objects.filter(is_approved=True).order_by('name').values_list(
+            'id', 'normalized_name', 'brand'
+        )
+        # Keep the first match in name order, like the .first() lookups did
+        for product_id, normalized_name, brand in rows.iterator():
+            by_name.setdefault(normalized_name, product_id)
+            by_name_brand.setdefault((normalized_name, (brand or '').lower()), product_id)
+        return {'by_name': by_name, 'by_name_brand': by_name_brand}
+
+    @staticmethod
+    def _load_stores():
+        data = {}
+        for store_id, name in Store.objects.filter(is_approved=True).order_by('name').values_list('id', 'name'):
+            data.setdefault(name.lower(), store_id)
+        return data
+
+    @staticmethod
+    def _load_categories():
+        data = {}
+        for category_id, name in Category.objects.filter(is_approved=True).order_by('name').values_list('id', 'name'):
+            data.setdefault(name.lower(), category_id)
+        return data
+
+    # --------------------------------------------------------------- resolving
+
+    def resolve_product(self, normalized_name, brand=''):
+        """Approved product id for a normalized name (and brand when given), or None"""
+        products = self._get_map('products')
+        if brand:
+            return products['by_name_brand'].get((normalized_name, brand.lower()))
+        return products['by_name'].get(normalized_name)
+
+    def resolve_store(self, name):
+        """Approved store id for a store name (case-insensitive), or None"""
+        return self._get_map('stores').get((name or '').lower())
+
+    def resolve_category(self, name):
+        """Approved category id for a category name (case-insensitive), or None"""
+        return self._get_map('categories').get((name or '').lower())
+
+
+# Shared by every receipt processed in this process
+catalog_resolver = CatalogResolver()
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_products(sender, **kwargs):
+    catalog_resolver.invalidate_on_commit('products')
+
+
+@receiver([post_save, post_delete], sender=Store)
+def invalidate_stores(sender, **kwargs):
+    catalog_resolver.invalidate_on_commit('stores')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, **kwargs):
+    catalog_resolver.invalidate_on_commit('categories')
@@ -0,0 +1,324 @@
+"""
+Set-based planner for writing parsed receipt items
+backend/receipts/services/ingestion.py
+"""
+
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.db import transaction
+from receipts.services.catalog_resolver import catalog_resolver
+from products.services.normalization import normalize_product_name, parse_product_name
+from products.services.product_index import product_index
+from products.services.current_prices import CurrentPriceService
+
+
+class ReceiptIngestionPlanner:
+    """Resolve and write all items of a parsed receipt in a handful of queries.
+
+    `plan()` only reads: approved products and categories come from the
+    in-process catalog resolver and the rest from set-based lookups.
+    `write()` then creates whatever is missing and the receipt items and
+    prices with bulk inserts/upserts, so the write transaction stays short no
+    matter how many lines the receipt has.
+
+    The resolver and the trigram index may be minutes behind the database,
+    so `write()` first checks, inside its transaction, that the rows behind
+    the planned ids still exist, and re-resolves the ones that don't.
+    """
+
+    def __init__(self, receipt, store, items):
+        self.receipt = receipt
+        self.store = store
+        self.items = items or []
+        self.user = receipt.user
+        self.is_staff = self.user.is_staff if self.user else False
+
+        # (normalized_name, brand_lower) -> Product id (None until planned/created)
+        self.product_ids = {}
+        # lowercased category name -> Category id
+        self.category_ids = {}
+        # key -> similarity, for products matched by name similarity only
+        self.fuzzy_matches = {}
+        self.products_created = 0
+        self.categories_created = 0
+
+    @staticmethod
+    def item_key(item_data):
+        """Matching key for an item: canonical normalized name plus brand (case-insensitive)"""
+        normalized_name = normalize_product_name(item_data.get('normalized_name') or item_data['name'])
+        brand = item_data.get('brand', '') or ''
+        return normalized_name, brand.lower()
+
+    # ---------------------------------------------------------------- planning
+
+    def plan(self):
+        """Resolve existing products and categories for all items"""
+        keys = {self.item_key(item) for item in self.items}
+        names = {name for name, _ in keys}
+        if not names:
+            return self
+
+        from products.models import Product
+
+        # Approved products come from the warm resolver, without a query
+        for key in keys:
+            product_id = catalog_resolver.resolve_product(*key)
+            if product_id is not None:
+                self.product_ids[key] = product_id
+
+        # Then fall back to the user's own pending products
+        unresolved = {key for key in keys if key not in self.product_ids}
+        if unresolved and self.user:
+            pending = Product.objects.filter(
+                normalized_name__in={name for name, _ in unresolved},
+                created_by=self.user,
+                is_approved=False
+            ).order_by('name').values_list('id', 'normalized_name', 'brand')
+            self._match_products(unresolved, pending)
+
+        # Last, OCR misreads of approved products ("GRACE CORNED BEEF 34OG"):
+        # near-identical names with the same size only
+        for key in keys - self.product_ids.keys():
+            match = product_index.best_match(*key)
+            if match is not None:
+                self.product_ids[key] = match[0]
+                self.fuzzy_matches[key] = match[1]
+                print(f"Matched '{key[0]}' to product {match[0]} (similarity {match[1]})")
+
+        # Only products we are about to create need a category
+        category_names = {
+            (item.get('category') or '').lower()
+            for item in self.items
+            if self.item_key(item) not in self.product_ids and item.get('category')
+        }
+        if category_names:
+            self._resolve_categories(category_names)
+
+        return self
+
+    def _match_products(self, keys, rows):
+        """Apply the same rules as the old per-item lookup: brand must match when given"""
+        first_by_name = {}
+        first_by_name_brand = {}
+        for product_id, normalized_name, brand in rows:
+            first_by_name.setdefault(normalized_name, product_id)
+            first_by_name_brand.setdefault((normalized_name, (brand or '').lower()), product_id)
+
+        for key in keys:
+            normalized_name, brand = key
+            if brand:
+                product_id = first_by_name_brand.get(key)
+            else:
+                product_id = first_by_name.get(normalized_name)
+            if product_id is not None:
+                self.product_ids[key] = product_id
+
+    def _resolve_categories(self, category_names):
+        from products.models import Category
+
+        for name_lower in category_names:
+            category_id = catalog_resolver.resolve_category(name_lower)
+            if category_id is not None:
+                self.category_ids[name_lower] = category_id
+
+        category_names = category_names - self.category_ids.keys()
+        if not category_names:
+            return
+
+        categories = Category.objects.annotate(
+            name_lower=Lower('name')
+        ).filter(name_lower__in=category_names).values_list('id', 'name_lower', 'is_approved', 'created_by_id')
+
+        # Prefer approved (in case the resolver is stale), then the user's
+        # pending, then anything else with the name (names are unique, so
+        # creating a duplicate would fail)
+        ranked = {}
+        for category_id, name_lower, is_approved, created_by_id in categories:
+            rank = 0 if is_approved else (1 if self.user and created_by_id == self.user.id else 2)
+            if name_lower not in ranked or rank < ranked[name_lower][0]:
+                ranked[name_lower] = (rank, category_id)
+
+        for name_lower, (_, category_id) in ranked.items():
+            self.category_ids[name_lower] = category_id
+
+    # ----------------------------------------------------------------- writing
+
+    def write(self):
+        """
+        Create missing categories/products, then receipt items and prices
+
+        Must run inside the caller's transaction.
+
+        Returns:
+            int: Number of receipt items created
+        """
+        self._revalidate()
+        self._create_missing_categories()
+        self._create_missing_products()
+        items_created = self._create_receipt_items()
+        if self.store:
+            self._upsert_prices()
+        return items_created
+
+    def _revalidate(self):
+        """Re-resolve planned ids whose products or categories were deleted since they were cached"""
+        from products.models import Category, Product
+
+        planned = set(self.product_ids.values())
+        existing = set(Product.objects.filter(id__in=planned).values_list('id', flat=True)) if planned else set()
+        stale = {key for key, product_id in self.product_ids.items() if product_id not in existing}
+        if stale:
+            for key in stale:
+                product_index.remove(self.product_ids.pop(key))
+                self.fuzzy_matches.pop(key, None)
+            catalog_resolver.invalidate('products')
+
+            # Same preference as planning: approved first, then the user's pending
+            visible = Q(is_approved=True)
+            if self.user:
+                visible |= Q(created_by=self.user, is_approved=False)
+            rows = Product.objects.filter(visible, normalized_name__in={name for name, _ in stale}).order_by(
+                '-is_approved', 'name'
+            ).values_list('id', 'normalized_name', 'brand')
+            self._match_products(stale, rows)
+
+        # Only products still to be created need a category
+        planned_categories = set()
+        unplanned_categories = set()
+        for item in self.items:
+            key = self.item_key(item)
+            if key in self.product_ids or not item.get('category'):
+                continue
+            name_lower = item['category'].lower()
+            if name_lower in self.category_ids:
+                planned_categories.add(name_lower)
+            elif key in stale:
+                # Planning skipped the category of a key that had a product
+                unplanned_categories.add(name_lower)
+
+        planned = {self.category_ids[name] for name in planned_categories}
+        existing = set(Category.objects.filter(id__in=planned).values_list('id', flat=True)) if planned else set()
+        stale_categories = {name for name in planned_categories if self.category_ids[name] not in existing}
+        if stale_categories:
+            for name in stale_categories:
+                del self.category_ids[name]
+            catalog_resolver.invalidate('categories')
+        if stale_categories or unplanned_categories:
+            self._resolve_categories(stale_categories | unplanned_categories)
+
+    def _create_missing_categories(self):
+        from products.models import Category
+
+        to_create = {}
+        for item in self.items:
+            category_name = (item.get('category') or '').strip()
+            if not category_name or self.item_key(item) in self.product_ids:
+                continue
+            name_lower = category_name.lower()
+            if name_lower not in self.category_ids and name_lower not in to_create:
+                to_create[name_lower] = Category(
+                    name=category_name,
+                    description='Auto-created from receipt parsing',
+                    is_approved=self.is_staff,
+                    created_by=self.user
+                )
+
+        if to_create:
+            created = Category.objects.bulk_create(to_create.values())
+            for category in created:
+                self.category_ids[category.name.lower()] = category.id
+            self.categories_created = len(created)
+            # bulk_create sends no post_save, so tell the resolver ourselves
+            if self.is_staff:
+                catalog_resolver.invalidate_on_commit('categories')
+
+    def _create_missing_products(self):
+        from products.models import Product
+
+        to_create = {}
+        for item in self.items:
+            key = self.item_key(item)
+            if key in self.product_ids or key in to_create:
+                continue
+            category_name = (item.get('category') or '').lower()
+            to_create[key] = Product(
+                name=item['name'],
+                normalized_name=key[0],
+                brand=item.get('brand', ''),
+                unit=item.get('unit') or parse_product_name(item['name']).unit,
+                category_id=self.category_ids.get(category_name),
+                description='Auto-created from receipt',
+                is_active=True,
+                is_approved=self.is_staff,
+                created_by=self.user
+            )
+
+        if to_create:
+            created = Product.objects.bulk_create(to_create.values())
+            for key, product in zip(to_create.keys(), created):
+                self.product_ids[key] = product.id
+            self.products_created = len(created)
+            if self.is_staff:
+                catalog_resolver.invalidate_on_commit('products')
+
+                def index_created():
+                    for product in created:
+                        product_index.sync(product)
+                transaction.on_commit(index_created)
+
+    def _create_receipt_items(self):
+        from receipts.models import ReceiptItem
+
+        receipt_items = []
+        for item in self.items:
+            total_price = item['total_price'] or item['quantity'] * item['unit_price']
+            receipt_items.append(ReceiptItem(
+                receipt=self.receipt,
+                product_id=self.product_ids.get(self.item_key(item)),
+                product_name=item['name'],
+                normalized_name=self.item_key(item)[0],
+                quantity=item['quantity'],
+                unit_price=item['unit_price'],
+                total_price=total_price
+            ))
+
+        ReceiptItem.objects.bulk_create(receipt_items)
+        return len(receipt_items)
+
+    def _upsert_prices(self):
+        from products.models import PriceHistory
+
+        date_recorded = self.receipt.purchase_date or timezone.now().date()
+
+        # One row per product for this store/date; later lines win, as before
+        prices = {}
+        for item in self.items:
+            product_id = self.product_ids.get(self.item_key(item))
+            if product_id is not None:
+                prices[product_id] = item['unit_price']
+
+        if not prices:
+            return
+
+        PriceHistory.objects.bulk_create(
+            [
+                PriceHistory(
+                    product_id=product_id,
+                    store=self.store,
+                    date_recorded=date_recorded,
+                    price=price,
+                    source='receipt',
+                    is_active=self.is_staff,  # Only active if created by staff
+                    is_approved=self.is_staff,  # Only approved if created by staff
+                    created_by=self.user
+                )
+                for product_id, price in prices.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['product', 'store', 'date_recorded'],
+            update_fields=['price', 'source', 'is_active', 'is_approved', 'created_by']
+        )
+
+        # Same rule as PriceHistory.save: a new approved price becomes current
+        CurrentPriceService.prices_upserted(self.store, date_recorded, list(prices), approved=self.is_staff)
@@ -0,0 +1,271 @@
+"""
+Database-backed job queue for receipt processing
+backend/receipts/services/job_queue.py
+"""
+
+import os
+import socket
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+class ReceiptJobQueue:
+    """Enqueue, claim and settle ReceiptProcessingJob rows.
+
+    Claims are lease based: a worker owns a job until its lease expires, after
+    which any other worker may pick it up again, unless the lost run was its
+    last attempt: a job that keeps killing its worker (out of memory, a crash
+    in image processing) is failed rather than retried forever. Claiming uses
+    a conditional UPDATE so two workers can never own the same job, on SQLite
+    or Postgres.
+    """
+
+    def __init__(self, lease_seconds=None, retry_delay_seconds=None):
+        self.lease_seconds = lease_seconds or int(os.getenv('RECEIPT_JOB_LEASE_SECONDS', '120'))
+        self.retry_delay_seconds = retry_delay_seconds or int(os.getenv('RECEIPT_JOB_RETRY_DELAY_SECONDS', '10'))
+
+    @staticmethod
+    def worker_id():
+        """Identifier stored in locked_by for the current process"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def enqueue(receipt, extract_text=True, max_attempts=None):
+        """
+        Queue a receipt for processing
+
+        Args:
+            receipt: Receipt model instance
+            extract_text: If True, workers run OCR before parsing
+            max_attempts: Number of tries before the job is marked failed
+
+        Returns:
+            ReceiptProcessingJob instance
+        """
+        from receipts.models import ReceiptProcessingJob
+
+        if max_attempts is None:
+            max_attempts = int(os.getenv('RECEIPT_JOB_MAX_ATTEMPTS', '3'))
+
+        return ReceiptProcessingJob.objects.create(
+            receipt=receipt,
+            extract_text=extract_text,
+            max_attempts=max_attempts
+        )
+
+    def claim(self, worker_id=None):
+        """
+        Claim the next runnable job
+
+        Returns:
+            ReceiptProcessingJob instance or None if nothing is runnable
+        """
+        from receipts.models import ReceiptProcessingJob
+
+        worker_id = worker_id or self.worker_id()
+        now = timezone.now()
+        self.fail_abandoned(now)
+        runnable = (
+            Q(status='queued', run_after__lte=now) |
+            Q(status='running', lease_expires_at__lt=now, attempts__lt=F('max_attempts'))
+        )
+
+        candidate_ids = list(
+            ReceiptProcessingJob.objects.filter(runnable)
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)[:10]
+        )
+
+        for job_id in candidate_ids:
+            claimed = ReceiptProcessingJob.objects.filter(runnable, id=job_id).update(
+                status='running',
+                locked_by=worker_id,
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                updated_at=now
+            )
+            if claimed:
+                return ReceiptProcessingJob.objects.select_related('receipt', 'receipt__user').get(id=job_id)
+
+        return None
+
+    def claim_batch(self, worker_id=None, limit=1):
+        """
+        Claim up to `limit` runnable jobs
+
+        Returns:
+            list of ReceiptProcessingJob instances (empty if nothing is runnable)
+        """
+        worker_id = worker_id or self.worker_id()
+        jobs = []
+        while len(jobs) < limit:
+            job = self.claim(worker_id)
+            if job is None:
+                break
+            jobs.append(job)
+        return jobs
+
+    def renew(self, job):
+        """
+        Extend the lease on a claimed job
+
+        Returns:
+            False if the lease had already run out and another worker took the job
+        """
+        from receipts.models import ReceiptProcessingJob
+
+        now = timezone.now()
+        job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+        return bool(ReceiptProcessingJob.objects.filter(
+            id=job.id, status='running', locked_by=job.locked_by
+        ).update(lease_expires_at=job.lease_expires_at, updated_at=now))
+
+    @staticmethod
+    def fail_abandoned(now=None):
+        """
+        Fail jobs whose worker died during their last attempt
+
+        Returns:
+            int: Number of jobs failed
+        """
+        from receipts.models import ReceiptProcessingJob
+
+        now = now or timezone.now()
+        abandoned = Q(status='running', lease_expires_at__lt=now, attempts__gte=F('max_attempts'))
+        failed = 0
+        for job in ReceiptProcessingJob.objects.filter(abandoned).select_related('receipt'):
+            error = f'Worker {job.locked_by} stopped during attempt {job.attempts} of {job.max_attempts}'
+            # Conditional, like claim(), in case another worker got here first
+            if not ReceiptProcessingJob.objects.filter(abandoned, id=job.id).update(
+                status='failed',
+                lease_expires_at=None,
+                last_error=error,
+                finished_at=now,
+                updated_at=now
+            ):
+                continue
+            failed += 1
+            receipt = job.receipt
+            receipt.status = 'failed'
+            receipt.processing_error = error
+            receipt.save(update_fields=['status', 'processing_error', 'updated_at'])
+            print(f"Job {job.id} for receipt {receipt.id} failed: {error}")
+        return failed
+
+    @staticmethod
+    def complete(job):
+        """Mark a job as succeeded"""
+        now = timezone.now()
+        job.status = 'succeeded'
+        job.lease_expires_at = None
+        job.last_error = ''
+        job.finished_at = now
+        job.save(update_fields=['status', 'lease_expires_at', 'last_error', 'finished_at', 'updated_at'])
+
+    def fail(self, job, error, retry=True):
+        """
+        Record a failed attempt, rescheduling the job if it has attempts left
+
+        Args:
+            job: Claimed ReceiptProcessingJob
+            error: Exception or message to store in last_error
+            retry: False for failures another attempt would repeat
+
+        Returns:
+            True if the job will be retried, False if it is now terminally failed
+        """
+        now = timezone.now()
+        job.last_error = str(error)
+        job.lease_expires_at = None
+
+        if retry and job.attempts < job.max_attempts:
+            # Linear backoff between attempts
+            job.status = 'queued'
+            job.run_after = now + timedelta(seconds=self.retry_delay_seconds * job.attempts)
+            job.save(update_fields=['status', 'run_after', 'lease_expires_at', 'last_error', 'updated_at'])
+            return True
+
+        job.status = 'failed'
+        job.finished_at = now
+        job.save(update_fields=['status', 'lease_expires_at', 'last_error', 'finished_at', 'updated_at'])
+        return False
+
+    def run_job(self, job):
+        """
+        Process a claimed job and settle it
+
+        Returns:
+            Final job status ('succeeded', 'queued' for retry, or 'failed')
+        """
+        return self.run_jobs([job])[job.id]
+
+    def run_jobs(self, jobs):
+        """
+        Process claimed jobs and settle them
+
+        OCR for every job that needs it is fetched in one batch, so the Read
+        operations are polled concurrently rather than one receipt at a time.
+        Parsing then runs job by job, each renewing its lease first, and a
+        job's thumbnails are generated once its receipt is settled so they
+        never delay OCR.
+
+        Returns:
+            dict: job id -> final status ('succeeded', 'queued' for retry,
+            'failed', or 'running' if another worker took the job over)
+        """
+        from receipts.services.ocr_service import AzureOCRService
+        from receipts.services.thumbnails import ReceiptThumbnailService
+
+        needs_ocr = {}
+        for job in jobs:
+            job.attempts += 1
+            job.save(update_fields=['attempts', 'updated_at'])
+
+            # A retry after a successful OCR step only needs to re-parse
+            needs_ocr[job.id] = job.extract_text and not job.receipt.ocr_text
+
+        receipts = [job.receipt for job in jobs if needs_ocr[job.id]]
+        try:
+            ocr_results = AzureOCRService.extract_receipt_texts(receipts) if receipts else {}
+        except Exception as e:
+            ocr_results = {
+                receipt.id: {'success': False, 'error': f'OCR error: {str(e)}', 'text': '', 'raw_result': None}
+                for receipt in receipts
+            }
+
+        statuses = {}
+        for job in jobs:
+            if not self.renew(job):
+                statuses[job.id] = 'running'
+                continue
+            statuses[job.id] = self._settle(job, needs_ocr[job.id], ocr_results.get(job.receipt_id))
+            # Only needs the stored image, so it is worth doing even if the
+            # parse failed; serializers return null thumbnails until then
+            ReceiptThumbnailService.generate(job.receipt)
+        return statuses
+
+    def _settle(self, job, extract_text, ocr_result):
+        """Parse one job's receipt and complete or fail the job"""
+        from receipts.services.ocr_service import AzureOCRService, ReceiptRejectedError
+
+        receipt = job.receipt
+        try:
+            if not extract_text:
+                with transaction.atomic():
+                    receipt.items.all().delete()
+            AzureOCRService.process_receipt_ocr(receipt, extract_text=extract_text, ocr_result=ocr_result)
+        except ReceiptRejectedError as e:
+            # process_receipt_ocr already marked the receipt failed
+            self.fail(job, e, retry=False)
+            return job.status
+        except Exception as e:
+            will_retry = self.fail(job, e)
+            if will_retry:
+                # Keep the receipt visible as waiting rather than failed
+                receipt.status = 'pending'
+                receipt.save(update_fields=['status', 'updated_at'])
+            return job.status
+
+        self.complete(job)
+        return job.status
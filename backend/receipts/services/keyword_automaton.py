@@ -0,0 +1,294 @@
+"""
+Aho-Corasick keyword matching for receipt line classification and category guessing
+backend/receipts/services/keyword_automaton.py
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import CategoryKeyword
+
+
+class KeywordAutomaton:
+    """Multi-pattern substring matcher (Aho-Corasick).
+
+    Keywords are compiled into one automaton, so a text is scanned a single
+    time however many keywords there are. Transitions are resolved for the
+    whole keyword alphabet when the automaton is built, which makes the scan
+    one dict lookup per character; characters that appear in no keyword reset
+    it to the root.
+    """
+
+    def __init__(self, keywords=None):
+        """
+        Args:
+            keywords: Optional iterable of keywords or (keyword, value) pairs
+        """
+        self._trie = [{}]     # state -> {char: state}
+        self._outputs = [()]  # state -> ((keyword, value), ...) ending here
+        self._delta = None    # built transitions, see build()
+        self._built_outputs = None
+        self._size = 0
+        for keyword in keywords or ():
+            if isinstance(keyword, tuple):
+                self.add(*keyword)
+            else:
+                self.add(keyword)
+        if self._size:
+            self.build()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, keyword, value=None):
+        """Add a keyword (matched as-is, so case-fold it first if needed)"""
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._trie[state].get(char)
+            if next_state is None:
+                next_state = len(self._trie)
+                self._trie[state][char] = next_state
+                self._trie.append({})
+                self._outputs.append(())
+            state = next_state
+        self._outputs[state] += ((keyword, keyword if value is None else value),)
+        self._size += 1
+        self._delta = None
+
+    def build(self):
+        """Compute failure links and the full transition table"""
+        trie = self._trie
+        fail = [0] * len(trie)
+        outputs = list(self._outputs)
+        delta = [dict(edges) for edges in trie]
+
+        # Breadth-first, so a state's failure target is complete before it is used
+        queue = deque(trie[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in trie[state].items():
+                queue.append(child)
+                fail[child] = delta[fail[state]].get(char, 0) if state else 0
+                outputs[child] = outputs[child] + outputs[fail[child]]
+            # Borrow the failure state's transitions this state lacks
+            if state:
+                for char, target in delta[fail[state]].items():
+                    delta[state].setdefault(char, target)
+
+        self._delta = delta
+        self._built_outputs = outputs
+        return self
+
+    def iter_matches(self, text):
+        """Yield (end_index, keyword, value) for every keyword occurrence in text"""
+        if self._delta is None:
+            self.build()
+        delta = self._delta
+        outputs = self._built_outputs
+        state = 0
+        for index, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            for keyword, value in outputs[state]:
+                yield index, keyword, value
+
+    def contains_any(self, text):
+        """Whether any keyword occurs in text (stops at the first one)"""
+        if self._delta is None:
+            self.build()
+        delta = self._delta
+        outputs = self._built_outputs
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                return True
+        return False
+
+    def values(self, text):
+        """Set of the values of all keywords occurring in text"""
+        if self._delta is None:
+            self.build()
+        delta = self._delta
+        outputs = self._built_outputs
+        found = set()
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            for _, value in outputs[state]:
+                found.add(value)
+        return found
+
+
+# ========================= RECEIPT LINE VOCABULARY =========================
+
+# Matched against the upper-cased line
+SECTION_START_KEYWORDS = ['DESCRIPTION', 'QTY', 'ITEM', '=====']
+SECTION_END_KEYWORDS = ['SUBTOTAL', 'GCT', 'TOTAL', 'DEBIT', 'CASH', 'PAYMENT', 'YOU SAVED', 'NET SALES', 'GRAND']
+TAX_KEYWORDS = ['GCT', 'TAX', 'VAT', 'GST']
+
+# Matched case-sensitively against the stripped line
+NON_PRODUCT_KEYWORDS = [
+    'DESCRIPTION', 'QTY', 'AMOUNT', 'PRICE', 'Thank', 'YOU SAVED',
+    'Discount:', 'Subtotal', 'SUBTOTAL', 'TOTAL', 'Total', 'GCT', 'GRAND',
+    'Change', 'DEBIT', 'CASH', 'CARD', 'PAYMENT', 'Refunds', 'Exchange',
+    'TEL', 'INVOICE', 'Closed', 'CASHIER', 'STATION', 'Emp:', 'Reg:',
+    'Tax ID', 'Tax Number', 'Net Sales', 'SALES', 'ITEM COUNT'
+]
+
+SECTION_START = 'section_start'
+SECTION_END = 'section_end'
+TOTAL = 'total'
+TAX = 'tax'
+
+# One pass over an upper-cased line yields every label it carries
+LINE_AUTOMATON = KeywordAutomaton(
+    [(keyword, SECTION_START) for keyword in SECTION_START_KEYWORDS]
+    + [(keyword, SECTION_END) for keyword in SECTION_END_KEYWORDS]
+    + [('TOTAL', TOTAL)]
+    + [(keyword, TAX) for keyword in TAX_KEYWORDS]
+)
+NON_PRODUCT_AUTOMATON = KeywordAutomaton(NON_PRODUCT_KEYWORDS)
+
+
+def line_labels(line_upper):
+    """Labels (SECTION_START, SECTION_END, TOTAL, TAX) of an upper-cased line"""
+    return LINE_AUTOMATON.values(line_upper)
+
+
+def has_non_product_keyword(line):
+    """Whether a line contains a keyword that rules it out as a product name"""
+    return NON_PRODUCT_AUTOMATON.contains_any(line)
+
+
+# ========================= CATEGORY VOCABULARY =========================
+
+# Built-in keywords, first category wins. Keywords from the CategoryKeyword
+# table are added on top of these.
+CATEGORY_KEYWORDS = {
+    'Produce': ['vegetable', 'fruit', 'lettuce', 'tomato', 'potato', 'onion', 'carrot', 'apple', 'banana', 'orange', 'garlic'],
+    'Dairy': ['milk', 'cheese', 'yogurt', 'butter', 'cream', 'dairy'],
+    'Meat': ['chicken', 'beef', 'pork', 'meat', 'sausage', 'bacon', 'corned'],
+    'Bakery': ['bread', 'cake', 'pastry', 'bun', 'roll', 'bulla'],
+    'Beverages': ['juice', 'soda', 'water', 'drink', 'cola', 'tea', 'coffee'],
+    'Household': ['soap', 'detergent', 'cleaner', 'tissue', 'paper', 'bag'],
+    'Snacks': ['chip', 'cashew', 'puff', 'cracker', 'nibble'],
+    'Condiments': ['sauce', 'seasoning', 'margarine', 'salt', 'sugar', 'flour', 'cornmeal'],
+    'Tobacoo': ['cigarette', 'craven'],
+}
+
+# Built-in categories rank after database keywords (default priority 50),
+# in their dict order
+BUILTIN_PRIORITY = 100
+
+DEFAULT_CATEGORY = 'Groceries'
+
+
+def build_category_automaton(database_keywords=()):
+    """
+    Automaton over the built-in category keywords plus database ones
+
+    Every keyword maps to (priority, -length, category); see guess_category.
+
+    Args:
+        database_keywords: (keyword, priority, category name) rows
+
+    Returns:
+        KeywordAutomaton
+    """
+    automaton = KeywordAutomaton()
+    for rank, (category, keywords) in enumerate(CATEGORY_KEYWORDS.items()):
+        for keyword in keywords:
+            automaton.add(keyword, (BUILTIN_PRIORITY + rank, -len(keyword), category))
+    for keyword, priority, category in database_keywords:
+        keyword = keyword.strip().lower()
+        automaton.add(keyword, (priority, -len(keyword), category))
+    return automaton.build()
+
+
+# Parsers built without database keywords use this one
+BUILTIN_CATEGORY_AUTOMATON = build_category_automaton()
+
+
+def guess_category(automaton, product_name):
+    """
+    Guess the category of a product name
+
+    Of all keywords found in the name the smallest (priority, -length) wins,
+    i.e. the lowest priority and then the longest keyword. Built-in keywords
+    keep the old first-category-wins order.
+
+    Args:
+        automaton: From build_category_automaton or category_keyword_index
+        product_name: Product name as read from the receipt
+
+    Returns:
+        str: Category name, DEFAULT_CATEGORY if no keyword matches
+    """
+    best = None
+    for _, _, match in automaton.iter_matches(product_name.lower()):
+        if best is None or match < best:
+            best = match
+    return best[2] if best else DEFAULT_CATEGORY
+
+
+class CategoryKeywordIndex:
+    """Category automaton including the CategoryKeyword table, per process.
+
+    Parsers don't read the database: whoever runs them (the parser router,
+    bulk reparse) takes automaton() once and passes it in.
+
+    The automaton is rebuilt lazily after CategoryKeyword rows change (signals
+    bump a version) or after CATEGORY_KEYWORDS_TTL_SECONDS, so other processes
+    pick up edits too.
+    """
+
+    def __init__(self, ttl_seconds=None):
+        self.ttl_seconds = ttl_seconds or float(os.getenv('CATEGORY_KEYWORDS_TTL_SECONDS', '300'))
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded = None  # (version, loaded_at, automaton)
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def invalidate_on_commit(self):
+        """Invalidate once the current transaction commits, so a rebuild sees the new rows"""
+        transaction.on_commit(self.invalidate)
+
+    def automaton(self):
+        """Current automaton, rebuilt if the keyword table changed or the TTL expired"""
+        with self._lock:
+            version = self._version
+            loaded = self._loaded
+            if loaded and loaded[0] == version and time.monotonic() - loaded[1] < self.ttl_seconds:
+                return loaded[2]
+
+        automaton = build_category_automaton(
+            CategoryKeyword.objects.values_list('keyword', 'priority', 'category__name')
+        )
+
+        with self._lock:
+            # Don't record a build older than an invalidation
+            if self._version == version:
+                self._loaded = (version, time.monotonic(), automaton)
+        return automaton
+
+    def guess(self, product_name):
+        """Guess the category of a product name (see guess_category)"""
+        return guess_category(self.automaton(), product_name)
+
+
+# Shared by the callers of parsers in this process
+category_keyword_index = CategoryKeywordIndex()
+
+
+@receiver([post_save, post_delete], sender=CategoryKeyword)
+def invalidate_category_keywords(sender, **kwargs):
+    category_keyword_index.invalidate_on_commit()
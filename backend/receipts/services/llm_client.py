@@ -0,0 +1,237 @@
+"""
+Shared, bounded and circuit-broken OpenAI client
+backend/receipts/services/llm_client.py
+"""
+
+import os
+import time
+import threading
+import httpx
+from openai import (
+    OpenAI, APIConnectionError, APIStatusError, APITimeoutError, InternalServerError, RateLimitError
+)
+
+
+# Errors that say the upstream is unhealthy (as opposed to a bad request)
+UPSTREAM_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while its circuit is open"""
+
+
+class LLMSaturatedError(Exception):
+    """Raised when no in-flight slot frees up in time"""
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures, half-open after a cool-down.
+
+    While open every call is rejected at once. After `recovery_timeout`
+    seconds a limited number of trial calls go through (half-open); one
+    success closes the circuit, one failure opens it again. Every allowed
+    call must end in record_success, record_failure or release, or the
+    half-open slot it took is never given back.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=None, recovery_timeout=None, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold or int(os.getenv('OPENAI_BREAKER_FAILURE_THRESHOLD', '5'))
+        self.recovery_timeout = recovery_timeout or float(os.getenv('OPENAI_BREAKER_RECOVERY_SECONDS', '30'))
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.half_open_calls = 0
+        self.rejected = 0
+        self.transitions = {}  # 'closed->open' etc. -> count
+
+    def _transition(self, new_state):
+        key = f"{self.state}->{new_state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        print(f"LLM circuit breaker: {key}")
+        self.state = new_state
+        if new_state == self.OPEN:
+            self.opened_at = time.monotonic()
+        if new_state == self.HALF_OPEN:
+            self.half_open_calls = 0
+
+    def allow(self):
+        """Whether a call may go upstream now (counts rejections)"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self._transition(self.HALF_OPEN)
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self.half_open_calls < self.half_open_max_calls:
+                self.half_open_calls += 1
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN:
+                self._transition(self.OPEN)
+            elif self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._transition(self.OPEN)
+
+    def release(self):
+        """Give back an allowed call that ended without telling us anything about the upstream"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+                self.half_open_calls -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'rejected': self.rejected,
+                'transitions': dict(self.transitions),
+            }
+
+
+class LLMClient:
+    """Process-wide OpenAI access for receipt parsing.
+
+    - one pooled OpenAI/httpx client per process (rebuilt after a fork)
+    - a semaphore bounding in-flight requests (OPENAI_MAX_IN_FLIGHT)
+    - a deadline per call covering all attempts (OPENAI_CALL_DEADLINE_SECONDS),
+      with each attempt capped at OPENAI_TIMEOUT_SECONDS
+    - a circuit breaker that rejects calls at once while the upstream is failing
+    """
+
+    def __init__(self):
+        self.timeout = float(os.getenv('OPENAI_TIMEOUT_SECONDS', '20'))
+        self.deadline = float(os.getenv('OPENAI_CALL_DEADLINE_SECONDS', '30'))
+        self.max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '1'))
+        self.max_in_flight = int(os.getenv('OPENAI_MAX_IN_FLIGHT', '8'))
+        self.queue_timeout = float(os.getenv('OPENAI_QUEUE_TIMEOUT_SECONDS', '5'))
+        self.breaker = CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._clients = {}  # (pid, api_key, base_url) -> OpenAI
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.saturated = 0
+
+    def get_client(self, api_key, base_url=None):
+        """Shared OpenAI client for these credentials in this process"""
+        key = (os.getpid(), api_key, base_url)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # Drop clients inherited from a parent process
+                self._clients = {k: v for k, v in self._clients.items() if k[0] == key[0]}
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    timeout=self.timeout,
+                    max_retries=0,  # retries happen in chat_completion, within the deadline
+                    http_client=httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=self.max_in_flight,
+                            max_keepalive_connections=self.max_in_flight
+                        ),
+                        timeout=self.timeout
+                    )
+                )
+                self._clients[key] = client
+            return client
+
+    def chat_completion(self, client, deadline=None, **kwargs):
+        """
+        Create a chat completion within a deadline
+
+        Args:
+            client: OpenAI client from get_client
+            deadline: Seconds for the whole call including retries (default OPENAI_CALL_DEADLINE_SECONDS)
+            **kwargs: Passed to client.chat.completions.create
+
+        Raises:
+            CircuitOpenError: The upstream is unhealthy; use the local parser
+            LLMSaturatedError: Too many calls in flight
+            openai errors: When every attempt failed or the request was rejected
+        """
+        started = time.monotonic()
+        deadline_at = started + (deadline or self.deadline)
+
+        # Rejected calls should not wait for a slot first
+        if not self.breaker.allow():
+            raise CircuitOpenError('LLM circuit open, skipping call')
+
+        if not self._slots.acquire(timeout=min(self.queue_timeout, deadline or self.deadline)):
+            self.breaker.release()
+            with self._lock:
+                self.saturated += 1
+            raise LLMSaturatedError(f'{self.max_in_flight} LLM calls already in flight')
+
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+        settled = False
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline_at - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise APITimeoutError(request=httpx.Request('POST', 'chat/completions'))
+                    response = client.with_options(timeout=min(self.timeout, remaining)).chat.completions.create(**kwargs)
+                except UPSTREAM_ERRORS:
+                    attempt += 1
+                    backoff = min(0.5 * 2 ** (attempt - 1), 4.0)
+                    if attempt > self.max_retries or time.monotonic() + backoff >= deadline_at:
+                        with self._lock:
+                            self.failures += 1
+                        self.breaker.record_failure()
+                        settled = True
+                        raise
+                    time.sleep(backoff)
+                    continue
+                except APIStatusError:
+                    # The upstream answered (400, 401, ...): it is healthy,
+                    # the request is what's wrong
+                    self.breaker.record_success()
+                    settled = True
+                    raise
+                self.breaker.record_success()
+                settled = True
+                return response
+        finally:
+            if not settled:
+                self.breaker.release()
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'calls': self.calls,
+                'failures': self.failures,
+                'saturated': self.saturated,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+            }
+        counters['breaker'] = self.breaker.stats()
+        return counters
+
+
+# Shared by every OpenAIReceiptParser in this process
+llm_client = LLMClient()
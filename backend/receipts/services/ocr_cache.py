@@ -0,0 +1,136 @@
+"""
+Content-addressed cache of OCR results
+backend/receipts/services/ocr_cache.py
+"""
+
+import os
+import json
+import threading
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Sum
+from django.utils import timezone
+
+
+class OCRResultCache:
+    """Persistent OCR result cache keyed by image SHA-256.
+
+    Identical image bytes never go to Azure twice. Entries are evicted least
+    recently used first once the cache grows past OCR_CACHE_MAX_BYTES.
+    """
+
+    # Per-process counters, see stats()
+    _lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or int(os.getenv('OCR_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+    @classmethod
+    def _count(cls, counter, amount=1):
+        with cls._lock:
+            setattr(cls, counter, getattr(cls, counter) + amount)
+
+    def get(self, image_sha256):
+        """
+        Look up a cached OCR result
+
+        Args:
+            image_sha256: Hex digest of the image bytes
+
+        Returns:
+            dict in the extract_text_from_image shape, or None on a miss
+        """
+        from receipts.models import OCRCacheEntry
+
+        if not image_sha256:
+            return None
+
+        entry = OCRCacheEntry.objects.filter(image_sha256=image_sha256).first()
+        if entry is None:
+            self._count('_misses')
+            return None
+
+        # Touch the entry so it moves to the back of the eviction order
+        OCRCacheEntry.objects.filter(id=entry.id).update(
+            hit_count=F('hit_count') + 1,
+            last_accessed_at=timezone.now()
+        )
+        self._count('_hits')
+
+        return {
+            'success': True,
+            'text': entry.text,
+            'raw_result': entry.raw_result,
+            'error': None,
+            'cached': True
+        }
+
+    def put(self, image_sha256, text, raw_result):
+        """Store a successful OCR result and evict old entries if over the size cap"""
+        from receipts.models import OCRCacheEntry
+
+        if not image_sha256:
+            return None
+
+        size_bytes = len(text.encode('utf-8')) + len(json.dumps(raw_result, cls=DjangoJSONEncoder))
+
+        entry, _ = OCRCacheEntry.objects.update_or_create(
+            image_sha256=image_sha256,
+            defaults={
+                'text': text,
+                'raw_result': raw_result,
+                'size_bytes': size_bytes,
+                'last_accessed_at': timezone.now()
+            }
+        )
+        self.evict()
+        return entry
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in max_bytes
+
+        Returns:
+            int: Number of entries evicted
+        """
+        from receipts.models import OCRCacheEntry
+
+        total = OCRCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+        if total <= self.max_bytes:
+            return 0
+
+        excess = total - self.max_bytes
+        evict_ids = []
+        freed = 0
+        oldest_first = OCRCacheEntry.objects.order_by('last_accessed_at').values_list('id', 'size_bytes')
+        for entry_id, size_bytes in oldest_first.iterator():
+            evict_ids.append(entry_id)
+            freed += size_bytes
+            if freed >= excess:
+                break
+
+        OCRCacheEntry.objects.filter(id__in=evict_ids).delete()
+        self._count('_evictions', len(evict_ids))
+        return len(evict_ids)
+
+    @classmethod
+    def stats(cls):
+        """Hit/miss counters for this process plus the persisted cache size"""
+        from receipts.models import OCRCacheEntry
+
+        persisted = OCRCacheEntry.objects.aggregate(
+            total_bytes=Sum('size_bytes'),
+            total_hits=Sum('hit_count')
+        )
+        lookups = cls._hits + cls._misses
+        return {
+            'hits': cls._hits,
+            'misses': cls._misses,
+            'evictions': cls._evictions,
+            'hit_rate': round(cls._hits / lookups, 4) if lookups else 0.0,
+            'entries': OCRCacheEntry.objects.count(),
+            'total_bytes': persisted['total_bytes'] or 0,
+            'total_hits': persisted['total_hits'] or 0,
+        }
@@ -0,0 +1,198 @@
+"""
+Adaptive polling for Azure Read API operations
+backend/receipts/services/ocr_poller.py
+"""
+
+import os
+import asyncio
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone as dt_timezone
+
+
+# Statuses that mean the Read operation has not finished yet
+PENDING_STATUSES = {'notStarted', 'running'}
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP date
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=dt_timezone.utc)
+    return max((retry_at - datetime.now(dt_timezone.utc)).total_seconds(), 0.0)
+
+
+class BackoffPolicy:
+    """Exponential backoff that starts small and honours server hints"""
+
+    def __init__(self, initial_delay=None, multiplier=None, max_delay=None, timeout=None):
+        self.initial_delay = initial_delay if initial_delay is not None else float(os.getenv('AZURE_OCR_POLL_INITIAL_DELAY', '0.05'))
+        self.multiplier = multiplier if multiplier is not None else float(os.getenv('AZURE_OCR_POLL_MULTIPLIER', '1.5'))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv('AZURE_OCR_POLL_MAX_DELAY', '1.0'))
+        self.timeout = timeout if timeout is not None else float(os.getenv('AZURE_OCR_POLL_TIMEOUT', '60'))
+
+    def next_delay(self, previous_delay, retry_after=None):
+        """
+        Work out how long to sleep before the next poll
+
+        Args:
+            previous_delay: Delay used before the last poll (None for the first)
+            retry_after: Seconds requested by the server, if any
+
+        Returns:
+            float: Seconds to wait
+        """
+        if previous_delay is None:
+            delay = self.initial_delay
+        else:
+            delay = min(previous_delay * self.multiplier, self.max_delay)
+
+        # Never poll sooner than the server asked us to
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+def text_from_read_result(result):
+    """
+    Join the recognised lines of a Read result into a single string
+
+    Args:
+        result: ReadOperationResult model or its dict form (camelCase REST payload)
+
+    Returns:
+        str: Extracted text, one OCR line per text line
+    """
+    extracted_text = []
+
+    if isinstance(result, dict):
+        analyze_result = result.get('analyzeResult') or result.get('analyze_result') or {}
+        pages = analyze_result.get('readResults') or analyze_result.get('read_results') or []
+        for page in pages:
+            for line in page.get('lines', []):
+                extracted_text.append(line.get('text', ''))
+    elif result.analyze_result and result.analyze_result.read_results:
+        for page in result.analyze_result.read_results:
+            for line in page.lines:
+                extracted_text.append(line.text)
+
+    return '\n'.join(extracted_text)
+
+
+class ReadResultPoller:
+    """Poll Azure Read operations with adaptive backoff.
+
+    `poll_many` polls any number of operation IDs concurrently on one asyncio
+    loop over the REST API, so a worker's whole batch of receipts can be in
+    flight without a thread each.
+    """
+
+    def __init__(self, endpoint=None, key=None, policy=None, max_concurrency=None):
+        self.endpoint = (endpoint or os.getenv('AZURE_COMPUTER_VISION_ENDPOINT') or '').rstrip('/')
+        self.key = key or os.getenv('AZURE_COMPUTER_VISION_KEY')
+        self.policy = policy or BackoffPolicy()
+        self.max_concurrency = max_concurrency or int(os.getenv('AZURE_OCR_POLL_CONCURRENCY', '32'))
+
+    def _result_url(self, operation_id):
+        return f"{self.endpoint}/vision/v3.2/read/analyzeResults/{operation_id}"
+
+    async def poll_async(self, http_client, operation_id):
+        """
+        Poll one operation over REST until it finishes or times out
+
+        Args:
+            http_client: httpx.AsyncClient shared by all in-flight polls
+            operation_id: Read operation ID (last segment of Operation-Location)
+
+        Returns:
+            dict: 'status', 'result' (REST payload or None), 'polls', 'elapsed' and 'error'
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        delay = None
+        polls = 0
+        payload = None
+
+        try:
+            while True:
+                response = await http_client.get(
+                    self._result_url(operation_id),
+                    headers={'Ocp-Apim-Subscription-Key': self.key}
+                )
+                polls += 1
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+                # Throttled - back off as instructed and try again
+                if response.status_code == 429:
+                    payload = None
+                else:
+                    response.raise_for_status()
+                    payload = response.json()
+                    if payload.get('status') not in PENDING_STATUSES:
+                        break
+
+                delay = self.policy.next_delay(delay, retry_after)
+                if loop.time() - started + delay > self.policy.timeout:
+                    break
+                await asyncio.sleep(delay)
+        except Exception as e:
+            return {
+                'status': 'error',
+                'result': None,
+                'polls': polls,
+                'elapsed': loop.time() - started,
+                'error': f'OCR polling error: {str(e)}'
+            }
+
+        status = payload.get('status') if payload else 'throttled'
+        return {
+            'status': status if status not in PENDING_STATUSES else 'timeout',
+            'result': payload,
+            'polls': polls,
+            'elapsed': loop.time() - started,
+            'error': None if status == 'succeeded' else f'OCR operation finished with status: {status}'
+        }
+
+    async def poll_many_async(self, operation_ids):
+        """
+        Poll many operations concurrently on the running event loop
+
+        Returns:
+            dict: operation_id -> poll_async result
+        """
+        import httpx
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency)
+
+        async with httpx.AsyncClient(limits=limits, timeout=30.0) as http_client:
+            async def _bounded(operation_id):
+                async with semaphore:
+                    return operation_id, await self.poll_async(http_client, operation_id)
+
+            results = await asyncio.gather(*(_bounded(op_id) for op_id in operation_ids))
+
+        return dict(results)
+
+    def poll_many(self, operation_ids):
+        """Synchronous wrapper around poll_many_async for worker code"""
+        return asyncio.run(self.poll_many_async(list(operation_ids)))
@@ -5,11 +5,21 @@ backend/receipts/services/ocr_service.py
 
 import os
 from azure.cognitiveservices.vision.computervision import ComputerVisionClient
-from azure.cognitiveservices.vision.computervision.models import OperationStatusCodes
+from azure.cognitiveservices.vision.computervision.models import ReadOperationResult
 from msrest.authentication import CognitiveServicesCredentials
-import time
-from django.utils import timezone
 from django.db import transaction
+from receipts.services.ocr_poller import ReadResultPoller, text_from_read_result
+from receipts.services.ocr_cache import OCRResultCache
+from receipts.services.image_preprocessor import ReceiptImagePreprocessor
+from receipts.services.ingestion import ReceiptIngestionPlanner
+from receipts.services.catalog_resolver import catalog_resolver
+from receipts.services.standin_server import get_standin_url
+from receipts.services.parser_router import ParserRouter
+from products.services.normalization import normalize_product_name
+
+
+class ReceiptRejectedError(Exception):
+    """Raised when the text is not a usable receipt; retrying gives the same answer"""
 
 
 class AzureOCRService:
@@ -19,6 +29,12 @@ class AzureOCRService:
         self.endpoint = os.getenv('AZURE_COMPUTER_VISION_ENDPOINT')
         self.key = os.getenv('AZURE_COMPUTER_VISION_KEY')
         
+        # Load tests talk to the local stand-in instead of Azure
+        standin_url = get_standin_url()
+        if standin_url:
+            self.endpoint = standin_url
+            self.key = self.key or 'standin'
+        
         if not self.endpoint or not self.key:
             raise ValueError(
                 "Azure Computer Vision credentials not found. "
@@ -38,159 +54,157 @@ class AzureOCRService:
             image_path: Path to the image file
             
         Returns:
-            dict: Contains 'text' (extracted text) and 'raw_result' (full API response)
+            dict: Contains 'text' (extracted text), 'raw_result' (full API response)
+            and 'preprocessing' (bytes saved and time spent shrinking the image)
         """
-        try:
-            # Open the image file
-            with open(image_path, 'rb') as image_stream:
-                # Call the API to read the image
-                read_operation = self.client.read_in_stream(
-                    image_stream,
-                    raw=True
-                )
-            
-            # Get the operation location (URL with operation ID)
-            operation_location = read_operation.headers["Operation-Location"]
-            operation_id = operation_location.split("/")[-1]
-            
-            # Wait for the operation to complete
-            max_retries = 10
-            retry_count = 0
-            while retry_count < max_retries:
-                read_result = self.client.get_read_result(operation_id)
-                
-                if read_result.status not in [
-                    OperationStatusCodes.running,
-                    OperationStatusCodes.not_started
-                ]:
-                    break
-                
-                time.sleep(1)
-                retry_count += 1
+        return self.extract_text_from_images([image_path])[image_path]
+    
+    def extract_text_from_images(self, image_paths):
+        """
+        Extract text from several images, polling all Read operations concurrently
+        
+        Args:
+            image_paths: List of image file paths
             
-            # Check if operation succeeded
-            if read_result.status != OperationStatusCodes.succeeded:
-                return {
+        Returns:
+            dict: image_path -> result dict in the same shape as extract_text_from_image
+        """
+        results = {}
+        operations = {}
+        preprocessing = {}
+        preprocessor = ReceiptImagePreprocessor()
+        
+        # Submitting is a quick POST per image; the slow part is waiting for results
+        for image_path in image_paths:
+            try:
+                # Orient, crop and shrink the photo, then upload it from memory
+                preprocessed = preprocessor.process(image_path)
+                print(f"Pre-processed image: {preprocessed['original_bytes']} -> "
+                      f"{preprocessed['uploaded_bytes']} bytes "
+                      f"(saved {preprocessed['bytes_saved']}) in {preprocessed['elapsed_ms']}ms")
+                read_operation = self.client.read_in_stream(preprocessed.pop('stream'), raw=True)
+                preprocessing[image_path] = preprocessed
+                operation_location = read_operation.headers["Operation-Location"]
+                operations[operation_location.split("/")[-1]] = image_path
+            except FileNotFoundError:
+                results[image_path] = {
                     'success': False,
-                    'error': f'OCR operation failed with status: {read_result.status}',
+                    'error': f'Image file not found: {image_path}',
                     'text': '',
                     'raw_result': None
                 }
+            except Exception as e:
+                results[image_path] = {
+                    'success': False,
+                    'error': f'OCR error: {str(e)}',
+                    'text': '',
+                    'raw_result': None
+                }
+        
+        if not operations:
+            return results
+        
+        poller = ReadResultPoller(endpoint=self.endpoint, key=self.key)
+        for operation_id, poll in poller.poll_many(operations.keys()).items():
+            image_path = operations[operation_id]
+            if poll['status'] != 'succeeded':
+                results[image_path] = {
+                    'success': False,
+                    'error': f'{poll["error"]} after {poll["polls"]} polls ({poll["elapsed"]:.2f}s)',
+                    'text': '',
+                    'raw_result': None,
+                    'preprocessing': preprocessing[image_path]
+                }
+                continue
             
-            # Extract text from results
-            extracted_text = []
-            if read_result.analyze_result and read_result.analyze_result.read_results:
-                for page in read_result.analyze_result.read_results:
-                    for line in page.lines:
-                        extracted_text.append(line.text)
-            
-            full_text = '\n'.join(extracted_text)
-            
-            return {
+            # Same snake_case shape the SDK model gives, whatever the transport
+            read_result = ReadOperationResult.deserialize(poll['result'])
+            results[image_path] = {
                 'success': True,
-                'text': full_text,
+                'text': text_from_read_result(read_result),
                 'raw_result': read_result.as_dict(),
-                'error': None
+                'error': None,
+                'preprocessing': preprocessing[image_path]
             }
+        
+        return results
+    
+    @staticmethod
+    def extract_receipt_texts(receipts):
+        """
+        OCR results for receipts' images, from the OCR cache where possible
+        
+        Cache misses go to Azure together, so their Read operations are polled
+        concurrently; successful results are cached.
+        
+        Args:
+            receipts: Receipt model instances
             
-        except FileNotFoundError:
-            return {
-                'success': False,
-                'error': f'Image file not found: {image_path}',
-                'text': '',
-                'raw_result': None
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'OCR error: {str(e)}',
-                'text': '',
-                'raw_result': None
-            }
+        Returns:
+            dict: receipt id -> result dict in the extract_text_from_image shape
+        """
+        # Identical image bytes reuse the cached OCR result
+        ocr_cache = OCRResultCache()
+        results = {}
+        misses = {}
+        for receipt in receipts:
+            ocr_result = ocr_cache.get(receipt.image_sha256)
+            if ocr_result is None:
+                misses[receipt.id] = receipt
+            else:
+                print(f"OCR cache hit for image {receipt.image_sha256[:12]}")
+                results[receipt.id] = ocr_result
+        
+        if not misses:
+            return results
+        
+        image_paths = {receipt_id: receipt.receipt_image.path for receipt_id, receipt in misses.items()}
+        extracted = AzureOCRService().extract_text_from_images(image_paths.values())
+        for receipt_id, receipt in misses.items():
+            ocr_result = extracted[image_paths[receipt_id]]
+            if ocr_result['success']:
+                ocr_cache.put(receipt.image_sha256, ocr_result['text'], ocr_result['raw_result'])
+            results[receipt_id] = ocr_result
+        return results
     
     @staticmethod
     def _is_openai_configured():
         """Check if OpenAI is properly configured"""
-        api_key = os.getenv('OPENAI_API_KEY')
-        return api_key is not None and len(api_key.strip()) > 0
+        return ParserRouter.llm_configured()
     
     @staticmethod
     def _parse_receipt_with_fallback(ocr_text):
         """
-        Parse receipt text using OpenAI if configured, otherwise fall back to manual parser
+        Parse receipt text with the local parser, escalating to OpenAI only when
+        the local result fails its quality checks (see ParserRouter)
         
         Args:
             ocr_text: OCR extracted text from receipt
             
         Returns:
-            dict: Parsed receipt data
+            dict: Parsed receipt data, with 'parser_version' and 'routing'
         """
-        # Try OpenAI first if configured
-        if AzureOCRService._is_openai_configured():
-            try:
-                from receipts.services.openai_receipt_parser import OpenAIReceiptParser
-                
-                print("Using OpenAI parser...")
-                parser = OpenAIReceiptParser()
-                parsed_data = parser.parse_receipt_text(ocr_text)
-                
-                # If OpenAI parsing was successful, return it
-                if parsed_data.get('success'):
-                    print(f"OpenAI parsing successful (confidence: {parsed_data.get('confidence')})")
-                    return parsed_data
-                else:
-                    print(f"OpenAI parsing failed: {parsed_data.get('error')}")
-                    
-            except ImportError:
-                print("OpenAI parser module not available, falling back to manual parser")
-            except Exception as e:
-                print(f"OpenAI parser error: {str(e)}, falling back to manual parser")
-        else:
-            print("OpenAI not configured, using manual parser")
-        
-        # Fall back to manual parser
-        try:
-            from receipts.services.receipt_parser import ReceiptParser
-            
-            print("Using manual receipt parser...")
-            parser = ReceiptParser()
-            parsed_data = parser.parse_receipt_text(ocr_text)
-            
-            print(f"Manual parsing result: success={parsed_data.get('success')}, "
-                  f"confidence={parsed_data.get('confidence')}, "
-                  f"items={len(parsed_data.get('items', []))}")
-            
-            return parsed_data
-            
-        except Exception as e:
-            print(f"Manual parser error: {str(e)}")
-            return {
-                'success': False,
-                'is_receipt': False,
-                'error': f'All parsers failed: {str(e)}',
-                'confidence': 'low'
-            }
+        return ParserRouter().parse(ocr_text)
     
     @staticmethod
-    def process_receipt_ocr(receipt, extract_text=True):
+    def process_receipt_ocr(receipt, extract_text=True, ocr_result=None):
         """
         Process receipt with OCR and extract data.
         
         Args:
             receipt: Receipt model instance
             extract_text: If True, extract text from image. If False, use already extracted text.
+            ocr_result: OCR result already fetched for this receipt (see
+                extract_receipt_texts), e.g. as part of a worker's batch
         """
-        from receipts.models import ReceiptItem
-        from products.models import Store, Product, Category, PriceHistory
-        
         receipt.status = 'processing'
         receipt.save()
         
         try:
             # Step 1: Extract text using Azure OCR (only if extract_text is True)
             if extract_text:
-                ocr_service = AzureOCRService()
-                ocr_result = ocr_service.extract_text_from_image(receipt.receipt_image.path)
+                if ocr_result is None:
+                    ocr_result = AzureOCRService.extract_receipt_texts([receipt])[receipt.id]
                 
                 if not ocr_result['success']:
                     raise Exception(ocr_result['error'])
@@ -201,10 +215,11 @@ class AzureOCRService:
             else:
                 # Use already extracted text for reprocessing
                 if not receipt.ocr_text:
-                    raise Exception('No OCR text available for reprocessing')
+                    raise ReceiptRejectedError('No OCR text available for reprocessing')
             
             # Step 2: Parse receipt data using OpenAI or fallback to manual parser
             parsed_data = AzureOCRService._parse_receipt_with_fallback(receipt.ocr_text)
+            ParserRouter.record(receipt, parsed_data)
             
             # Check if it's a valid receipt
             if not parsed_data.get('success') or not parsed_data.get('is_receipt'):
@@ -212,93 +227,76 @@ class AzureOCRService:
                 receipt.status = 'failed'
                 receipt.processing_error = error_msg
                 receipt.save()
-                raise Exception(error_msg)
-            
-            # Step 3: Update receipt with parsed data using transaction
-            with transaction.atomic():
-                # Update receipt fields
-                if parsed_data.get('store_name'):
-                    receipt.store_name = parsed_data['store_name']
-                if parsed_data.get('store_location'):
-                    receipt.store_location = parsed_data['store_location']
-                if parsed_data.get('purchase_date'):
-                    receipt.purchase_date = parsed_data['purchase_date']
-                if parsed_data.get('total_amount') is not None:
-                    receipt.total_amount = parsed_data['total_amount']
-                if parsed_data.get('tax_amount') is not None:
-                    receipt.tax_amount = parsed_data['tax_amount']
-                
-                receipt.save()
-                
-                # Step 4: Get or create store
-                # Stores created from receipts need approval unless created by staff
-                store = None
-                if receipt.store_name:
-                    store = AzureOCRService._get_or_create_store(
-                        receipt.store_name,
-                        receipt.store_location or '',
-                        receipt.user
-                    )
-                    print(f"Store: {store.name} (approved: {store.is_approved})")
-                
-                # Step 5: Create receipt items and products
-                items_created = 0
-                if parsed_data.get('items'):
-                    for item_data in parsed_data['items']:
-                        # Try to find or create the product
-                        # Products created from receipts need approval unless user is staff
-                        product = AzureOCRService._get_or_create_product(
-                            item_data,
-                            receipt.user
-                        )
-                        
-                        # Create receipt item
-                        receipt_item = ReceiptItem.objects.create(
-                            receipt=receipt,
-                            product=product,
-                            product_name=item_data['name'],
-                            normalized_name=item_data.get('normalized_name', item_data['name'].lower()),
-                            quantity=item_data['quantity'],
-                            unit_price=item_data['unit_price'],
-                            total_price=item_data['total_price']
-                        )
-                        items_created += 1
-                        
-                        # Step 6: Update price history if we have a store and product
-                        # Prices created from receipts need approval unless user is staff
-                        if store and product:
-                            is_staff = receipt.user.is_staff if receipt.user else False
-                            
-                            price_history, created = PriceHistory.objects.update_or_create(
-                                product=product,
-                                store=store,
-                                date_recorded=receipt.purchase_date or timezone.now().date(),
-                                defaults={
-                                    'price': item_data['unit_price'],
-                                    'source': 'receipt',
-                                    'is_active': is_staff,  # Only active if created by staff
-                                    'is_approved': is_staff,  # Only approved if created by staff
-                                    'created_by': receipt.user
-                                }
-                            )
-                            
-                            if created:
-                                print(f"Created price: ${item_data['unit_price']} for {product.name} at {store.name} (approved: {price_history.is_approved})")
-                            else:
-                                print(f"Updated price: ${item_data['unit_price']} for {product.name} at {store.name}")
-                
-                print(f"Created {items_created} receipt items")
-                
-                receipt.status = 'completed'
-                receipt.processing_note = f"Parsed with {parsed_data.get('confidence', 'unknown')} confidence"
-                receipt.save()
+                raise ReceiptRejectedError(error_msg)
             
+            AzureOCRService.apply_parsed_receipt(receipt, parsed_data)
+        
         except Exception as e:
             receipt.status = 'failed'
             receipt.processing_error = str(e)
             receipt.save()
             raise
     
+    @staticmethod
+    def apply_parsed_receipt(receipt, parsed_data):
+        """
+        Write a successful parse to a receipt: fields, store, items and prices
+        
+        The receipt must have no items yet. Runs in its own transaction (a
+        savepoint when the caller batches several receipts in one).
+        
+        Args:
+            receipt: Receipt model instance
+            parsed_data: Successful parser output
+            
+        Returns:
+            int: Number of receipt items created
+        """
+        # Resolve products and categories for every item up front, with
+        # set-based reads outside the write transaction
+        planner = ReceiptIngestionPlanner(receipt, None, parsed_data.get('items')).plan()
+        
+        # Step 3: Update receipt with parsed data using transaction
+        with transaction.atomic():
+            # Update receipt fields
+            if parsed_data.get('store_name'):
+                receipt.store_name = parsed_data['store_name']
+            if parsed_data.get('store_location'):
+                receipt.store_location = parsed_data['store_location']
+            if parsed_data.get('purchase_date'):
+                receipt.purchase_date = parsed_data['purchase_date']
+            if parsed_data.get('total_amount') is not None:
+                receipt.total_amount = parsed_data['total_amount']
+            if parsed_data.get('tax_amount') is not None:
+                receipt.tax_amount = parsed_data['tax_amount']
+            
+            # Step 4: Get or create store
+            # Stores created from receipts need approval unless created by staff
+            store = None
+            if receipt.store_name:
+                store = AzureOCRService._get_or_create_store(
+                    receipt.store_name,
+                    receipt.store_location or '',
+                    receipt.user
+                )
+                print(f"Store: {store.name} (approved: {store.is_approved})")
+            
+            # Step 5 & 6: Bulk-create products, receipt items and price history
+            # Products and prices created from receipts need approval unless user is staff
+            planner.store = store
+            items_created = planner.write()
+            
+            print(f"Created {items_created} receipt items "
+                  f"({planner.products_created} new products, {planner.categories_created} new categories)")
+            
+            # Parsed fields and the final status are saved together
+            receipt.status = 'completed'
+            receipt.parser_version = parsed_data.get('parser_version', '')
+            receipt.processing_note = f"Parsed with {parsed_data.get('confidence', 'unknown')} confidence"
+            receipt.save()
+        
+        return items_created
+    
     @staticmethod
     def _get_or_create_store(store_name, store_location, user):
         """
@@ -315,10 +313,10 @@ class AzureOCRService:
         from products.models import Store
         
         # Try to find existing approved store by name
-        existing_store = Store.objects.filter(
-            name__iexact=store_name,
-            is_approved=True
-        ).first()
+        existing_store = None
+        store_id = catalog_resolver.resolve_store(store_name)
+        if store_id is not None:
+            existing_store = Store.objects.filter(id=store_id).first()
         
         if existing_store:
             print(f"Found existing approved store: {existing_store.name}")
@@ -367,18 +365,14 @@ class AzureOCRService:
         """
         from products.models import Product, Category
         
-        normalized_name = item_data.get('normalized_name', item_data['name'].lower())
+        normalized_name = normalize_product_name(item_data.get('normalized_name') or item_data['name'])
         brand = item_data.get('brand', '')
         
         # Try to find existing approved product by normalized name and brand
-        query = Product.objects.filter(
-            normalized_name=normalized_name,
-            is_approved=True
-        )
-        if brand:
-            query = query.filter(brand__iexact=brand)
-        
-        existing_product = query.first()
+        existing_product = None
+        product_id = catalog_resolver.resolve_product(normalized_name, brand)
+        if product_id is not None:
+            existing_product = Product.objects.filter(id=product_id).first()
         
         if existing_product:
             print(f"Found existing approved product: {existing_product.name}")
@@ -442,10 +436,10 @@ class AzureOCRService:
         from products.models import Category
         
         # Try to find existing approved category
-        existing_category = Category.objects.filter(
-            name__iexact=category_name,
-            is_approved=True
-        ).first()
+        existing_category = None
+        category_id = catalog_resolver.resolve_category(category_name)
+        if category_id is not None:
+            existing_category = Category.objects.filter(id=category_id).first()
         
         if existing_category:
             print(f"Found existing approved category: {existing_category.name}")
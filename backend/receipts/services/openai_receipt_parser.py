@@ -5,26 +5,53 @@ backend/receipts/services/openai_receipt_parser.py
 
 import os
 import json
-from openai import OpenAI
+import hashlib
 from datetime import datetime
 from decimal import Decimal
+from products.services.normalization import parse_product_name
+from receipts.services.parse_cache import parse_result_cache, parse_cache_key
+from receipts.services.standin_server import get_standin_url
+from receipts.services.llm_client import llm_client, CircuitOpenError, LLMSaturatedError
 
 
 class OpenAIReceiptParser:
     """Service for parsing OCR text from receipts using ChatGPT"""
     
+    # Bump when the prompt's meaning changes without its text changing
+    PROMPT_VERSION = '1'
+    
+    SYSTEM_PROMPT = "You are a receipt parsing assistant. Extract structured data from receipt text and return valid JSON only."
+    
     def __init__(self):
         self.api_key = os.getenv('OPENAI_API_KEY')
         
+        # Load tests talk to the local stand-in instead of OpenAI
+        standin_url = get_standin_url()
+        if standin_url:
+            self.api_key = self.api_key or 'standin'
+        
         if not self.api_key:
             raise ValueError(
                 "OpenAI API key not found. "
                 "Please set OPENAI_API_KEY in your environment variables"
             )
         
-        self.client = OpenAI(api_key=self.api_key)
+        # One pooled client per process, shared by every parser instance
+        self.client = llm_client.get_client(
+            self.api_key,
+            base_url=f"{standin_url}/v1" if standin_url else None
+        )
         self.model = os.getenv('OPENAI_MODEL', 'gpt-4.1-mini')
     
+    def prompt_fingerprint(self):
+        """Short hash of the prompt template, so template edits invalidate cached parses"""
+        template = self.PROMPT_VERSION + self.SYSTEM_PROMPT + self._create_parsing_prompt('')
+        return hashlib.sha256(template.encode('utf-8')).hexdigest()[:16]
+    
+    def parser_version(self):
+        """Version stored on receipts parsed by this parser (model and prompt)"""
+        return f"openai:{self.model}:{self.prompt_fingerprint()}"
+    
     def parse_receipt_text(self, text):
         """
         Parse receipt text using ChatGPT and extract structured data
@@ -42,17 +69,24 @@ class OpenAIReceiptParser:
                 'is_receipt': False
             }
         
+        # Same text, model and prompt -> same answer; skip the API call
+        cache_key = parse_cache_key(text, self.model, self.prompt_fingerprint())
+        cached = parse_result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Create the prompt for ChatGPT
             prompt = self._create_parsing_prompt(text)
             
-            # Call ChatGPT API
-            response = self.client.chat.completions.create(
+            # Call ChatGPT API (bounded concurrency, deadline, circuit breaker)
+            response = llm_client.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a receipt parsing assistant. Extract structured data from receipt text and return valid JSON only."
+                        "content": self.SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
@@ -69,9 +103,17 @@ class OpenAIReceiptParser:
             
             # Validate and transform the data
             validated_data = self._validate_and_transform(parsed_data)
+            parse_result_cache.set(cache_key, validated_data)
             
             return validated_data
             
+        except (CircuitOpenError, LLMSaturatedError) as e:
+            # Upstream unhealthy or busy: fail fast so the router uses the local parser
+            return {
+                'success': False,
+                'error': f'ChatGPT unavailable: {str(e)}',
+                'is_receipt': False
+            }
         except json.JSONDecodeError as e:
             return {
                 'success': False,
@@ -187,12 +229,13 @@ OCR Text to analyze:
         items = []
         for item_data in parsed_data.get('items', []):
             try:
+                normalized = parse_product_name(item_data.get('name', ''))
                 item = {
                     'name': item_data.get('name', '').strip(),
-                    'normalized_name': item_data.get('name', '').lower().strip(),
+                    'normalized_name': normalized.name,
                     'brand': item_data.get('brand', '').strip(),
                     'quantity': Decimal(str(item_data.get('quantity', 1.0))),
-                    'unit': item_data.get('unit', '').strip(),
+                    'unit': (item_data.get('unit') or '').strip() or normalized.unit,
                     'unit_price': Decimal(str(item_data.get('unit_price', 0))),
                     'total_price': Decimal(str(item_data.get('total_price', 0))),
                     'category': item_data.get('category', '').strip()
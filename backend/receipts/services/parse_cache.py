@@ -0,0 +1,82 @@
+"""
+In-process memo of receipt parse results
+backend/receipts/services/parse_cache.py
+"""
+
+import os
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_ocr_text(text):
+    """Collapse all whitespace so re-OCR'd or re-saved text keys the same"""
+    return ' '.join((text or '').split())
+
+
+def parse_cache_key(text, model, prompt_version):
+    """
+    Build the cache key for a parse
+
+    Args:
+        text: OCR text
+        model: LLM model name
+        prompt_version: Fingerprint of the prompt template
+
+    Returns:
+        str: Hex digest; changes whenever the text, model or prompt changes
+    """
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, normalize_ocr_text(text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ParseResultCache:
+    """Thread-safe LRU of parsed receipt dicts, bounded by entry count"""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or int(os.getenv('PARSE_CACHE_MAX_ENTRIES', '512'))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return a copy of the cached result, or None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers may mutate items, so never hand out the cached object
+        return copy.deepcopy(result)
+
+    def set(self, key, result):
+        """Cache a result, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = copy.deepcopy(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Shared by every parser instance in this process
+parse_result_cache = ParseResultCache()
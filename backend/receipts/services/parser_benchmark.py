@@ -0,0 +1,213 @@
+"""
+Latency and accuracy benchmark for receipt parsers
+backend/receipts/services/parser_benchmark.py
+"""
+
+import io
+import json
+import math
+import time
+import contextlib
+from decimal import Decimal
+from pathlib import Path
+
+
+CORPUS_DIR = Path(__file__).resolve().parent.parent / 'benchmarks' / 'corpus'
+
+SCALAR_FIELDS = ['is_receipt', 'store_name', 'store_location', 'purchase_date', 'total_amount', 'tax_amount']
+ITEM_FIELDS = ['name', 'quantity', 'unit_price', 'total_price', 'category']
+
+
+def _plain(value):
+    """JSON-friendly form of a parsed value; amounts compare by value, not by exponent"""
+    if isinstance(value, Decimal):
+        return format(value.normalize(), 'f')
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def to_golden(parsed):
+    """
+    Reduce a parse_receipt_text result to the fields the corpus checks
+
+    Args:
+        parsed: Parser output dict
+
+    Returns:
+        dict that can be written to / compared with a golden JSON file
+    """
+    golden = {field: _plain(parsed.get(field)) for field in SCALAR_FIELDS}
+    golden['is_receipt'] = bool(parsed.get('is_receipt'))
+    golden['items'] = [
+        {field: _plain(item.get(field)) for field in ITEM_FIELDS}
+        for item in parsed.get('items') or []
+    ]
+    return golden
+
+
+def compare_fields(expected, actual):
+    """
+    Field-level comparison of two golden dicts
+
+    Every scalar field, the item count and each field of each expected item
+    counts as one field. Extra parsed items only cost the item count.
+
+    Returns:
+        tuple: (matched, total, list of mismatch descriptions)
+    """
+    matched = 0
+    total = 0
+    mismatches = []
+
+    def check(label, want, got):
+        nonlocal matched, total
+        total += 1
+        if want == got:
+            matched += 1
+        else:
+            mismatches.append(f"{label}: expected {want!r}, got {got!r}")
+
+    for field in SCALAR_FIELDS:
+        check(field, expected.get(field), actual.get(field))
+
+    expected_items = expected.get('items') or []
+    actual_items = actual.get('items') or []
+    check('item_count', len(expected_items), len(actual_items))
+
+    for index, expected_item in enumerate(expected_items):
+        actual_item = actual_items[index] if index < len(actual_items) else {}
+        for field in ITEM_FIELDS:
+            check(f"items[{index}].{field}", expected_item.get(field), actual_item.get(field))
+
+    return matched, total, mismatches
+
+
+def load_corpus(corpus_dir=None):
+    """
+    Load corpus samples: NAME.txt with an optional NAME.json golden next to it
+
+    Goldens of the synthetic samples are hand-written expected output. The
+    anonymized real receipts start from reviewed reference parser output, so
+    they guard against regressions rather than measure absolute quality.
+
+    Returns:
+        list of dicts with name, text, golden (None if missing) and golden_path
+    """
+    corpus_dir = Path(corpus_dir or CORPUS_DIR)
+    samples = []
+    for text_path in sorted(corpus_dir.glob('*.txt')):
+        golden_path = text_path.with_suffix('.json')
+        golden = None
+        if golden_path.exists():
+            golden = json.loads(golden_path.read_text(encoding='utf-8'))
+        samples.append({
+            'name': text_path.stem,
+            'text': text_path.read_text(encoding='utf-8'),
+            'golden': golden,
+            'golden_path': golden_path,
+        })
+    return samples
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def get_parse_function(parser_name):
+    """
+    Resolve a parser name to a callable taking OCR text
+
+    Args:
+        parser_name: 'reference' (ReceiptParser) or 'fallback'
+            (AzureOCRService._parse_receipt_with_fallback, which uses OpenAI
+            when configured)
+    """
+    if parser_name == 'reference':
+        from receipts.services.receipt_parser import ReceiptParser
+        return ReceiptParser().parse_receipt_text
+    if parser_name == 'fallback':
+        from receipts.services.ocr_service import AzureOCRService
+        return AzureOCRService._parse_receipt_with_fallback
+    raise ValueError(f"Unknown parser: {parser_name}")
+
+
+class ParserBenchmark:
+    """Run a parse function over the corpus and report latency and accuracy"""
+
+    def __init__(self, parse, iterations=20, warmup=1, quiet=False):
+        self.parse = parse
+        self.iterations = max(iterations, 1)
+        self.warmup = warmup
+        # Swallow per-receipt progress prints (the fallback path), at some timing cost
+        self.quiet = quiet
+
+    def _call(self, text):
+        if not self.quiet:
+            return self.parse(text)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.parse(text)
+
+    def run(self, samples):
+        """
+        Benchmark every sample
+
+        Returns:
+            dict with overall latency percentiles (ms), throughput, accuracy
+            and a per-sample breakdown
+        """
+        all_latencies = []
+        per_sample = []
+        matched_total = 0
+        fields_total = 0
+        started = time.perf_counter()
+
+        for sample in samples:
+            for _ in range(self.warmup):
+                self._call(sample['text'])
+
+            latencies = []
+            parsed = None
+            for _ in range(self.iterations):
+                t0 = time.perf_counter()
+                parsed = self._call(sample['text'])
+                latencies.append((time.perf_counter() - t0) * 1000)
+            all_latencies.extend(latencies)
+
+            result = {
+                'name': sample['name'],
+                'p50_ms': round(percentile(latencies, 50), 4),
+                'p99_ms': round(percentile(latencies, 99), 4),
+                'items': len(parsed.get('items') or []),
+                'accuracy': None,
+                'mismatches': [],
+            }
+            if sample['golden'] is not None:
+                matched, total, mismatches = compare_fields(sample['golden'], to_golden(parsed))
+                matched_total += matched
+                fields_total += total
+                result['accuracy'] = round(matched / total, 4) if total else 1.0
+                result['mismatches'] = mismatches
+            per_sample.append(result)
+
+        elapsed = time.perf_counter() - started
+        parses = len(samples) * self.iterations
+
+        return {
+            'samples': len(samples),
+            'iterations': self.iterations,
+            'p50_ms': round(percentile(all_latencies, 50), 4),
+            'p99_ms': round(percentile(all_latencies, 99), 4),
+            # Measured parse time only, warmup excluded
+            'receipts_per_second': round(parses / (sum(all_latencies) / 1000), 1) if all_latencies else 0.0,
+            'wall_seconds': round(elapsed, 3),
+            'fields_matched': matched_total,
+            'fields_total': fields_total,
+            'accuracy': round(matched_total / fields_total, 4) if fields_total else None,
+            'per_sample': per_sample,
+        }
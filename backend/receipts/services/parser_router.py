@@ -0,0 +1,227 @@
+"""
+Confidence-gated routing between the local parser and the LLM parser
+backend/receipts/services/parser_router.py
+"""
+
+import os
+import time
+import threading
+from decimal import Decimal
+from receipts.services.receipt_parser import ReceiptParser
+from receipts.services.keyword_automaton import category_keyword_index
+from receipts.services.standin_server import get_standin_url
+
+
+CONFIDENCE_RANK = {'low': 0, 'medium': 1, 'high': 2}
+
+
+class ParserRouter:
+    """Run the local parser first and only escalate to the LLM when needed.
+
+    The local result is accepted when it is confident enough, has a purchase
+    date and its items add up to the total (or to the total less tax). Any
+    failed check escalates to OpenAI; if that fails too, a usable local
+    result is still returned.
+
+    Every result carries a 'routing' dict (route, failed checks, latencies)
+    that the pipeline stores as a ReceiptParseLog row. Per-process counters
+    are available from stats().
+    """
+
+    # Per-process counters, see stats()
+    _lock = threading.Lock()
+    _counts = {}
+    _latency_ms = {}  # 'local_ms' / 'llm_ms' -> [total, calls]
+
+    def __init__(self, min_confidence=None, total_tolerance=None, mode=None, category_automaton=None):
+        self.min_confidence = min_confidence or os.getenv('PARSER_ROUTER_MIN_CONFIDENCE', 'high')
+        self.total_tolerance = Decimal(str(
+            total_tolerance if total_tolerance is not None else os.getenv('PARSER_ROUTER_TOTAL_TOLERANCE', '0.02')
+        ))
+        # 'local_first' (default) or 'llm_first' (the old always-ask-OpenAI behaviour)
+        self.mode = mode or os.getenv('PARSER_ROUTING', 'local_first')
+        # Category keywords for the local parser; loaded on first use if not given
+        self.category_automaton = category_automaton
+
+    @staticmethod
+    def llm_configured():
+        """Check if OpenAI is properly configured"""
+        if get_standin_url():
+            return True
+        api_key = os.getenv('OPENAI_API_KEY')
+        return api_key is not None and len(api_key.strip()) > 0
+
+    # ------------------------------------------------------------------ checks
+
+    def check(self, parsed):
+        """
+        Quality checks for a local parse
+
+        Returns:
+            list of failed check names (empty means the result is good enough)
+        """
+        if not parsed.get('success') or not parsed.get('is_receipt'):
+            return ['not_a_receipt']
+
+        failed = []
+        confidence = CONFIDENCE_RANK.get(parsed.get('confidence'), 0)
+        if confidence < CONFIDENCE_RANK.get(self.min_confidence, 2):
+            failed.append('confidence')
+        if not parsed.get('purchase_date'):
+            failed.append('date')
+
+        items = parsed.get('items') or []
+        total = parsed.get('total_amount')
+        if not items:
+            failed.append('items')
+        elif not total:
+            failed.append('total')
+        elif not self._items_match_total(items, total, parsed.get('tax_amount')):
+            failed.append('items_sum')
+        return failed
+
+    def _items_match_total(self, items, total, tax):
+        items_sum = sum((item.get('total_price') or Decimal('0') for item in items), Decimal('0'))
+        allowed = max(abs(total) * self.total_tolerance, Decimal('0.05'))
+        targets = [total]
+        if tax:
+            targets.append(total - tax)
+        return any(abs(items_sum - target) <= allowed for target in targets)
+
+    # ----------------------------------------------------------------- routing
+
+    def parse(self, ocr_text):
+        """
+        Parse receipt text, escalating to the LLM only when the local parse fails its checks
+
+        Args:
+            ocr_text: OCR extracted text from receipt
+
+        Returns:
+            dict: Parsed receipt data with 'parser_version' and 'routing'
+        """
+        routing = {'route': None, 'checks_failed': [], 'local_ms': None, 'llm_ms': None}
+        llm_available = self.llm_configured()
+
+        local = None
+        if self.mode != 'llm_first' or not llm_available:
+            local = self._parse_local(ocr_text, routing)
+            routing['checks_failed'] = self.check(local)
+            if not routing['checks_failed']:
+                return self._finish(local, 'local', routing)
+            if not llm_available:
+                print("OpenAI not configured, using manual parser result")
+                return self._finish(local, 'local_unchecked', routing)
+            print(f"Local parse failed checks {routing['checks_failed']}, escalating to OpenAI")
+
+        llm = self._parse_llm(ocr_text, routing)
+        if llm is not None and llm.get('success'):
+            return self._finish(llm, 'llm', routing)
+
+        # The LLM didn't help; fall back to whatever the local parser made of it
+        if local is None:
+            local = self._parse_local(ocr_text, routing)
+            routing['checks_failed'] = self.check(local)
+        return self._finish(local, 'local_fallback', routing)
+
+    def _parse_local(self, ocr_text, routing):
+        if self.category_automaton is None:
+            # Outside the try below: a database error here is not a parse failure
+            self.category_automaton = category_keyword_index.automaton()
+        started = time.perf_counter()
+        try:
+            parser = ReceiptParser(category_automaton=self.category_automaton)
+            parsed = parser.parse_receipt_text(ocr_text)
+            parsed['parser_version'] = parser.PARSER_VERSION
+        except Exception as e:
+            print(f"Manual parser error: {str(e)}")
+            parsed = {
+                'success': False,
+                'is_receipt': False,
+                'error': f'All parsers failed: {str(e)}',
+                'confidence': 'low'
+            }
+        routing['local_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        print(f"Manual parsing result: success={parsed.get('success')}, "
+              f"confidence={parsed.get('confidence')}, "
+              f"items={len(parsed.get('items', []))}")
+        return parsed
+
+    def _parse_llm(self, ocr_text, routing):
+        started = time.perf_counter()
+        try:
+            from receipts.services.openai_receipt_parser import OpenAIReceiptParser
+
+            print("Using OpenAI parser...")
+            parser = OpenAIReceiptParser()
+            parsed = parser.parse_receipt_text(ocr_text)
+            if parsed.get('success'):
+                print(f"OpenAI parsing successful (confidence: {parsed.get('confidence')})")
+                parsed['parser_version'] = parser.parser_version()
+            else:
+                print(f"OpenAI parsing failed: {parsed.get('error')}")
+            return parsed
+        except ImportError:
+            print("OpenAI parser module not available, falling back to manual parser")
+        except Exception as e:
+            print(f"OpenAI parser error: {str(e)}, falling back to manual parser")
+        finally:
+            routing['llm_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return None
+
+    def _finish(self, parsed, route, routing):
+        routing['route'] = route
+        parsed['routing'] = routing
+        self._record(route, routing)
+        return parsed
+
+    # ------------------------------------------------------------------ stats
+
+    @classmethod
+    def _record(cls, route, routing):
+        with cls._lock:
+            cls._counts[route] = cls._counts.get(route, 0) + 1
+            for key in ('local_ms', 'llm_ms'):
+                if routing[key] is not None:
+                    latency = cls._latency_ms.setdefault(key, [0.0, 0])
+                    latency[0] += routing[key]
+                    latency[1] += 1
+
+    @classmethod
+    def stats(cls):
+        """Route counts, mean latencies and LLM client health for this process"""
+        from receipts.services.llm_client import llm_client
+
+        with cls._lock:
+            total = sum(cls._counts.values())
+            local_only = sum(cls._counts.get(route, 0) for route in ('local', 'local_unchecked'))
+            mean_ms = {
+                key: round(latency[0] / latency[1], 2) if latency[1] else 0.0
+                for key, latency in cls._latency_ms.items()
+            }
+            return {
+                'routes': dict(cls._counts),
+                'total': total,
+                'local_share': round(local_only / total, 4) if total else 0.0,
+                'mean_local_ms': mean_ms.get('local_ms', 0.0),
+                'mean_llm_ms': mean_ms.get('llm_ms', 0.0),
+                'llm': llm_client.stats(),
+            }
+
+    @staticmethod
+    def record(receipt, parsed):
+        """Store the routing decision of a parse for a receipt"""
+        from receipts.models import ReceiptParseLog
+
+        routing = parsed.get('routing')
+        if not routing:
+            return None
+        return ReceiptParseLog.objects.create(
+            receipt=receipt,
+            route=routing['route'],
+            checks_failed=routing['checks_failed'],
+            confidence=parsed.get('confidence') or '',
+            parser_version=parsed.get('parser_version', ''),
+            local_ms=routing['local_ms'],
+            llm_ms=routing['llm_ms']
+        )
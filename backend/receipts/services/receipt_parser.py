@@ -4,46 +4,78 @@ backend/receipts/services/receipt_parser.py
 """
 
 import re
+from collections import namedtuple
 from datetime import datetime
 from decimal import Decimal
+from products.services.normalization import parse_product_name
+from receipts.services.keyword_automaton import (
+    BUILTIN_CATEGORY_AUTOMATON, CATEGORY_KEYWORDS, SECTION_START, SECTION_END,
+    guess_category, has_non_product_keyword, line_labels
+)
+
+
+# ===================== PATTERNS =====================
+# Compiled once at import; the parser runs them on every line of every receipt
+
+STORE_PATTERNS = [
+    re.compile(r'(?:^|\n)([A-Z][A-Za-z\s&]+(?:SUPERMARKET|STORE|MART|SHOP|MARKET|GROCERY|DEPOT))', re.IGNORECASE),
+    re.compile(r'(?:^|\n)([A-Z][A-Z\s&]{3,30})', re.IGNORECASE),
+]
+
+DATE_PATTERNS = [
+    re.compile(r'(?:DATE|TIME|Date|Time)[:\s]+([A-Za-z]+\s+\d{1,2}\s+\d{4})', re.IGNORECASE),
+    re.compile(r'(?:DATE|TIME|Date|Time)[:\s]+(\d{1,2}/\d{1,2}/\d{4})\s+\d{1,2}:\d{2}', re.IGNORECASE),
+    re.compile(r'(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{4})', re.IGNORECASE),
+    re.compile(r'(\d{1,2}[-/]\d{1,2}[-/]\d{4})', re.IGNORECASE),
+    re.compile(r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})', re.IGNORECASE),
+]
+
+TOTAL_PATTERNS = [
+    re.compile(r'(?:^|\n)\s*(?:TOTAL\s+SALES|GRAND\s+TOTAL|TOTAL)[:\s]*\$?\s*([0-9¥.,]+)', re.IGNORECASE | re.MULTILINE),
+]
+
+TAX_PATTERNS = [
+    re.compile(r'(?:^|\n)\s*(?:GCT|TAX|VAT|GST|Tax\s+\d)[:\s]*\$?\s*([0-9.,]+)', re.IGNORECASE | re.MULTILINE),
+]
+
+STORE_KEYWORD_PREFIX = re.compile(r'^(.+?(?:supermarket|market|store))', re.IGNORECASE)
+PHONE_PREFIX = re.compile(r'^[\d\-\(\)]+')
+CITY_STATE = re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z][a-z]*(?:\s+[A-Z][a-z]*)*)')
+STREET_ADDRESS = re.compile(r'^\d+\s+[A-Z]')
+WHITESPACE_RUN = re.compile(r'\s+')
+HAS_PRICE = re.compile(r'\d+[.,]\d{2}')
+LINE_PRICE = re.compile(r'\d+[,.]?\d*[.,]\d{2}')
+QTY_PREFIX = re.compile(r'^\s*\d+(?:[.,]\d+)?\s*(?:@|\$|¥)')
+QTY_AT_PRICE = re.compile(r'^(\d+(?:[.,]\d+)?)\s+[@$¥]')
+SEPARATOR = re.compile(r'^[=\-\s]+$')
+PRODUCT_START = re.compile(r'^[A-Z0-9¥]')
+NUMERIC_ONLY = re.compile(r'^[\d\s,.\-¥]*$')
+LETTER = re.compile(r'[A-Za-z]')
+
+# One line of the items section, classified once per parse
+ItemLine = namedtuple('ItemLine', ['text', 'is_separator', 'is_price_or_qty', 'is_product_name', 'prices', 'quantity'])
 
 
 class ReceiptParser:
     """Service for parsing OCR text from receipts with support for multiple formats"""
     
-    def __init__(self):
-        self.store_patterns = [
-            r'(?:^|\n)([A-Z][A-Za-z\s&]+(?:SUPERMARKET|STORE|MART|SHOP|MARKET|GROCERY|DEPOT))',
-            r'(?:^|\n)([A-Z][A-Z\s&]{3,30})',
-        ]
-        
-        self.date_patterns = [
-            r'(?:DATE|TIME|Date|Time)[:\s]+([A-Za-z]+\s+\d{1,2}\s+\d{4})',
-            r'(?:DATE|TIME|Date|Time)[:\s]+(\d{1,2}/\d{1,2}/\d{4})\s+\d{1,2}:\d{2}',
-            r'(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{4})',
-            r'(\d{1,2}[-/]\d{1,2}[-/]\d{4})',
-            r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})',
-        ]
-        
-        self.total_patterns = [
-            r'(?:^|\n)\s*(?:TOTAL\s+SALES|GRAND\s+TOTAL|TOTAL)[:\s]*\$?\s*([0-9¥.,]+)',
-        ]
-        
-        self.tax_patterns = [
-            r'(?:^|\n)\s*(?:GCT|TAX|VAT|GST|Tax\s+\d)[:\s]*\$?\s*([0-9.,]+)',
-        ]
-        
-        self.category_keywords = {
-            'Produce': ['vegetable', 'fruit', 'lettuce', 'tomato', 'potato', 'onion', 'carrot', 'apple', 'banana', 'orange', 'garlic'],
-            'Dairy': ['milk', 'cheese', 'yogurt', 'butter', 'cream', 'dairy'],
-            'Meat': ['chicken', 'beef', 'pork', 'meat', 'sausage', 'bacon', 'corned'],
-            'Bakery': ['bread', 'cake', 'pastry', 'bun', 'roll', 'bulla'],
-            'Beverages': ['juice', 'soda', 'water', 'drink', 'cola', 'tea', 'coffee'],
-            'Household': ['soap', 'detergent', 'cleaner', 'tissue', 'paper', 'bag'],
-            'Snacks': ['chip', 'cashew', 'puff', 'cracker', 'nibble'],
-            'Condiments': ['sauce', 'seasoning', 'margarine', 'salt', 'sugar', 'flour', 'cornmeal'],
-            'Tobacoo': ['cigarette', 'craven'],
-        }
+    # Stored on receipts; bump when parsing rules change so reparse_receipts can find stale ones
+    PARSER_VERSION = 'manual:1'
+    
+    def __init__(self, category_automaton=None):
+        """
+        Args:
+            category_automaton: Category keywords to guess with, e.g.
+                category_keyword_index.automaton() to include the database
+                ones (default: built-in keywords only, no database access)
+        """
+        self.category_automaton = category_automaton or BUILTIN_CATEGORY_AUTOMATON
+        
+        self.store_patterns = STORE_PATTERNS
+        self.date_patterns = DATE_PATTERNS
+        self.total_patterns = TOTAL_PATTERNS
+        self.tax_patterns = TAX_PATTERNS
+        self.category_keywords = CATEGORY_KEYWORDS
     
     def parse_receipt_text(self, text):
         """Parse receipt text and extract structured data"""
@@ -63,12 +95,15 @@ class ReceiptParser:
                 'confidence': 'low',
             }
         
-        store_name = self.extract_store_name(text)
-        store_location = self.extract_store_location(text)
+        # Split once; every line-based extractor shares the list
+        lines = text.split('\n')
+        
+        store_name = self.extract_store_name(text, lines)
+        store_location = self.extract_store_location(text, lines)
         purchase_date = self.extract_date(text)
         total_amount = self.extract_total(text)
         tax_amount = self.extract_tax(text)
-        items = self.extract_items(text)
+        items = self.extract_items(text, lines)
         
         confidence = self._calculate_confidence(store_name, purchase_date, total_amount, items)
         
@@ -89,7 +124,7 @@ class ReceiptParser:
         text_upper = text.upper()
         has_total = any(kw in text_upper for kw in ['TOTAL', 'GRAND'])
         has_store = any(kw in text_upper for kw in ['STORE', 'MARKET', 'SHOP', 'MART', 'SUPERMARKET'])
-        has_prices = bool(re.search(r'\d+[.,]\d{2}', text))
+        has_prices = HAS_PRICE.search(text) is not None
         return has_total and (has_store or has_prices)
     
     def _calculate_confidence(self, store_name, purchase_date, total_amount, items):
@@ -113,98 +148,110 @@ class ReceiptParser:
     
     def _guess_category(self, product_name):
         """Guess product category based on name"""
-        name_lower = product_name.lower()
-        for category, keywords in self.category_keywords.items():
-            if any(keyword in name_lower for keyword in keywords):
-                return category
-        return 'Groceries'
+        # All keywords matched in one pass
+        return guess_category(self.category_automaton, product_name)
     
     def _is_valid_product_name(self, line):
         """Determine if a line is likely a product name"""
         if not line or len(line) < 2:
             return False
         
-        if not re.match(r'^[A-Z0-9¥]', line):
+        if not PRODUCT_START.match(line):
             return False
         
-        if re.match(r'^[\d\s,.\-¥]*$', line):
+        if NUMERIC_ONLY.match(line):
             return False
         
-        if not re.search(r'[A-Za-z]', line):
+        if not LETTER.search(line):
             return False
         
-        non_product_keywords = [
-            'DESCRIPTION', 'QTY', 'AMOUNT', 'PRICE', 'Thank', 'YOU SAVED',
-            'Discount:', 'Subtotal', 'SUBTOTAL', 'TOTAL', 'Total', 'GCT', 'GRAND',
-            'Change', 'DEBIT', 'CASH', 'CARD', 'PAYMENT', 'Refunds', 'Exchange',
-            'TEL', 'INVOICE', 'Closed', 'CASHIER', 'STATION', 'Emp:', 'Reg:',
-            'Tax ID', 'Tax Number', 'Net Sales', 'SALES', 'ITEM COUNT'
-        ]
-        
-        for keyword in non_product_keywords:
-            if keyword in line:
-                return False
+        if has_non_product_keyword(line):
+            return False
         
         return True
     
-    def _is_price_or_qty_line(self, line):
+    def _is_price_or_qty_line(self, line, price_strings=None):
         """Check if a line is primarily prices or quantity info"""
         # Lines with @ symbol are price indicators
         if ' @ ' in line or ' @ $' in line or '@ $' in line:
             return True
         
         # Lines that start with pure numbers (qty indicators)
-        if re.match(r'^\s*\d+(?:[.,]\d+)?\s*(?:@|\$|¥)', line):
+        if QTY_PREFIX.match(line):
             return True
         
         # Lines with multiple prices
-        prices = re.findall(r'\d+[,.]?\d*[.,]\d{2}', line)
-        if len(prices) >= 2 and len(line) < 50:
+        if price_strings is None:
+            price_strings = LINE_PRICE.findall(line)
+        if len(price_strings) >= 2 and len(line) < 50:
             return True
         
         return False
     
-    def extract_store_name(self, text):
-        """Extract store name from receipt text"""
-        lines = text.split('\n')[:10]
+    def _classify_item_line(self, line):
+        """Everything item extraction needs to know about a line, worked out once"""
+        text = line.strip()
+        price_strings = LINE_PRICE.findall(text)
+        
+        quantity = None
+        qty_match = QTY_AT_PRICE.match(text)
+        if qty_match:
+            try:
+                quantity = Decimal(self._normalize_amount_string(qty_match.group(1)))
+            except:
+                pass
+        
+        return ItemLine(
+            text=text,
+            is_separator=len(text) < 2 or SEPARATOR.match(text) is not None,
+            is_price_or_qty=self._is_price_or_qty_line(text, price_strings),
+            is_product_name=self._is_valid_product_name(text),
+            prices=self._extract_prices_from_line(text, price_strings),
+            quantity=quantity
+        )
+    
+    def extract_store_name(self, text, lines=None):
+        """Extract store name from receipt text (`lines`: the text already split on newlines)"""
+        lines = (lines if lines is not None else text.split('\n'))[:10]
         
         # First try standard patterns (SUPERMARKET, STORE, etc.)
         for pattern in self.store_patterns:
             for line in lines:
-                match = re.search(pattern, line, re.IGNORECASE)
+                match = pattern.search(line)
                 if match:
                     store_name = match.group(1).strip()
-                    store_name = re.sub(r'\s+', ' ', store_name)
+                    store_name = WHITESPACE_RUN.sub(' ', store_name)
                     if len(store_name) > 3:  # Ensure it's a reasonable name
                         return store_name
         
         # Fallback: look for lines with "Supermarket" anywhere (catches "M . D Lin's Supermarket")
         for line in lines:
-            if 'supermarket' in line.lower() or 'market' in line.lower() or 'store' in line.lower():
+            line_lower = line.lower()
+            if 'market' in line_lower or 'store' in line_lower:
                 # Extract the meaningful part before or including these keywords
-                match = re.search(r'^(.+?(?:supermarket|market|store))', line, re.IGNORECASE)
+                match = STORE_KEYWORD_PREFIX.search(line)
                 if match:
                     store_name = match.group(1).strip()
-                    store_name = re.sub(r'\s+', ' ', store_name)
+                    store_name = WHITESPACE_RUN.sub(' ', store_name)
                     if len(store_name) > 3:
                         return store_name
         
         # Last resort: check if first non-empty line looks like a store name
         for line in lines:
             line = line.strip()
-            if line and len(line) > 3 and not re.match(r'^[\d\-\(\)]+', line):
+            if line and len(line) > 3 and not PHONE_PREFIX.match(line):
                 # Skip lines that are just numbers/phone numbers
-                if re.search(r'[A-Za-z]', line):
+                if LETTER.search(line):
                     return line
         
         return ''
     
-    def extract_store_location(self, text):
-        """Extract store location/address from receipt text"""
-        lines = text.split('\n')[:15]
+    def extract_store_location(self, text, lines=None):
+        """Extract store location/address from receipt text (`lines`: the text already split on newlines)"""
+        lines = (lines if lines is not None else text.split('\n'))[:15]
         
         for line in lines:
-            match = re.search(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z][a-z]*(?:\s+[A-Z][a-z]*)*)', line)
+            match = CITY_STATE.search(line)
             if match:
                 city = match.group(1).strip()
                 state = match.group(2).strip()
@@ -213,7 +260,7 @@ class ReceiptParser:
                     return location
         
         for line in lines:
-            if re.search(r'^\d+\s+[A-Z]', line) and len(line) > 10:
+            if STREET_ADDRESS.search(line) and len(line) > 10:
                 return line.strip()
         
         return ''
@@ -221,7 +268,7 @@ class ReceiptParser:
     def extract_date(self, text):
         """Extract purchase date from receipt text"""
         for pattern in self.date_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = pattern.search(text)
             if match:
                 date_str = match.group(1)
                 parsed = self.parse_date_string(date_str)
@@ -283,7 +330,7 @@ class ReceiptParser:
     def extract_total(self, text):
         """Extract total amount from receipt text"""
         for pattern in self.total_patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+            match = pattern.search(text)
             if match:
                 amount_str = match.group(1)
                 normalized = self._normalize_amount_string(amount_str)
@@ -296,7 +343,7 @@ class ReceiptParser:
     def extract_tax(self, text):
         """Extract tax amount from receipt text"""
         for pattern in self.tax_patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+            match = pattern.search(text)
             if match:
                 amount_str = match.group(1)
                 normalized = self._normalize_amount_string(amount_str)
@@ -306,10 +353,11 @@ class ReceiptParser:
                     continue
         return None
     
-    def extract_items(self, text):
+    def extract_items(self, text, lines=None):
         """Extract line items from receipt using intelligent pattern detection"""
         items = []
-        lines = text.split('\n')
+        if lines is None:
+            lines = text.split('\n')
         
         item_section = self._find_item_section(lines)
         if not item_section:
@@ -324,13 +372,12 @@ class ReceiptParser:
         end_idx = len(lines)
         
         for i, line in enumerate(lines):
-            if any(kw in line.upper() for kw in ['DESCRIPTION', 'QTY', 'ITEM', '=====']):
+            if SECTION_START in line_labels(line.upper()):
                 start_idx = i + 1
                 break
         
         for i in range(start_idx, len(lines)):
-            line_upper = lines[i].upper().strip()
-            if any(kw in line_upper for kw in ['SUBTOTAL', 'GCT', 'TOTAL', 'DEBIT', 'CASH', 'PAYMENT', 'YOU SAVED', 'NET SALES', 'GRAND']):
+            if SECTION_END in line_labels(lines[i].upper()):
                 end_idx = i
                 break
         
@@ -339,82 +386,65 @@ class ReceiptParser:
     def _extract_items_optimized(self, lines, start_idx, end_idx):
         """Extract items with optimized multi-format support"""
         items = []
-        i = start_idx
+        # Each line is classified once, however many items look at it
+        section = [self._classify_item_line(line) for line in lines[start_idx:end_idx]]
+        i = 0
         
-        while i < end_idx:
-            line = lines[i].strip()
+        while i < len(section):
+            line = section[i]
             
-            # Skip empty or separator lines
-            if len(line) < 2 or re.match(r'^[=\-\s]+$', line):
+            # Skip empty or separator lines, and price/qty only lines
+            if line.is_separator or line.is_price_or_qty or not line.is_product_name:
                 i += 1
                 continue
             
-            # Skip price/qty only lines
-            if self._is_price_or_qty_line(line):
-                i += 1
-                continue
-            
-            if self._is_valid_product_name(line):
-                item = self._parse_product_item(lines, i, end_idx)
-                if item:
-                    items.append(item)
-                    i += item.pop('lines_consumed', 1)
-                else:
-                    i += 1
+            item = self._parse_product_item(section, i)
+            if item:
+                items.append(item)
+                i += item.pop('lines_consumed', 1)
             else:
                 i += 1
         
         return items
     
-    def _parse_product_item(self, lines, current_idx, end_idx):
-        """Parse a single product item across multiple lines"""
-        line = lines[current_idx].strip()
+    def _parse_product_item(self, section, current_idx):
+        """Parse a single product item across multiple lines of the classified items section"""
+        line = section[current_idx]
         
-        if not self._is_valid_product_name(line):
+        if not line.is_product_name:
             return None
         
-        product_name = line
+        product_name = line.text
         quantity = Decimal('1.0')
         unit_price = Decimal('0.00')
         total_price = Decimal('0.00')
         lines_consumed = 1
         
         # Collect prices from this line and following lines
-        collected_prices = self._extract_prices_from_line(line)
+        collected_prices = list(line.prices)
         
         # Look ahead for more data (max 4 lines)
-        lookahead_lines = []
-        for offset in range(1, min(5, end_idx - current_idx)):
-            next_line = lines[current_idx + offset].strip()
+        lookahead_count = 0
+        for offset in range(1, min(5, len(section) - current_idx)):
+            next_line = section[current_idx + offset]
             
-            if not next_line:
+            if not next_line.text:
                 break
             
             # Stop if we hit another product
-            if self._is_valid_product_name(next_line) and offset > 1 and not self._is_price_or_qty_line(next_line):
+            if next_line.is_product_name and offset > 1 and not next_line.is_price_or_qty:
                 break
             
-            lookahead_lines.append((offset, next_line))
-            
-            # Extract prices from this line
-            more_prices = self._extract_prices_from_line(next_line)
-            collected_prices.extend(more_prices)
+            lookahead_count += 1
             
-            # Extract qty if present
-            qty_match = re.search(r'^(\d+(?:[.,]\d+)?)\s+[@$¥]', next_line)
-            if qty_match:
-                try:
-                    quantity = Decimal(self._normalize_amount_string(qty_match.group(1)))
-                except:
-                    pass
-        
-        # Parse collected prices intelligently
-        self._assign_prices(collected_prices, quantity, product_name, 
-                          lines[current_idx:current_idx + len(lookahead_lines) + 1])
+            # Prices and qty found when the line was classified
+            collected_prices.extend(next_line.prices)
+            if next_line.quantity is not None:
+                quantity = next_line.quantity
         
         # Determine how many lines we consumed
         if collected_prices or (quantity > 1 and quantity != Decimal('1.0')):
-            lines_consumed = len(lookahead_lines) + 1
+            lines_consumed = lookahead_count + 1
         
         # Extract prices and quantities from collected data
         prices = sorted(set(collected_prices))  # Unique prices, sorted
@@ -453,29 +483,27 @@ class ReceiptParser:
         if name_parts and len(name_parts[0]) <= 10 and name_parts[0].isupper():
             brand = name_parts[0]
         
+        normalized = parse_product_name(product_name)
+        
         return {
             'name': product_name,
-            'normalized_name': product_name.lower().strip(),
+            'normalized_name': normalized.name,
             'brand': brand,
             'quantity': quantity,
-            'unit': '',
+            'unit': normalized.unit,
             'unit_price': unit_price,
             'total_price': total_price,
             'category': self._guess_category(product_name),
             'lines_consumed': lines_consumed
         }
     
-    def _assign_prices(self, prices, quantity, product_name, text_lines):
-        """Helper to assign prices intelligently (modifies prices list in place for sorting)"""
-        pass  # Logic handled in _parse_product_item
-    
-    def _extract_prices_from_line(self, line):
+    def _extract_prices_from_line(self, line, price_strings=None):
         """Extract all decimal prices from a line"""
         prices = []
-        pattern = r'(\d+[,.]?\d*[.,]\d{2})'
-        matches = re.findall(pattern, line)
+        if price_strings is None:
+            price_strings = LINE_PRICE.findall(line)
         
-        for match in matches:
+        for match in price_strings:
             try:
                 normalized = self._normalize_amount_string(match)
                 price = Decimal(normalized)
@@ -487,13 +515,13 @@ class ReceiptParser:
     
     def _is_valid_item(self, product_name, quantity, unit_price, total_price):
         """Validate that extracted item makes sense"""
-        if not re.search(r'[A-Za-z]', product_name):
+        letters = len(LETTER.findall(product_name))
+        if not letters:
             return False
         
-        letter_ratio = len(re.findall(r'[A-Za-z]', product_name)) / max(len(product_name), 1)
+        letter_ratio = letters / max(len(product_name), 1)
         if letter_ratio < 0.25:
             return False
-        
         if unit_price == 0 and total_price == 0:
             return False
         
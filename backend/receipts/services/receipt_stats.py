@@ -0,0 +1,150 @@
+"""
+Per-user receipt statistics with a versioned cache
+backend/receipts/services/receipt_stats.py
+"""
+
+import os
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from receipts.models import Receipt, MonthlySpendingRollup
+
+
+class ReceiptStatsService:
+    """Dashboard statistics, computed in two queries and cached per user.
+
+    Cache keys carry a per-user version. Any Receipt save or delete for the
+    user bumps the version once the transaction commits, so stale entries are
+    never read again and simply expire. Receipts are completed by the worker
+    processes, so this needs the shared cache configured in settings (Redis
+    or the database), not a per-process one. Receipt item edits go through
+    Receipt.calculate_total(), which saves the receipt; queryset update()s on
+    receipts must call invalidate() themselves.
+    """
+
+    TTL_SECONDS = int(os.getenv('RECEIPT_STATS_CACHE_SECONDS', '3600'))
+    TOP_STORES = 5
+    RECENT_RECEIPTS = 5
+
+    # Per-process counters, see stats()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def _version_key(user_id):
+        return f'receipt-stats:version:{user_id}'
+
+    @classmethod
+    def version(cls, user_id):
+        """Current cache version of a user's statistics"""
+        key = cls._version_key(user_id)
+        version = cache.get(key)
+        if version is None:
+            # Start from the clock, not 1, so a version lost to eviction
+            # can't bring back entries written under an earlier one
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    @classmethod
+    def invalidate(cls, user_id):
+        """Make every cached statistic of a user stale"""
+        key = cls._version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+    @classmethod
+    def invalidate_on_commit(cls, user_id):
+        """Invalidate once the current transaction commits, so a recompute sees the new rows"""
+        transaction.on_commit(lambda: cls.invalidate(user_id))
+
+    @classmethod
+    def get(cls, user, request=None):
+        """
+        Statistics for the stats endpoint, from the cache when possible
+
+        Args:
+            user: User whose receipts are summarized
+            request: Used to build absolute image URLs
+
+        Returns:
+            dict: Totals, this month's totals, top stores and recent receipts
+        """
+        month_start = timezone.now().date().replace(day=1)
+        host = request.get_host() if request is not None else ''
+        # The month and host are part of the key: "this month" rolls over and
+        # recent receipts carry absolute URLs
+        key = f'receipt-stats:{user.id}:{cls.version(user.id)}:{month_start:%Y-%m}:{host}'
+
+        stats_data = cache.get(key)
+        if stats_data is not None:
+            cls.hits += 1
+            return stats_data
+
+        cls.misses += 1
+        stats_data = cls.compute(user, month_start, request)
+        cache.set(key, stats_data, timeout=cls.TTL_SECONDS)
+        return stats_data
+
+    @classmethod
+    def compute(cls, user, month_start, request=None):
+        """
+        Compute statistics from the database
+
+        One grouped query over the spending rollups gives all-time and
+        this-month totals per store (conditional aggregation), and one query
+        loads the recent receipts with their item counts.
+        """
+        from receipts.serializers import ReceiptListSerializer
+
+        this_month = Q(month__gte=month_start)
+        stores = list(
+            MonthlySpendingRollup.objects.filter(user=user).values('store_name').annotate(
+                receipts=Sum('receipt_count'),
+                spent=Sum('total_spent'),
+                receipts_month=Sum('receipt_count', filter=this_month),
+                spent_month=Sum('total_spent', filter=this_month)
+            ).order_by()
+        )
+
+        top_stores = sorted(stores, key=lambda store: (-store['spent'], store['store_name']))[:cls.TOP_STORES]
+
+        recent_receipts = Receipt.objects.filter(
+            user=user,
+            status='completed'
+        ).with_items_count().order_by('-purchase_date')[:cls.RECENT_RECEIPTS]
+
+        return {
+            'total_receipts': sum(store['receipts'] for store in stores),
+            'total_spent': float(sum(store['spent'] for store in stores)),
+            'receipts_this_month': sum(store['receipts_month'] or 0 for store in stores),
+            'spent_this_month': float(sum(store['spent_month'] or 0 for store in stores)),
+            'top_stores': [
+                {
+                    'store_name': store['store_name'],
+                    'receipt_count': store['receipts'],
+                    'total_spent': float(store['spent'])
+                }
+                for store in top_stores
+            ],
+            'recent_receipts': ReceiptListSerializer(
+                recent_receipts,
+                many=True,
+                context={'request': request}
+            ).data
+        }
+
+    @classmethod
+    def stats(cls):
+        return {'hits': cls.hits, 'misses': cls.misses}
+
+
+@receiver([post_save, post_delete], sender=Receipt)
+def invalidate_receipt_stats(sender, instance, **kwargs):
+    ReceiptStatsService.invalidate_on_commit(instance.user_id)
@@ -0,0 +1,168 @@
+"""
+Incremental per-user, per-month, per-store spending rollups
+backend/receipts/services/spending_rollups.py
+"""
+
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from receipts.models import Receipt, MonthlySpendingRollup
+
+
+CENTS = Decimal('0.01')
+
+# Receipt fields a rollup row depends on
+TRACKED_FIELDS = ('user_id', 'status', 'purchase_date', 'store_name', 'total_amount')
+
+
+class SpendingRollupService:
+    """Keep MonthlySpendingRollup in step with completed receipts.
+
+    A completed receipt contributes one receipt and its total to the row of
+    its (user, month, store). Before a receipt is saved or deleted its row is
+    read (and locked where the database supports it); afterwards the old
+    contribution is taken back and the new one added, in the same
+    transaction: Receipt.save() opens one before pre_save is sent, and
+    Django's deletion collector opens one before pre_delete. Rollup rows are
+    only changed with relative UPDATEs, so concurrent receipts of the same
+    row never overwrite each other's totals. Queryset update()/bulk writes
+    bypass this; run rebuild_spending_rollups after those.
+    """
+
+    @staticmethod
+    def state(receipt):
+        """Tracked field values of an instance, or None if some are deferred"""
+        values = receipt.__dict__
+        if any(field not in values for field in TRACKED_FIELDS):
+            return None
+        return tuple(values[field] for field in TRACKED_FIELDS)
+
+    @staticmethod
+    def contribution(state):
+        """(user_id, month, store_name, amount) a receipt state adds, or None"""
+        if state is None:
+            return None
+        user_id, status, purchase_date, store_name, total_amount = state
+        if status != 'completed':
+            return None
+        month = purchase_date.replace(day=1) if purchase_date else MonthlySpendingRollup.UNDATED_MONTH
+        return user_id, month, store_name or '', Decimal(str(total_amount or 0)).quantize(CENTS)
+
+    @staticmethod
+    def apply(contribution, sign):
+        """Add (sign=1) or take back (sign=-1) one receipt's contribution"""
+        user_id, month, store_name, amount = contribution
+        rows = MonthlySpendingRollup.objects.filter(user_id=user_id, month=month, store_name=store_name)
+        delta = {'receipt_count': F('receipt_count') + sign, 'total_spent': F('total_spent') + sign * amount}
+        with transaction.atomic():
+            if rows.update(**delta):
+                if sign < 0:
+                    rows.filter(receipt_count__lte=0).delete()
+                return
+            if sign < 0:
+                return
+            # First receipt of the row
+            try:
+                with transaction.atomic():
+                    MonthlySpendingRollup.objects.create(
+                        user_id=user_id, month=month, store_name=store_name,
+                        receipt_count=1, total_spent=amount
+                    )
+            except IntegrityError:
+                # Another receipt created it first; add to theirs
+                rows.update(**delta)
+
+    @classmethod
+    def receipt_changed(cls, old_state, new_state):
+        old = cls.contribution(old_state)
+        new = cls.contribution(new_state)
+        if old == new:
+            return
+        if old:
+            cls.apply(old, -1)
+        if new:
+            cls.apply(new, 1)
+
+    # --------------------------------------------------------------- rebuild
+
+    @staticmethod
+    def rebuild(user_id=None):
+        """
+        Recompute rollups from the receipts table
+
+        Args:
+            user_id: Only rebuild this user's rows
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        receipts = Receipt.objects.filter(status='completed')
+        rollups = MonthlySpendingRollup.objects.all()
+        if user_id is not None:
+            receipts = receipts.filter(user_id=user_id)
+            rollups = rollups.filter(user_id=user_id)
+
+        grouped = receipts.annotate(month=TruncMonth('purchase_date')).values(
+            'user_id', 'month', 'store_name'
+        ).annotate(receipt_count=Count('id'), total_spent=Sum('total_amount')).order_by()
+
+        # Undated receipts and store names differing only by NULL/'' share a row
+        rows = {}
+        for group in grouped.iterator():
+            key = (group['user_id'], group['month'] or MonthlySpendingRollup.UNDATED_MONTH, group['store_name'] or '')
+            row = rows.setdefault(key, [0, Decimal('0')])
+            row[0] += group['receipt_count']
+            row[1] += group['total_spent'] or Decimal('0')
+
+        with transaction.atomic():
+            rollups.delete()
+            MonthlySpendingRollup.objects.bulk_create([
+                MonthlySpendingRollup(
+                    user_id=user, month=month, store_name=store_name,
+                    receipt_count=count, total_spent=total
+                )
+                for (user, month, store_name), (count, total) in rows.items()
+            ], batch_size=1000)
+        return len(rows)
+
+
+def _database_state(receipt):
+    """Tracked values the receipt's row holds now, locked until the transaction ends (not on SQLite)"""
+    receipts = Receipt.objects.filter(pk=receipt.pk)
+    if transaction.get_connection().in_atomic_block:
+        # Outside a transaction (save_base() called directly) there is
+        # nothing to hold the lock, and Postgres refuses FOR UPDATE
+        receipts = receipts.select_for_update()
+    return receipts.values_list(*TRACKED_FIELDS).first()
+
+
+@receiver(pre_save, sender=Receipt)
+def load_rollup_state(sender, instance, **kwargs):
+    instance._rollup_state = None if instance._state.adding else _database_state(instance)
+
+
+@receiver(post_save, sender=Receipt)
+def update_rollup_on_save(sender, instance, created, update_fields=None, **kwargs):
+    old_state = None if created else getattr(instance, '_rollup_state', None)
+    new_state = SpendingRollupService.state(instance)
+    if update_fields is not None and old_state is not None:
+        # Only the listed fields reached the database
+        saved = {sender._meta.get_field(name).attname for name in update_fields}
+        new_state = tuple(
+            new if field in saved else old
+            for field, old, new in zip(TRACKED_FIELDS, old_state, new_state or old_state)
+        )
+    SpendingRollupService.receipt_changed(old_state, new_state)
+
+
+@receiver(pre_delete, sender=Receipt)
+def load_rollup_state_before_delete(sender, instance, **kwargs):
+    instance._rollup_state = _database_state(instance)
+
+
+@receiver(post_delete, sender=Receipt)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    SpendingRollupService.receipt_changed(getattr(instance, '_rollup_state', None), None)
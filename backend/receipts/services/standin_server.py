@@ -0,0 +1,446 @@
+"""
+Local stand-in for the Azure Read and OpenAI chat-completions APIs
+backend/receipts/services/standin_server.py
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from django.conf import settings
+from receipts.services.parse_cache import normalize_ocr_text
+from receipts.services.parser_benchmark import CORPUS_DIR, load_corpus
+from receipts.services.receipt_parser import ReceiptParser
+
+
+READ_SUBMIT_PATH = '/vision/v3.2/read/analyze'
+READ_RESULT_PATH = re.compile(r'^/vision/v3\.2/read/analyzeResults/(?P<operation_id>[\w\-]+)$')
+CHAT_PATH = '/v1/chat/completions'
+STATS_PATH = '/standin/stats'
+
+# Operations older than this are forgotten
+OPERATION_TTL_SECONDS = 600
+
+
+def get_standin_url():
+    """
+    Base URL of the stand-in server, when the services should talk to it
+
+    Set RECEIPT_SERVICES_STANDIN_URL (e.g. http://127.0.0.1:8765) to point
+    AzureOCRService and OpenAIReceiptParser at run_ocr_llm_standin.
+    """
+    url = getattr(settings, 'RECEIPT_SERVICES_STANDIN_URL', None)
+    return url.rstrip('/') if url else None
+
+
+class LatencyDistribution:
+    """Sample delays (seconds) from a spec such as 'lognormal:800,0.4'
+
+    Specs, all in milliseconds:
+        fixed:MS (or just MS), uniform:MIN,MAX, normal:MEAN,STDDEV,
+        lognormal:MEDIAN,SIGMA
+    """
+
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal')
+
+    def __init__(self, kind, params, rng=None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = params
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def parse(cls, spec, rng=None):
+        spec = str(spec).strip()
+        kind, _, args = spec.partition(':') if ':' in spec else ('fixed', '', spec)
+        try:
+            params = [float(arg) for arg in args.split(',') if arg.strip()]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}.get(kind)
+        if expected is not None and len(params) != expected:
+            raise ValueError(f"Latency spec {spec} needs {expected} number(s)")
+        return cls(kind, params, rng)
+
+    def sample(self):
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = self.rng.uniform(*self.params)
+        elif self.kind == 'normal':
+            ms = self.rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            ms = self.rng.lognormvariate(math.log(max(median, 0.001)), sigma)
+        return max(ms, 0.0) / 1000
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(f'{param:g}' for param in self.params)}"
+
+
+# ===================== RECORDINGS =====================
+
+def build_read_result(text):
+    """Read API analyzeResults payload for OCR text, one line per non-blank text line"""
+    now = datetime.now(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    lines = []
+    for index, line in enumerate(line for line in text.split('\n') if line.strip()):
+        top = 20 + index * 30
+        box = [10, top, 990, top, 990, top + 24, 10, top + 24]
+        lines.append({
+            'boundingBox': box,
+            'text': line,
+            'appearance': {'style': {'name': 'other', 'confidence': 1.0}},
+            'words': [
+                {'boundingBox': box, 'text': word, 'confidence': 0.99}
+                for word in line.split()
+            ],
+        })
+
+    return {
+        'status': 'succeeded',
+        'createdDateTime': now,
+        'lastUpdatedDateTime': now,
+        'analyzeResult': {
+            'version': '3.2.0',
+            'modelVersion': '2022-04-30',
+            'readResults': [{
+                'page': 1,
+                'angle': 0,
+                'width': 1000,
+                'height': 40 + len(lines) * 30,
+                'unit': 'pixel',
+                'lines': lines,
+            }],
+        },
+    }
+
+
+def _camel_case(value):
+    """Convert SDK as_dict() keys (analyze_result) back to the REST form (analyzeResult)"""
+    if isinstance(value, dict):
+        return {
+            re.sub(r'_([a-z])', lambda match: match.group(1).upper(), key): _camel_case(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_camel_case(item) for item in value]
+    return value
+
+
+def chat_content_from_parse(parsed):
+    """JSON answer in the shape the OpenAI parser prompt asks for, from a local parse"""
+    if not parsed.get('success') or not parsed.get('is_receipt'):
+        return json.dumps({
+            'is_receipt': False,
+            'confidence': 'low',
+            'reason': parsed.get('error', 'Not identified as a receipt'),
+        })
+
+    def number(value):
+        return float(value) if isinstance(value, Decimal) else value
+
+    return json.dumps({
+        'is_receipt': True,
+        'confidence': parsed.get('confidence', 'medium'),
+        'store_name': parsed.get('store_name') or None,
+        'store_location': parsed.get('store_location') or None,
+        'purchase_date': parsed['purchase_date'].isoformat() if parsed.get('purchase_date') else None,
+        'total_amount': number(parsed.get('total_amount')),
+        'tax_amount': number(parsed.get('tax_amount')),
+        'items': [
+            {
+                'name': item['name'],
+                'brand': item.get('brand', ''),
+                'quantity': number(item['quantity']),
+                'unit': item.get('unit', ''),
+                'unit_price': number(item['unit_price']),
+                'total_price': number(item['total_price']),
+                'category': item.get('category', ''),
+            }
+            for item in parsed.get('items', [])
+        ],
+    })
+
+
+def make_recording(name, text, read_result=None, chat_content=None):
+    """
+    One replayable OCR + LLM exchange
+
+    Missing parts are synthesized: the Read payload from the text, and the
+    chat answer from the local receipt parser.
+    """
+    if chat_content is None:
+        chat_content = chat_content_from_parse(ReceiptParser().parse_receipt_text(text))
+    elif not isinstance(chat_content, str):
+        chat_content = json.dumps(chat_content)
+
+    return {
+        'name': name,
+        'text': text,
+        'normalized_text': normalize_ocr_text(text),
+        'read_result': read_result or build_read_result(text),
+        'chat_content': chat_content,
+    }
+
+
+def load_recordings(recordings_dir=None, from_ocr_cache=0):
+    """
+    Load recordings to replay
+
+    Args:
+        recordings_dir: Directory of *.json files with 'text' and optionally
+            'read_result' (analyzeResults payload) and 'chat_content'; the
+            parser benchmark corpus (*.txt) is used when not given
+        from_ocr_cache: Also replay up to this many real Read results from
+            the OCR result cache
+
+    Returns:
+        list of recording dicts
+    """
+    recordings = []
+    if recordings_dir:
+        for path in sorted(Path(recordings_dir).glob('*.json')):
+            data = json.loads(path.read_text(encoding='utf-8'))
+            recordings.append(make_recording(
+                data.get('name', path.stem),
+                data['text'],
+                data.get('read_result'),
+                data.get('chat_content')
+            ))
+    else:
+        for sample in load_corpus(CORPUS_DIR):
+            recordings.append(make_recording(sample['name'], sample['text']))
+
+    if from_ocr_cache:
+        from receipts.models import OCRCacheEntry
+
+        entries = OCRCacheEntry.objects.exclude(raw_result=None).order_by('-last_accessed_at')[:from_ocr_cache]
+        for entry in entries:
+            recordings.append(make_recording(
+                f"ocr-cache-{entry.image_sha256[:12]}",
+                entry.text,
+                _camel_case(entry.raw_result)
+            ))
+
+    return recordings
+
+
+# ===================== SERVER =====================
+
+class StandinService:
+    """State shared by all request handler threads"""
+
+    def __init__(self, recordings, submit_latency, processing_time, chat_latency,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1, seed=None):
+        if not recordings:
+            raise ValueError('At least one recording is needed')
+        self.recordings = recordings
+        self.submit_latency = submit_latency
+        self.processing_time = processing_time
+        self.chat_latency = chat_latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._operations = {}  # operation id -> (created_at, ready_at, recording)
+        self.stats = {
+            'read_submitted': 0,
+            'read_polls': 0,
+            'read_succeeded': 0,
+            'chat_completions': 0,
+            'chat_matched': 0,
+            'errors_injected': 0,
+            'throttled': 0,
+        }
+
+    def count(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def injected_failure(self):
+        """None, 429 or 500 according to the configured rates"""
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.throttle_rate:
+            self.count('throttled')
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            self.count('errors_injected')
+            return 500
+        return None
+
+    def submit_read(self, body):
+        """Start a fake Read operation; the same image always replays the same recording"""
+        index = int(hashlib.sha256(body).hexdigest(), 16) % len(self.recordings)
+        operation_id = str(uuid.uuid4())
+        now = time.monotonic()
+        with self._lock:
+            self._operations = {
+                key: value for key, value in self._operations.items()
+                if now - value[0] < OPERATION_TTL_SECONDS
+            }
+            self._operations[operation_id] = (now, now + self.processing_time.sample(), self.recordings[index])
+            self.stats['read_submitted'] += 1
+        return operation_id
+
+    def read_result(self, operation_id):
+        """analyzeResults payload, or None for an unknown operation"""
+        with self._lock:
+            operation = self._operations.get(operation_id)
+            self.stats['read_polls'] += 1
+        if operation is None:
+            return None
+
+        _, ready_at, recording = operation
+        if time.monotonic() < ready_at:
+            return {'status': 'running', 'createdDateTime': recording['read_result'].get('createdDateTime')}
+        self.count('read_succeeded')
+        return recording['read_result']
+
+    def chat_completion(self, request):
+        """Chat-completions response replaying the recording whose OCR text is in the prompt"""
+        prompt = ' '.join(
+            message.get('content') or ''
+            for message in request.get('messages', [])
+            if message.get('role') == 'user'
+        )
+        normalized_prompt = normalize_ocr_text(prompt)
+
+        recording = None
+        for candidate in self.recordings:
+            if candidate['normalized_text'] and candidate['normalized_text'] in normalized_prompt:
+                recording = candidate
+                self.count('chat_matched')
+                break
+        if recording is None:
+            index = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16) % len(self.recordings)
+            recording = self.recordings[index]
+        self.count('chat_completions')
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(recording['chat_content']) // 4
+        return {
+            'id': f"chatcmpl-standin-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'standin'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': recording['chat_content']},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+
+
+class StandinRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end; `service` is set on the server instance"""
+
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _fail_if_injected(self):
+        status = self.service.injected_failure()
+        if status == 429:
+            self._send_json(429, {'error': {'code': '429', 'message': 'Rate limit exceeded (stand-in)'}},
+                            {'Retry-After': str(self.service.retry_after)})
+            return True
+        if status == 500:
+            self._send_json(500, {'error': {'code': 'InternalServerError', 'message': 'Injected failure (stand-in)'}})
+            return True
+        return False
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split('?', 1)[0]
+
+        if path == READ_SUBMIT_PATH:
+            time.sleep(self.service.submit_latency.sample())
+            if self._fail_if_injected():
+                return
+            operation_id = self.service.submit_read(body)
+            host = self.headers.get('Host') or f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+            self.send_response(202)
+            self.send_header('Operation-Location', f"http://{host}/vision/v3.2/read/analyzeResults/{operation_id}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if path == CHAT_PATH:
+            time.sleep(self.service.chat_latency.sample())
+            if self._fail_if_injected():
+                return
+            try:
+                request = json.loads(body or b'{}')
+            except json.JSONDecodeError:
+                self._send_json(400, {'error': {'message': 'Invalid JSON body'}})
+                return
+            self._send_json(200, self.service.chat_completion(request))
+            return
+
+        self._send_json(404, {'error': {'message': f'Unknown path: {path}'}})
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+
+        if path == STATS_PATH:
+            self._send_json(200, self.service.stats)
+            return
+
+        match = READ_RESULT_PATH.match(path)
+        if match:
+            if self._fail_if_injected():
+                return
+            result = self.service.read_result(match.group('operation_id'))
+            if result is None:
+                self._send_json(404, {'error': {'code': 'NotFound', 'message': 'Unknown operation'}})
+            else:
+                self._send_json(200, result)
+            return
+
+        self._send_json(404, {'error': {'message': f'Unknown path: {path}'}})
+
+
+def create_standin_server(service, host='127.0.0.1', port=8765, verbose=False):
+    """Threaded HTTP server bound to host:port, serving `service`"""
+    server = ThreadingHTTPServer((host, port), StandinRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
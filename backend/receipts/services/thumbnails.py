@@ -0,0 +1,84 @@
+"""
+Eager receipt thumbnail generation
+backend/receipts/services/thumbnails.py
+"""
+
+import time
+
+
+class DeferredThumbnailStrategy:
+    """imagekit cache file strategy that never does image work on access.
+
+    The default JustInTime strategy generates (and stats) the thumbnail the
+    first time a serializer reads its URL. With this strategy reading `.url`
+    or truthiness is free; files are produced by ReceiptThumbnailService in
+    the processing pipeline instead.
+    """
+
+    def should_verify_existence(self, file):
+        return False
+
+
+class ReceiptThumbnailService:
+    """Generate every thumbnail size of a receipt ahead of time"""
+
+    # Response key -> Receipt ImageSpecField
+    SIZES = {
+        'small': 'receipt_thumbnail_small',
+        'medium': 'receipt_thumbnail',
+        'large': 'receipt_thumbnail_large',
+    }
+
+    @staticmethod
+    def generate(receipt, force=False):
+        """
+        Write all thumbnail files for a receipt and mark them ready
+
+        Args:
+            receipt: Receipt model instance with a stored image
+            force: Regenerate even if the receipt is already marked ready
+
+        Returns:
+            bool: True if the thumbnails are ready
+        """
+        from receipts.models import Receipt
+        from receipts.services.receipt_stats import ReceiptStatsService
+
+        if receipt.thumbnails_ready and not force:
+            return True
+        if not receipt.receipt_image:
+            return False
+
+        started = time.perf_counter()
+        try:
+            for field_name in ReceiptThumbnailService.SIZES.values():
+                # The Simple backend skips files that already exist unless forced
+                getattr(receipt, field_name).generate(force=force)
+        except Exception as e:
+            print(f"Thumbnail generation failed for receipt {receipt.id}: {str(e)}")
+            return False
+
+        Receipt.objects.filter(id=receipt.id).update(thumbnails_ready=True)
+        receipt.thumbnails_ready = True
+        # update() sends no post_save; cached stats list thumbnail URLs
+        ReceiptStatsService.invalidate_on_commit(receipt.user_id)
+        print(f"Generated thumbnails for receipt {receipt.id} "
+              f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return True
+
+    @staticmethod
+    def urls(receipt, request=None):
+        """
+        Thumbnail URLs by size, without touching storage
+
+        Returns:
+            dict: size -> URL, or None while the thumbnails are not generated yet
+        """
+        if not receipt.thumbnails_ready or not receipt.receipt_image:
+            return None
+
+        urls = {}
+        for size, field_name in ReceiptThumbnailService.SIZES.items():
+            url = getattr(receipt, field_name).url
+            urls[size] = request.build_absolute_uri(url) if request else url
+        return urls
@@ -0,0 +1,65 @@
+"""
+Upload handlers that hash receipt images as they are received
+backend/receipts/upload_handlers.py
+"""
+
+import hashlib
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+
+
+class SHA256HashingMixin:
+    """Compute a SHA-256 of each uploaded file chunk by chunk.
+
+    The digest is attached to the resulting UploadedFile as `sha256`, so the
+    image never has to be read a second time just to hash it.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Set up before super(): the memory handler raises StopFutureHandlers
+        self._sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        # Only hash chunks this handler actually kept
+        if passed_on is None:
+            self._sha256.update(raw_data)
+        return passed_on
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.sha256 = self._sha256.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(SHA256HashingMixin, MemoryFileUploadHandler):
+    """In-memory upload handler that records the file's SHA-256"""
+
+
+class HashingTemporaryFileUploadHandler(SHA256HashingMixin, TemporaryFileUploadHandler):
+    """Temporary-file upload handler that records the file's SHA-256"""
+
+
+def file_sha256(uploaded_file):
+    """
+    Get the SHA-256 of an uploaded or stored file
+
+    Args:
+        uploaded_file: Django File; uses the digest from the upload handlers when present
+
+    Returns:
+        str: Hex digest
+    """
+    digest = getattr(uploaded_file, 'sha256', None)
+    if digest:
+        return digest
+
+    sha256 = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        sha256.update(chunk)
+    uploaded_file.seek(0)
+    return sha256.hexdigest()
@@ -8,11 +8,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum, Count
+from django.db import transaction
+from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
 import os
-from .models import Receipt, ReceiptItem
+from .models import Receipt, ReceiptItem, MonthlySpendingRollup
 from .serializers import (
     ReceiptSerializer,
     ReceiptListSerializer,
@@ -24,6 +25,8 @@ from .serializers import (
     AddReceiptItemsSerializer,
 )
 from .services.ocr_service import AzureOCRService
+from .services.job_queue import ReceiptJobQueue
+from .services.receipt_stats import ReceiptStatsService
 
 
 # ===================== RECEIPT VIEWS =====================
@@ -32,7 +35,10 @@ from .services.ocr_service import AzureOCRService
 @permission_classes([permissions.IsAuthenticated])
 def get_receipts(request):
     """Get all receipts for current user with pagination"""
-    receipts = Receipt.objects.filter(user=request.user).prefetch_related('items')
+    # Grouped (annotated) queries ignore Meta.ordering, so order explicitly
+    receipts = Receipt.objects.filter(user=request.user).with_items_count().order_by(
+        '-purchase_date', '-created_at'
+    )
     
     # Apply filters
     status_filter = request.query_params.get('status')
@@ -71,22 +77,18 @@ def get_receipt_detail(request, receipt_id):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def upload_receipt(request):
-    """Upload a new receipt image"""
+    """Upload a new receipt image and queue it for background processing"""
     serializer = ReceiptUploadSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
-        receipt = serializer.save()
-        
-        # Trigger OCR processing with text extraction
-        try:
-            AzureOCRService.process_receipt_ocr(receipt, extract_text=True)
-        except Exception as e:
-            receipt.status = 'failed'
-            receipt.processing_error = str(e)
-            receipt.save()
+        # OCR and parsing run in run_receipt_workers; the receipt stays pending
+        # until then. Both rows or neither, so no receipt waits without a job
+        with transaction.atomic():
+            receipt = serializer.save()
+            ReceiptJobQueue.enqueue(receipt, extract_text=True)
         
         return Response(
             ReceiptSerializer(receipt, context={'request': request}).data,
-            status=status.HTTP_201_CREATED
+            status=status.HTTP_202_ACCEPTED
         )
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -243,54 +245,8 @@ def delete_receipt_item(request, receipt_id, item_id):
 @permission_classes([permissions.IsAuthenticated])
 def get_receipt_stats(request):
     """Get receipt statistics for current user"""
-    user = request.user
-    
-    # Get all receipts
-    all_receipts = Receipt.objects.filter(user=user, status='completed')
-    
-    # Calculate totals
-    total_receipts = all_receipts.count()
-    total_spent = all_receipts.aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    # This month statistics
-    now = timezone.now()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    month_receipts = all_receipts.filter(purchase_date__gte=month_start)
-    receipts_this_month = month_receipts.count()
-    spent_this_month = month_receipts.aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    # Top stores
-    top_stores = all_receipts.values('store_name').annotate(
-        count=Count('id'),
-        total=Sum('total_amount')
-    ).order_by('-total')[:5]
-    
-    top_stores_data = [
-        {
-            'store_name': store['store_name'],
-            'receipt_count': store['count'],
-            'total_spent': float(store['total'])
-        }
-        for store in top_stores
-    ]
-    
-    # Recent receipts
-    recent_receipts = all_receipts.order_by('-purchase_date')[:5]
-    
-    stats_data = {
-        'total_receipts': total_receipts,
-        'total_spent': float(total_spent),
-        'receipts_this_month': receipts_this_month,
-        'spent_this_month': float(spent_this_month),
-        'top_stores': top_stores_data,
-        'recent_receipts': ReceiptListSerializer(
-            recent_receipts, 
-            many=True, 
-            context={'request': request}
-        ).data
-    }
-    
-    return Response(stats_data)
+    # Cached per user until one of their receipts changes
+    return Response(ReceiptStatsService.get(request.user, request))
 
 
 @api_view(['GET'])
@@ -299,29 +255,23 @@ def get_spending_by_month(request):
     """Get spending grouped by month"""
     user = request.user
     
-    # Get receipts from last 12 months
-    twelve_months_ago = timezone.now() - timedelta(days=365)
-    receipts = Receipt.objects.filter(
+    # Months from a year ago onwards, summed over stores in the database
+    first_month = (timezone.now() - timedelta(days=365)).date().replace(day=1)
+    months = MonthlySpendingRollup.objects.filter(
         user=user,
-        status='completed',
-        purchase_date__gte=twelve_months_ago
-    )
-    
-    # Group by month
-    monthly_data = {}
-    for receipt in receipts:
-        if receipt.purchase_date:
-            month_key = receipt.purchase_date.strftime('%Y-%m')
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {
-                    'month': month_key,
-                    'total': 0,
-                    'count': 0
-                }
-            monthly_data[month_key]['total'] += float(receipt.total_amount)
-            monthly_data[month_key]['count'] += 1
+        month__gte=first_month
+    ).values('month').annotate(
+        total=Sum('total_spent'),
+        count=Sum('receipt_count')
+    ).order_by('month')
     
-    # Sort by month
-    sorted_data = sorted(monthly_data.values(), key=lambda x: x['month'])
+    sorted_data = [
+        {
+            'month': month['month'].strftime('%Y-%m'),
+            'total': float(month['total']),
+            'count': month['count']
+        }
+        for month in months
+    ]
     
     return Response(sorted_data)
@@ -7,6 +7,31 @@ from django.db import models
 from django.contrib.auth.models import User
 
 
+class ShoppingListQuerySet(models.QuerySet):
+    def with_item_counts(self):
+        """Annotate items_count and checked_items_count in the same query"""
+        return self.annotate(
+            items_count=models.Count('items'),
+            checked_items_count=models.Count('items', filter=models.Q(items__is_checked=True))
+        )
+
+    def with_items(self):
+        """Prefetch items with their product details, for ShoppingListSerializer"""
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=ShoppingListItem.objects.with_product_details())
+        )
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    def with_product_details(self):
+        """Prefetch linked products with their category and lowest price in one query"""
+        from products.models import Product
+
+        return self.prefetch_related(
+            models.Prefetch('product', queryset=Product.objects.select_related('category').with_lowest_price())
+        )
+
+
 class ShoppingList(models.Model):
     """User's shopping lists"""
     STATUS_CHOICES = [
@@ -23,6 +48,8 @@ class ShoppingList(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShoppingListQuerySet.as_manager()
+
     class Meta:
         db_table = 'shopping_lists'
         ordering = ['-created_at']
@@ -46,12 +73,24 @@ class ShoppingList(models.Model):
 
     def get_items_count(self):
         """Get count of items in the list"""
+        # Annotated by ShoppingList.objects.with_item_counts()
+        if getattr(self, 'items_count', None) is not None:
+            return self.items_count
         return self.items.count()
 
     def get_checked_items_count(self):
         """Get count of checked items"""
+        if getattr(self, 'checked_items_count', None) is not None:
+            return self.checked_items_count
         return self.items.filter(is_checked=True).count()
 
+    def get_progress_percentage(self):
+        """Share of checked items, in percent"""
+        total = self.get_items_count()
+        if total == 0:
+            return 0
+        return round((self.get_checked_items_count() / total) * 100, 2)
+
 
 class ShoppingListItem(models.Model):
     """Individual items in a shopping list"""
@@ -82,6 +121,8 @@ class ShoppingListItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShoppingListItemQuerySet.as_manager()
+
     class Meta:
         db_table = 'shopping_list_items'
         ordering = ['position', 'created_at']
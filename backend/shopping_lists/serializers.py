@@ -87,15 +87,15 @@ class ShoppingListSerializer(serializers.ModelSerializer):
     
     def get_progress_percentage(self, obj):
         """Calculate completion percentage"""
-        total = obj.get_items_count()
-        if total == 0:
-            return 0
-        checked = obj.get_checked_items_count()
-        return round((checked / total) * 100, 2)
+        return obj.get_progress_percentage()
 
 
 class ShoppingListListSerializer(serializers.ModelSerializer):
-    """Minimal serializer for shopping list listings"""
+    """Minimal serializer for shopping list listings
+
+    Expects lists from ShoppingList.objects.with_item_counts(); without the
+    annotations every count is a query.
+    """
     items_count = serializers.SerializerMethodField()
     checked_items_count = serializers.SerializerMethodField()
     progress_percentage = serializers.SerializerMethodField()
@@ -115,11 +115,7 @@ class ShoppingListListSerializer(serializers.ModelSerializer):
         return obj.get_checked_items_count()
     
     def get_progress_percentage(self, obj):
-        total = obj.get_items_count()
-        if total == 0:
-            return 0
-        checked = obj.get_checked_items_count()
-        return round((checked / total) * 100, 2)
+        return obj.get_progress_percentage()
 
 
 class ShoppingListCreateSerializer(serializers.ModelSerializer):
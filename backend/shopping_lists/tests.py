@@ -1,3 +1,88 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.test import APIClient
+from products.models import Store, Product, PriceHistory
+from .models import ShoppingList, ShoppingListItem
 
-# Create your tests here.
+
+class ShoppingListQueryBudgetTests(TestCase):
+    """The shopping list listing costs the same number of queries however many lists it shows"""
+
+    # Page COUNT and page SELECT (item and checked counts are annotated)
+    QUERY_BUDGET = 2
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budget', password='budget-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_lists(self, count, items_each=4, checked_each=1):
+        for i in range(count):
+            shopping_list = ShoppingList.objects.create(user=self.user, name=f'List {i}')
+            ShoppingListItem.objects.bulk_create([
+                ShoppingListItem(
+                    shopping_list=shopping_list, product_name=f'Item {n}',
+                    is_checked=n < checked_each, position=n
+                )
+                for n in range(items_each)
+            ])
+
+    def test_shopping_list_listing_query_budget(self):
+        self.add_lists(20)
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get('/api/shopping-lists/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(len(results), 20)
+        for shopping_list in results:
+            self.assertEqual(shopping_list['items_count'], 4)
+            self.assertEqual(shopping_list['checked_items_count'], 1)
+            self.assertEqual(shopping_list['progress_percentage'], 25.0)
+
+    def test_empty_list_progress(self):
+        ShoppingList.objects.create(user=self.user, name='Empty')
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get('/api/shopping-lists/')
+        self.assertEqual(response.data['results'][0]['items_count'], 0)
+        self.assertEqual(response.data['results'][0]['progress_percentage'], 0)
+
+
+class ShoppingListDetailQueryBudgetTests(TestCase):
+    """List details load item products and their lowest prices in one query"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budget', password='budget-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.store = Store.objects.create(name='Store', is_approved=True)
+        self.shopping_list = ShoppingList.objects.create(user=self.user, name='Weekly')
+
+    def add_items(self, count):
+        for i in range(count):
+            product = Product.objects.create(name=f'Product {i}', is_approved=True)
+            PriceHistory.objects.create(
+                product=product, store=self.store, price=Decimal('3.00'),
+                is_active=True, is_approved=True
+            )
+            ShoppingListItem.objects.create(shopping_list=self.shopping_list, product=product, position=i)
+
+    def test_detail_query_count_does_not_grow_with_items(self):
+        url = f'/api/shopping-lists/{self.shopping_list.id}/'
+        self.add_items(1)
+        # List with counts, its items, their products
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        self.add_items(10)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.data['items_count'], 11)
+        self.assertTrue(all(item['product_details']['lowest_price'] == 3.0 for item in response.data['items']))
+
+    def test_item_listing_query_count_does_not_grow_with_items(self):
+        url = f'/api/shopping-lists/{self.shopping_list.id}/items/'
+        self.add_items(12)
+        # List lookup, items, their products
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 12)
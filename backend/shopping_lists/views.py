@@ -24,7 +24,7 @@ from .serializers import (
     ReorderItemsSerializer
 )
 from receipts.models import Receipt
-from products.models import Product, PriceHistory
+from products.models import Product, CurrentPrice
 
 
 # ===================== SHOPPING LIST VIEWS =====================
@@ -33,7 +33,8 @@ from products.models import Product, PriceHistory
 @permission_classes([permissions.IsAuthenticated])
 def get_shopping_lists(request):
     """Get all shopping lists for current user"""
-    lists = ShoppingList.objects.filter(user=request.user).prefetch_related('items')
+    # Grouped (annotated) queries ignore Meta.ordering, so order explicitly
+    lists = ShoppingList.objects.filter(user=request.user).with_item_counts().order_by('-created_at')
     
     # Apply status filter
     status_filter = request.query_params.get('status')
@@ -52,7 +53,9 @@ def get_shopping_lists(request):
 @permission_classes([permissions.IsAuthenticated])
 def get_shopping_list_detail(request, list_id):
     """Get detailed information about a shopping list"""
-    shopping_list = get_object_or_404(ShoppingList, id=list_id, user=request.user)
+    shopping_list = get_object_or_404(
+        ShoppingList.objects.with_item_counts().with_items(), id=list_id, user=request.user
+    )
     serializer = ShoppingListSerializer(shopping_list)
     return Response(serializer.data)
 
@@ -75,7 +78,9 @@ def create_shopping_list(request):
 @permission_classes([permissions.IsAuthenticated])
 def update_shopping_list(request, list_id):
     """Update shopping list information"""
-    shopping_list = get_object_or_404(ShoppingList, id=list_id, user=request.user)
+    shopping_list = get_object_or_404(
+        ShoppingList.objects.with_item_counts().with_items(), id=list_id, user=request.user
+    )
     serializer = ShoppingListUpdateSerializer(shopping_list, data=request.data, partial=True)
     if serializer.is_valid():
         serializer.save()
@@ -121,6 +126,7 @@ def duplicate_shopping_list(request, list_id):
     
     # Calculate estimated total
     new_list.calculate_estimated_total()
+    new_list = ShoppingList.objects.with_item_counts().with_items().get(id=new_list.id)
     
     return Response(
         ShoppingListSerializer(new_list).data,
@@ -144,7 +150,7 @@ def get_list_item(request, list_id, item_id):
 def get_list_items(request, list_id):
     """Get all items for a shopping list"""
     shopping_list = get_object_or_404(ShoppingList, id=list_id, user=request.user)
-    items = shopping_list.items.all()
+    items = shopping_list.items.with_product_details()
     
     # Filter by checked status if provided
     is_checked = request.query_params.get('is_checked')
@@ -327,6 +333,7 @@ def generate_list_from_receipt(request):
         
         # Calculate estimated total
         shopping_list.calculate_estimated_total()
+        shopping_list = ShoppingList.objects.with_item_counts().with_items().get(id=shopping_list.id)
         
         return Response(
             ShoppingListSerializer(shopping_list).data,
@@ -360,18 +367,18 @@ def compare_list_prices(request, list_id):
     optimal_total = 0
     single_store_totals = {}
     
+    # Current prices of every linked product in one query
+    prices_by_product = {}
+    for price in CurrentPrice.objects.filter(
+        product_id__in=[item.product_id for item in items]
+    ).select_related('store').order_by('product_id', 'store__name'):
+        prices_by_product.setdefault(price.product_id, []).append(price)
+    
     for item in items:
-        product = item.product
         quantity = float(item.quantity)
         
-        # Get current prices for this product
-        prices = PriceHistory.objects.filter(
-            product=product,
-            is_active=True,
-            is_approved=True
-        ).select_related('store')
-        
-        if not prices.exists():
+        prices = prices_by_product.get(item.product_id)
+        if not prices:
             continue
         
         # Build price data for each store